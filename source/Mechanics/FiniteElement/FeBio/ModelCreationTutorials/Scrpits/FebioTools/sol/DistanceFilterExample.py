@@ -1,11 +1,14 @@
 import numpy as np
 import vtk
 
+# Custom modules/functions
+import StlLoader
+
 def example():
     # Define the variables needed before setting up and performing a nearest neighbor search.
     sourcePoint = np.array([0., 0., 0.]) # The point that is used in the nearest neighbor search
     targetSurfaceFileName = 'dat/oks003_FMB_AGS_LVTIT.stl' # The name of the .stl file that defines the surface
-    targetSurface = loadStlSurface(targetSurfaceFileName) # The vtkPolyData object defined by the .stl file.
+    targetSurface = StlLoader.loadStlSurface(targetSurfaceFileName) # The vtkPolyData object defined by the .stl file.
 
     # Setup the object/variable that is used to conduct the distance calculation
     distFilter = vtk.vtkImplicitPolyDataDistance()
@@ -17,18 +20,5 @@ def example():
 
     return
 
-def loadStlSurface(fileName):
-    """
-    This function loads a .stl file and returns vtkPolyData.
-    :param fileName: string, The name of the .stl file that is being loaded.
-    :return: vtkPolyData, The geometry that was in the .stl file.
-    """
-    reader = vtk.vtkSTLReader()
-    reader.SetFileName(fileName)
-    reader.Update()
-    polyData = reader.GetOutput()
-    return polyData
-
-
 if __name__ == '__main__':
     example()
\ No newline at end of file
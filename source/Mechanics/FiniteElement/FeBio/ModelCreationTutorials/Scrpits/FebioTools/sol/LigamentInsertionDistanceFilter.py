@@ -1,6 +1,10 @@
 import numpy as np
 import vtk
 
+# Custom modules/functions
+import StlLoader
+import SignedDistance
+
 def example():
     # ------------------------------------
     # Define the fileNames
@@ -10,15 +14,17 @@ def example():
 
     # ------------------------------------
     # Load the surfaces
-    femurSurface = loadStlSurface(femurSurfaceFileName)
-    tibiaSurface = loadStlSurface(tibiaSurfaceFileName)
-    ligamentSurface = loadStlSurface(ligamentSurfaceFileName)
+    femurSurface = StlLoader.loadStlSurface(femurSurfaceFileName)
+    tibiaSurface = StlLoader.loadStlSurface(tibiaSurfaceFileName)
+    ligamentSurface = StlLoader.loadStlSurface(ligamentSurfaceFileName)
 
     # ------------------------------------
     # Get the nodeIds of the insertions
     distanceCutOff = 0.5 # This is the cut off distance. This has the same units as the given polydata, so it is usually mm if the .stl files are defined using MR or CT images.
-    femurInsertionPointIds = getNearestNeighborNodeIds(ligamentSurface, femurSurface, distanceCutOff)
-    tibiaInsertionPointIds = getNearestNeighborNodeIds(ligamentSurface, tibiaSurface, distanceCutOff)
+    # Both insertions are found with one search over the ligament's nodes. Each target has its own cut off distance, and more targets (e.g. the menisci) can be added to the dictionary.
+    insertions = SignedDistance.getPointIdsWithinDistances(ligamentSurface, {'femur': [femurSurface, distanceCutOff], 'tibia': [tibiaSurface, distanceCutOff]})
+    femurInsertionPointIds = insertions['femur'][1] # The second entry is the nodeIds. The first entry is the distances.
+    tibiaInsertionPointIds = insertions['tibia'][1]
 
     # ------------------------------------
     # Get the coordinates of the points identified with the insertion's nodeIds
@@ -65,33 +71,12 @@ def getNearestNeighborNodeIds(sourcePolydata, targetPolydata, tolerance):
     :param sourcePolydata: vtkPolyData object (or similar), The polydata that defines the source geometry. The nodeIds that are returned are from this polydata. Note that only the points from this object are used, so it can also be a vtkUnstructuredGrid object.
     :param targetPolydata: vtkPolyData object, The polydata that defines the target geometry. The nodeIds that are returned are within ``tolerance`` of this polydata.
     :param tolerance: float, The nodeIds of the ``sourcePolydata`` that are returned are within ``tolerance`` of the ``targetPolydata``
-    :return: list, A list of nodeIds that relate to the ``sourcePolydata``.
+    :return: array 1xn, The nodeIds that relate to the ``sourcePolydata``.
     """
-    nodeIds = [] # Initialize an empty list that will be populated with the desired nodeIds
-    # Setup the object/variable that is used to conduct the nearest neighbor search
-    distFilter = vtk.vtkImplicitPolyDataDistance()
-    distFilter.SetInput(targetPolydata)
-    x = sourcePolydata.GetNumberOfPoints()
-    for pointId in range(sourcePolydata.GetNumberOfPoints()):
-        sourcePoint = sourcePolydata.GetPoint(pointId)
-        signedDist = distFilter.EvaluateFunction(sourcePoint)
-        if signedDist <= tolerance:
-            nodeIds.append(pointId)
-
+    # The signed distances of all of the source points are calculated at once (see SignedDistance.getSignedDistances), and the nodeIds are selected with a mask instead of a loop.
+    signedDists, nodeIds = SignedDistance.getPointIdsWithinDistance(sourcePolydata, targetPolydata, tolerance)
     return nodeIds
 
-def loadStlSurface(fileName):
-    """
-    This function loads a .stl file and returns vtkPolyData.
-    :param fileName: string, The name of the .stl file that is being loaded.
-    :return: vtkPolyData, The geometry that was in the .stl file.
-    """
-    reader = vtk.vtkSTLReader()
-    reader.SetFileName(fileName)
-    reader.Update()
-    polyData = reader.GetOutput()
-    return polyData
-
 def visualization(surface0, surface1, surface1NodeIds):
     """
     Create a visualization that shows the two given surfaces and the points that relate to the given nodeIds.
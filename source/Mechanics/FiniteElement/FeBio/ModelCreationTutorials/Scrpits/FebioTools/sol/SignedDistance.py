@@ -0,0 +1,329 @@
+import concurrent.futures
+import os
+import numpy as np
+import scipy.ndimage
+import vtk
+from vtk.util import numpy_support
+
+# Custom modules/functions
+import StlLoader
+
+def example():
+    # Find the ligament's nodes that are within 0.5 mm of the femur.
+    sourceSurface = StlLoader.loadStlSurface('dat/oks003_ACL_AGS_LVTIT.stl')
+    targetSurface = StlLoader.loadStlSurface('dat/oks003_FMB_AGS_LVTIT.stl')
+    statistics = {}
+    distances, nodeIds = getPointIdsWithinDistance(sourceSurface, targetSurface, 0.5, statistics=statistics)
+    print(f'{len(nodeIds)} of the {len(distances)} ligament nodes are within 0.5 of the femur. The smallest signed distance is {distances.min()}')
+    print(f"The exact distance was calculated for {statistics['queryNum']} nodes, and {statistics['prunedNum']} nodes were pruned by the broad phase.")
+    return
+
+def getPointArray(dataSet):
+    """
+    Get the coordinates of the points of ``dataSet`` as a numpy array. The array is a view of the vtkPoints, so nothing is copied.
+
+    :param dataSet: vtkPolyData object (or similar, e.g. vtkUnstructuredGrid), The data set.
+    :return: array nx3, The coordinates of the points. Row i is the point with pointId i.
+    """
+    if dataSet.GetPoints() is None:
+        return np.zeros((0, 3))
+    return numpy_support.vtk_to_numpy(dataSet.GetPoints().GetData())
+
+def getSignedDistances(sourcePoints, targetPolydata, processNum=None, chunkSize=20000):
+    """
+    Calculate the signed distance between every source point and the ``targetPolydata`` surface. Negative distances are inside the surface.
+
+    The distances are calculated with ``vtkImplicitPolyDataDistance.FunctionValue``, which evaluates a whole array of points in one call, instead of calling ``EvaluateFunction`` for each point from python.
+    If more than one process is used, then the points are split into chunks of ``chunkSize`` points, and each process calculates the distances of one chunk at a time.
+
+    ..NOTE:: The work is split between processes, not threads, because the vtk python wrapping does not release the GIL while ``FunctionValue`` runs. Each process builds its own copy of the target surface (and its cell locator) once.
+
+    :param sourcePoints: vtkPolyData object (or similar) or array nx3, The points that the distances are calculated for. Only the points of a vtkPolyData (or vtkUnstructuredGrid) object are used.
+    :param targetPolydata: vtkPolyData object, The surface that the distances are measured to.
+    :param processNum: int or None, The number of processes. If None, then every core is used. The distances are calculated in this process if ``processNum`` is 1, or if there is only one chunk.
+    :param chunkSize: int, The number of points in each chunk.
+    :return: array 1xn, The signed distance of each source point.
+    """
+    if not isinstance(sourcePoints, np.ndarray):
+        sourcePoints = getPointArray(sourcePoints)
+    return _getTargetDistances([sourcePoints], [targetPolydata], processNum, chunkSize)[0]
+
+def getPointIdsWithinDistance(sourcePoints, targetPolydata, tolerance, processNum=None, chunkSize=20000, prefilter=True, cellSize=None, statistics=None):
+    """
+    Get the pointIds of the source points whose signed distance to the ``targetPolydata`` is less than or equal to ``tolerance`` (see ``getSignedDistances``).
+    Points inside the target surface have a negative distance, so they are always included.
+
+    If ``prefilter`` is True, then the points that can not be within ``tolerance`` of the surface are found first with ``getBroadPhase``, and the exact distance is only calculated for the other points.
+    The far points are not within ``tolerance`` of the surface, so each one is either outside the surface (distance ``np.inf``) or inside it (distance ``-np.inf``).
+    The pointIds are the same as without the prefilter, as long as the target surface is closed.
+
+    :param sourcePoints: vtkPolyData object (or similar) or array nx3, The source points. The pointIds that are returned are from these points.
+    :param targetPolydata: vtkPolyData object, The target surface.
+    :param tolerance: float, The maximum signed distance.
+    :param processNum: int or None, See ``getSignedDistances``.
+    :param chunkSize: int, See ``getSignedDistances``.
+    :param prefilter: bool, Whether the far points are found with ``getBroadPhase`` before the exact distances are calculated.
+    :param cellSize: float or None, See ``getBroadPhase``.
+    :param statistics: dictionary or None, If a dictionary is given, then the number of points ('pointNum'), the number of exact distance calculations ('queryNum'), and the broad phase statistics (see ``getBroadPhase``) are added to it.
+    :return: [array 1xn, array 1xk], The signed distance of each source point (``np.inf`` or ``-np.inf`` for the far points), and the pointIds of the points that are within ``tolerance``.
+    """
+    targetStatistics = {}
+    targetResults = getPointIdsWithinDistances(sourcePoints, {'target': [targetPolydata, tolerance]}, processNum=processNum, chunkSize=chunkSize, prefilter=prefilter, cellSize=cellSize, statistics=targetStatistics)
+    if statistics is not None:
+        statistics.update(targetStatistics['target'])
+    return targetResults['target']
+
+def getPointIdsWithinDistances(sourcePoints, targets, processNum=None, chunkSize=20000, prefilter=True, cellSize=None, statistics=None):
+    """
+    Get the pointIds of the source points that are within the tolerance of each target surface (see ``getPointIdsWithinDistance``), e.g. the insertions of a ligament on the femur and the tibia.
+
+    The work that does not depend on the target is only done once:
+        - The source points are only read from ``sourcePoints`` once.
+        - The points outside the bounding boxes of all of the targets (each enlarged by its tolerance) are removed before the broad phase of each target (see ``getBroadPhase``).
+        - The exact distances to every target are calculated by one pool of processes, and each process builds each target surface once.
+
+    :param sourcePoints: vtkPolyData object (or similar) or array nx3, The source points. The pointIds that are returned are from these points.
+    :param targets: dictionary, The target surfaces. The keys are the names of the targets, and the values are [vtkPolyData object, float], i.e. the target surface and its tolerance.
+    :param processNum: int or None, See ``getSignedDistances``.
+    :param chunkSize: int, See ``getSignedDistances``.
+    :param prefilter: bool, See ``getPointIdsWithinDistance``.
+    :param cellSize: float or None, See ``getBroadPhase``.
+    :param statistics: dictionary or None, If a dictionary is given, then the statistics of each target (see ``getPointIdsWithinDistance``) are added to it, with the target's name as the key. 'outsideAllBoxesNum' is the number of points that are outside the bounding boxes of all of the targets.
+    :return: dictionary, The keys are the names of the targets, and the values are [array 1xn, array 1xk], i.e. the signed distance of each source point to the target, and the pointIds of the points that are within the target's tolerance.
+    """
+    if not isinstance(sourcePoints, np.ndarray):
+        sourcePoints = getPointArray(sourcePoints)
+    sourcePoints = np.asarray(sourcePoints, dtype=float).reshape(-1, 3)
+    targetNames = list(targets.keys())
+    targetPolydatas = [targets[targetName][0] for targetName in targetNames]
+    tolerances = [targets[targetName][1] for targetName in targetNames]
+
+    if not prefilter:
+        allDistances = _getTargetDistances([sourcePoints]*len(targetNames), targetPolydatas, processNum, chunkSize)
+        targetResults = {}
+        for targetName, distances, tolerance in zip(targetNames, allDistances, tolerances):
+            targetResults[targetName] = [distances, np.flatnonzero(distances <= tolerance)]
+            if statistics is not None:
+                statistics[targetName] = {'pointNum': len(sourcePoints), 'queryNum': len(sourcePoints)}
+        return targetResults
+
+    # The points outside every target's enlarged bounding box are outside every target, so they are removed once for all of the targets.
+    isInsideBoxes = np.zeros(len(sourcePoints), dtype=bool)
+    for targetPolydata, tolerance in zip(targetPolydatas, tolerances):
+        targetPoints = getPointArray(targetPolydata)
+        isInsideBoxes |= np.all((sourcePoints >= targetPoints.min(axis=0) - tolerance) & (sourcePoints <= targetPoints.max(axis=0) + tolerance), axis=1)
+    candidateIds = np.flatnonzero(isInsideBoxes)
+    candidatePoints = sourcePoints[candidateIds]
+
+    broadPhases = [getBroadPhase(candidatePoints, targetPolydata, tolerance, cellSize=cellSize) for targetPolydata, tolerance in zip(targetPolydatas, tolerances)]
+    # One point of each far region is calculated with the near points, and its sign is the sign of every point in the region.
+    queryIds = [np.concatenate([broadPhase['nearIds'], np.array([regionIds[0] for regionIds in broadPhase['regionIds']], dtype=np.int64)]) for broadPhase in broadPhases]
+    allQueryDistances = _getTargetDistances([candidatePoints[targetQueryIds] for targetQueryIds in queryIds], targetPolydatas, processNum, chunkSize)
+
+    targetResults = {}
+    for targetName, tolerance, broadPhase, targetQueryIds, queryDistances in zip(targetNames, tolerances, broadPhases, queryIds, allQueryDistances):
+        candidateDistances = np.full(len(candidateIds), np.inf)
+        candidateDistances[targetQueryIds] = queryDistances
+        for regionIds, representativeDistance in zip(broadPhase['regionIds'], queryDistances[len(broadPhase['nearIds']):]):
+            candidateDistances[regionIds] = np.copysign(np.inf, representativeDistance)
+        distances = np.full(len(sourcePoints), np.inf)
+        distances[candidateIds] = candidateDistances
+        targetResults[targetName] = [distances, np.flatnonzero(distances <= tolerance)]
+        if statistics is not None:
+            targetStatistics = dict(broadPhase['statistics'])
+            targetStatistics['outsideBoxNum'] += len(sourcePoints) - len(candidateIds)
+            targetStatistics['prunedNum'] += len(sourcePoints) - len(candidateIds)
+            targetStatistics.update({'pointNum': len(sourcePoints), 'queryNum': len(targetQueryIds)})
+            statistics[targetName] = targetStatistics
+    if statistics is not None:
+        statistics['outsideAllBoxesNum'] = len(sourcePoints) - len(candidateIds)
+    return targetResults
+
+def getBroadPhase(sourcePoints, targetPolydata, tolerance, cellSize=None, maxCellNum=2**22):
+    """
+    Find the source points that can not be within ``tolerance`` of the ``targetPolydata`` surface, without calculating any distances.
+
+    This is done in two steps:
+        1) The points outside the target's bounding box (enlarged by ``tolerance``) are far from the surface, and outside it.
+        2) The bounding box is divided into a uniform grid of cubes. A cube is "near" if it overlaps the bounding box (enlarged by ``tolerance``) of any of the target's polygons. The points in the other cubes are far from the surface.
+    The surface does not pass through the cubes that are not near, so all of the points in a connected region of those cubes are either inside or outside the surface.
+    The regions are returned, so the sign of a whole region can be found by calculating the signed distance of one of its points.
+
+    :param sourcePoints: vtkPolyData object (or similar) or array nx3, The source points.
+    :param targetPolydata: vtkPolyData object, The target surface.
+    :param tolerance: float, The distance that the points are compared to.
+    :param cellSize: float or None, The length of the cubes. If None, then the larger of ``tolerance`` and the median length of the target's edges is used. It is increased if the grid would have more than ``maxCellNum`` cubes.
+    :param maxCellNum: int, The maximum number of cubes in the grid.
+    :return: dictionary, A dictionary with the following keys:
+        'nearIds': array 1xk, The pointIds of the points that may be within ``tolerance`` of the surface.
+        'regionIds': list, The pointIds of the far points in each connected region (an array for each region). The points outside the bounding box are in the last region.
+        'statistics': dictionary, The number of points outside the bounding box ('outsideBoxNum'), the number of far points inside the bounding box ('farNum'), the number of far points ('prunedNum'), the number of regions ('regionNum'), and the length of the cubes ('cellSize').
+    """
+    if not isinstance(sourcePoints, np.ndarray):
+        sourcePoints = getPointArray(sourcePoints)
+    sourcePoints = np.asarray(sourcePoints, dtype=float).reshape(-1, 3)
+    targetPoints = getPointArray(targetPolydata)
+    polyOffsets = numpy_support.vtk_to_numpy(targetPolydata.GetPolys().GetOffsetsArray()).astype(np.int64)
+    polyConnectivity = numpy_support.vtk_to_numpy(targetPolydata.GetPolys().GetConnectivityArray()).astype(np.int64)
+    if len(polyConnectivity) == 0:
+        raise ValueError('The target polydata does not have any polygons')
+
+    # The bounding box of each polygon, enlarged by the tolerance
+    polyPoints = targetPoints[polyConnectivity]
+    polyMin = np.minimum.reduceat(polyPoints, polyOffsets[:-1], axis=0) - tolerance
+    polyMax = np.maximum.reduceat(polyPoints, polyOffsets[:-1], axis=0) + tolerance
+    boxMin, boxMax = polyMin.min(axis=0), polyMax.max(axis=0)
+
+    if cellSize is None:
+        edgeLengths = np.linalg.norm(polyPoints[polyOffsets[:-1] + 1] - polyPoints[polyOffsets[:-1]], axis=1) # The first edge of each polygon
+        cellSize = max(tolerance, float(np.median(edgeLengths)), 1e-12)
+    cellSize = max(cellSize, float(np.prod(boxMax - boxMin + 2*cellSize)/maxCellNum)**(1/3))
+    # There is a layer of cubes around the bounding box, so the region outside the surface is connected around the surface.
+    origin = boxMin - cellSize
+    shape = np.floor((boxMax + cellSize - origin)/cellSize).astype(np.int64) + 1
+
+    # Mark every cube that overlaps the enlarged bounding box of a polygon.
+    cellMin = np.floor((polyMin - origin)/cellSize).astype(np.int64)
+    cellSpan = np.floor((polyMax - origin)/cellSize).astype(np.int64) - cellMin + 1
+    isNear = np.zeros(shape, dtype=bool)
+    _markCells(isNear, cellMin, cellSpan)
+
+    # The connected regions of cubes that are not near. Neighboring cubes share a face.
+    regionLabels, regionNum = scipy.ndimage.label(~isNear)
+    isOutsideBox = np.any((sourcePoints < boxMin) | (sourcePoints > boxMax), axis=1)
+    insideBoxIds = np.flatnonzero(~isOutsideBox)
+    pointCells = np.floor((sourcePoints[insideBoxIds] - origin)/cellSize).astype(np.int64)
+    pointLabels = regionLabels[pointCells[:,0], pointCells[:,1], pointCells[:,2]]
+
+    farIds = insideBoxIds[pointLabels > 0]
+    farLabels = pointLabels[pointLabels > 0]
+    order = np.argsort(farLabels, kind='stable')
+    regionStarts = np.unique(farLabels[order], return_index=True)[1]
+    regionIds = np.split(farIds[order], regionStarts[1:]) if len(farIds) > 0 else []
+    outsideBoxIds = np.flatnonzero(isOutsideBox)
+    if len(outsideBoxIds) > 0:
+        regionIds.append(outsideBoxIds)
+
+    broadPhase = {'nearIds': insideBoxIds[pointLabels == 0],
+                  'regionIds': regionIds,
+                  'statistics': {'outsideBoxNum': len(outsideBoxIds),
+                                 'farNum': len(farIds),
+                                 'prunedNum': len(outsideBoxIds) + len(farIds),
+                                 'regionNum': len(regionIds),
+                                 'cellSize': cellSize}}
+    return broadPhase
+
+def _markCells(isCellMarked, cellMin, cellSpan, maxLoopSpan=4):
+    """
+    Mark the blocks of cells of a 3D grid.
+
+    Most blocks are only a few cells long, so each cell of the blocks is marked by looping over the positions in a block, and marking that position in every block at once.
+    The blocks that are longer than ``maxLoopSpan`` are expanded into a list of their cells instead.
+
+    ..NOTE:: This function updates ``isCellMarked`` by reference.
+
+    :param isCellMarked: array (3D) of bool, The grid.
+    :param cellMin: array nx3, The indices of the first cell of each block.
+    :param cellSpan: array nx3, The number of cells in each block along each axis.
+    :return:
+    """
+    isSmall = np.all(cellSpan <= maxLoopSpan, axis=1)
+    smallMin, smallMax = cellMin[isSmall], cellMin[isSmall] + cellSpan[isSmall] - 1
+    loopSpan = cellSpan[isSmall].max(axis=0) if np.any(isSmall) else np.zeros(3, dtype=np.int64)
+    for i in range(loopSpan[0]):
+        for j in range(loopSpan[1]):
+            for k in range(loopSpan[2]):
+                cellIndices = np.minimum(smallMin + [i, j, k], smallMax) # The blocks that are shorter than the loop mark their last cell again.
+                isCellMarked[cellIndices[:,0], cellIndices[:,1], cellIndices[:,2]] = True
+
+    cellNums = np.prod(cellSpan[~isSmall], axis=1)
+    blockIndices = np.repeat(np.flatnonzero(~isSmall), cellNums)
+    localIndices = np.arange(len(blockIndices)) - np.repeat(np.cumsum(cellNums) - cellNums, cellNums)
+    span = cellSpan[blockIndices]
+    cellIndices = cellMin[blockIndices] + np.column_stack([localIndices//(span[:,1]*span[:,2]), localIndices//span[:,2] % span[:,1], localIndices % span[:,2]])
+    isCellMarked[cellIndices[:,0], cellIndices[:,1], cellIndices[:,2]] = True
+    return
+
+def _getDistances(distFilter, points):
+    """
+    Calculate the signed distances of the points with one call to ``distFilter.FunctionValue``.
+
+    :param distFilter: vtkImplicitPolyDataDistance object, The distance function, with its input already set.
+    :param points: array nx3, The points. The vtk array that is given to ``FunctionValue`` is a view of this array.
+    :return: array 1xn, The signed distances.
+    """
+    distances = vtk.vtkDoubleArray()
+    distFilter.FunctionValue(numpy_support.numpy_to_vtk(points, deep=False), distances)
+    return numpy_support.vtk_to_numpy(distances).copy() # The copy is owned by numpy, so it does not depend on 'distances'
+
+def _getTargetDistances(pointArrays, targetPolydatas, processNum, chunkSize):
+    """
+    Calculate the signed distances of an array of points to each target surface (see ``getSignedDistances``).
+    One pool of processes calculates the distances for all of the targets.
+
+    :param pointArrays: list, The points (array nx3) for each target.
+    :param targetPolydatas: list, The target surfaces (vtkPolyData objects).
+    :param processNum: int or None, The number of processes (see ``getSignedDistances``).
+    :param chunkSize: int, The number of points in each chunk.
+    :return: list, The signed distances (array 1xn) for each target.
+    """
+    pointArrays = [np.ascontiguousarray(points, dtype=float).reshape(-1, 3) for points in pointArrays]
+    if processNum is None:
+        processNum = os.cpu_count() or 1
+    chunks = [(targetIndex, start) for targetIndex, points in enumerate(pointArrays) for start in range(0, len(points), chunkSize)]
+
+    if processNum <= 1 or len(chunks) <= 1:
+        allDistances = []
+        for points, targetPolydata in zip(pointArrays, targetPolydatas):
+            distFilter = vtk.vtkImplicitPolyDataDistance()
+            distFilter.SetInput(targetPolydata)
+            allDistances.append(_getDistances(distFilter, points))
+        return allDistances
+
+    targetSurfaces = []
+    for targetPolydata in targetPolydatas:
+        targetPolys = targetPolydata.GetPolys()
+        targetSurfaces.append([getPointArray(targetPolydata), numpy_support.vtk_to_numpy(targetPolys.GetOffsetsArray()), numpy_support.vtk_to_numpy(targetPolys.GetConnectivityArray())])
+    allDistances = [np.empty(len(points)) for points in pointArrays]
+    with concurrent.futures.ProcessPoolExecutor(processNum, initializer=_initializeProcess, initargs=(targetSurfaces,)) as executor:
+        chunkDistances = executor.map(_getProcessDistances, [(targetIndex, pointArrays[targetIndex][start:start + chunkSize]) for targetIndex, start in chunks])
+        for (targetIndex, start), chunk in zip(chunks, chunkDistances):
+            allDistances[targetIndex][start:start + len(chunk)] = chunk
+    return allDistances
+
+_processDistFilters = [] #: list, The distance function (vtkImplicitPolyDataDistance object) of each target surface in a process of the pool that ``_getTargetDistances`` creates.
+
+def _initializeProcess(targetSurfaces):
+    """
+    Build the target surfaces and their distance functions in a process of the pool. This runs once in each process.
+
+    :param targetSurfaces: list, [points, polyOffsets, polyConnectivity] for each target surface, i.e. the points (array nx3), the offsets of the polygons (array 1x(m+1), see ``vtkCellArray.GetOffsetsArray``), and the pointIds of the polygons (array 1xk, see ``vtkCellArray.GetConnectivityArray``).
+    :return:
+    """
+    idType = numpy_support.get_vtk_to_numpy_typemap()[vtk.VTK_ID_TYPE]
+    for targetPoints, polyOffsets, polyConnectivity in targetSurfaces:
+        points = vtk.vtkPoints()
+        points.SetData(numpy_support.numpy_to_vtk(targetPoints, deep=True))
+        polys = vtk.vtkCellArray()
+        polys.SetData(numpy_support.numpy_to_vtkIdTypeArray(np.ascontiguousarray(polyOffsets, dtype=idType), deep=True),
+                      numpy_support.numpy_to_vtkIdTypeArray(np.ascontiguousarray(polyConnectivity, dtype=idType), deep=True))
+        targetPolydata = vtk.vtkPolyData()
+        targetPolydata.SetPoints(points)
+        targetPolydata.SetPolys(polys)
+        distFilter = vtk.vtkImplicitPolyDataDistance()
+        distFilter.SetInput(targetPolydata)
+        _processDistFilters.append(distFilter)
+    return
+
+def _getProcessDistances(chunk):
+    """
+    Calculate the signed distances of a chunk of points in a process of the pool.
+
+    :param chunk: [int, array nx3], The index of the target surface, and the points.
+    :return: array 1xn, The signed distances.
+    """
+    targetIndex, points = chunk
+    return _getDistances(_processDistFilters[targetIndex], np.ascontiguousarray(points))
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+# Custom modules/functions
+import SignedDistance
+import StlLoader
+
+def example():
+    # Precompute a narrow-band distance grid around the tibia, then use it to find the ligament's insertion.
+    targetSurfaceFileName = 'dat/oks003_MRC_TBB_SKC_LVTIT_01.stl'
+    targetSurface = StlLoader.loadStlSurface(targetSurfaceFileName)
+    sourceSurface = StlLoader.loadStlSurface('dat/oks003_ACL_AGS_LVTIT.stl')
+    with tempfile.TemporaryDirectory() as cacheDir:
+        for i in range(2): # The second grid is loaded from the cache.
+            startTime = time.time()
+            grid = getDistanceGrid(targetSurfaceFileName, 1., bandWidth=3., cacheDir=cacheDir)
+            print(f"Grid of {grid['distances'].shape} nodes ready in {time.time() - startTime:.3f} s")
+        startTime = time.time()
+        distances, nodeIds = getPointIdsWithinDistance(grid, sourceSurface, 0.5, targetPolydata=targetSurface)
+        print(f'{len(nodeIds)} ligament nodes are within 0.5 of the tibia ({time.time() - startTime:.3f} s)')
+        del grid # Close the memory-mapped file before the directory is removed.
+    return
+
+def getDistanceGrid(fileName, cellSize, bandWidth=None, margin=None, cacheDir=None, processNum=None, slabSize=2**20):
+    """
+    Calculate the signed distance to the surface in the .stl file at the nodes of a uniform grid, so that the distances of many points can later be interpolated from the grid (see ``getGridDistances``).
+
+    The grid covers the surface's bounding box, enlarged by ``margin``. The nodes are calculated in slabs of about ``slabSize`` nodes, so the nodes' coordinates are never all in memory at once, and each slab is calculated with ``SignedDistance.getPointIdsWithinDistance`` (which splits the work between processes).
+    If ``bandWidth`` is given, then the grid is a narrow band: only the nodes that may be within ``bandWidth`` of the surface are calculated exactly, and the distances are limited to -``bandWidth`` to ``bandWidth``.
+
+    If ``cacheDir`` is given, then the grid is saved in that directory as a .npy file and a .json file. They are named with a hash of the .stl file's contents and of ``cellSize``, ``bandWidth``, and ``margin``, so the grid is only calculated again if one of those changes.
+    The distances of a saved grid are memory-mapped, so only the parts of the grid that are used are read from the disk.
+
+    :param fileName: string, The name of the .stl file that defines the surface.
+    :param cellSize: float, The distance between neighboring nodes of the grid.
+    :param bandWidth: float or None, The width of the narrow band. If None, then the distance of every node is calculated exactly.
+    :param margin: float or None, The distance that the grid extends past the surface's bounding box. If None, then ``bandWidth`` (or 2*``cellSize`` for a full grid) is used.
+    :param cacheDir: string or None, The directory that the grid is saved in. If None, then the grid is not saved.
+    :param processNum: int or None, The number of processes (see ``SignedDistance.getSignedDistances``).
+    :param slabSize: int, The approximate number of nodes that are calculated at once.
+    :return: dictionary, A dictionary with the following keys:
+        'distances': array (3D), The signed distance at each node. Node [i, j, k] is at ``origin + [i, j, k]*cellSize``.
+        'origin': array 1x3, The coordinates of node [0, 0, 0].
+        'cellSize': float, The distance between neighboring nodes.
+        'bandWidth': float or None, The width of the narrow band.
+        'margin': float, The distance that the grid extends past the surface's bounding box.
+        'fileHash': string, The hash of the .stl file's contents (see ``StlLoader.getFileHash``).
+    """
+    if margin is None:
+        margin = bandWidth if bandWidth is not None else 2*cellSize
+    fileHash = StlLoader.getFileHash(fileName)
+    if cacheDir is not None:
+        key = hashlib.blake2b(f'{fileHash};{cellSize!r};{bandWidth!r};{margin!r}'.encode('utf-8'), digest_size=20).hexdigest()
+        gridFileName = os.path.join(cacheDir, f'{key}.npy')
+        if os.path.isfile(os.path.join(cacheDir, f'{key}.json')):
+            with open(os.path.join(cacheDir, f'{key}.json'), mode='r') as fl:
+                grid = json.load(fl)
+            grid['origin'] = np.array(grid['origin'])
+            grid['distances'] = np.load(gridFileName, mmap_mode='r')
+            return grid
+        os.makedirs(cacheDir, exist_ok=True)
+
+    targetPolydata = StlLoader.loadStlSurface(fileName)
+    targetPoints = SignedDistance.getPointArray(targetPolydata)
+    origin = targetPoints.min(axis=0) - margin
+    shape = tuple(int(nodeNum) for nodeNum in np.floor((targetPoints.max(axis=0) + margin - origin)/cellSize) + 2) # The last node is past the enlarged bounding box.
+    if cacheDir is not None:
+        fileDescriptor, tempFileName = tempfile.mkstemp(dir=cacheDir, suffix='.npy')
+        os.close(fileDescriptor)
+        distances = np.lib.format.open_memmap(tempFileName, mode='w+', dtype=np.float64, shape=shape)
+    else:
+        distances = np.empty(shape)
+
+    # The grid is calculated one slab of nodes (a range of i) at a time.
+    slabNum = max(1, slabSize//(shape[1]*shape[2]))
+    j, k = [index.ravel() for index in np.meshgrid(np.arange(shape[1]), np.arange(shape[2]), indexing='ij')]
+    for slabStart in range(0, shape[0], slabNum):
+        i = np.arange(slabStart, min(slabStart + slabNum, shape[0]))
+        nodes = origin + cellSize*np.column_stack([np.repeat(i, len(j)), np.tile(j, len(i)), np.tile(k, len(i))])
+        if bandWidth is None:
+            slabDistances = SignedDistance.getSignedDistances(nodes, targetPolydata, processNum=processNum)
+        else:
+            slabDistances = np.clip(SignedDistance.getPointIdsWithinDistance(nodes, targetPolydata, bandWidth, processNum=processNum)[0], -bandWidth, bandWidth)
+        distances[i[0]:i[-1] + 1] = slabDistances.reshape((len(i),) + shape[1:])
+
+    manifest = {'origin': origin.tolist(),
+                'cellSize': cellSize,
+                'bandWidth': bandWidth,
+                'margin': margin,
+                'fileHash': fileHash}
+    if cacheDir is not None:
+        distances.flush()
+        del distances # Close the memory-mapped file before it is renamed.
+        os.replace(tempFileName, gridFileName)
+        # The .json file is written last, so a grid that was not completely written is not loaded.
+        with open(os.path.join(cacheDir, f'{key}.json'), mode='w') as fl:
+            json.dump(manifest, fl, indent=1)
+        distances = np.load(gridFileName, mmap_mode='r')
+
+    grid = dict(manifest, origin=origin, distances=distances)
+    return grid
+
+def getGridDistances(grid, sourcePoints):
+    """
+    Interpolate the signed distances of the source points from the nodes of a grid (see ``getDistanceGrid``), with trilinear interpolation.
+
+    The signed distance changes by at most the distance between two points, so the interpolated distance differs from the exact distance by at most the length of the diagonal of one cell of the grid (``sqrt(3)*cellSize``).
+    For a narrow band grid, this is true for the distance limited to -``bandWidth`` to ``bandWidth``.
+
+    :param grid: dictionary, The grid (see ``getDistanceGrid``).
+    :param sourcePoints: vtkPolyData object (or similar) or array nx3, The points.
+    :return: array 1xn, The interpolated signed distance of each point. The points outside of the grid are at least ``grid['margin']`` outside the surface, and their distance is ``np.inf``.
+    """
+    if not isinstance(sourcePoints, np.ndarray):
+        sourcePoints = SignedDistance.getPointArray(sourcePoints)
+    sourcePoints = np.asarray(sourcePoints, dtype=float).reshape(-1, 3)
+    distances = grid['distances']
+    shape = np.array(distances.shape)
+
+    position = (sourcePoints - grid['origin'])/grid['cellSize']
+    isInside = np.all((position >= 0) & (position <= shape - 1), axis=1)
+    position = position[isInside]
+    cell = np.minimum(np.floor(position).astype(np.int64), shape - 2) # The points on the last node use the last cell.
+    weight = position - cell
+
+    interpolated = np.zeros(len(position))
+    for corner in np.ndindex(2, 2, 2):
+        cornerWeight = np.prod(np.where(corner, weight, 1 - weight), axis=1)
+        interpolated += cornerWeight*distances[cell[:,0] + corner[0], cell[:,1] + corner[1], cell[:,2] + corner[2]]
+    gridDistances = np.full(len(sourcePoints), np.inf)
+    gridDistances[isInside] = interpolated
+    return gridDistances
+
+def getPointIdsWithinDistance(grid, sourcePoints, tolerance, targetPolydata=None, exactBand=None, processNum=None):
+    """
+    Get the pointIds of the source points whose signed distance to the grid's surface is less than or equal to ``tolerance`` (see ``SignedDistance.getPointIdsWithinDistance``), using the interpolated distances from the grid (see ``getGridDistances``).
+
+    If ``targetPolydata`` is given, then the exact distance is calculated for the points whose interpolated distance is within ``exactBand`` of ``tolerance``.
+    The default ``exactBand`` is the largest interpolation error, so the pointIds are the same as the pointIds from ``SignedDistance.getPointIdsWithinDistance``.
+
+    :param grid: dictionary, The grid (see ``getDistanceGrid``).
+    :param sourcePoints: vtkPolyData object (or similar) or array nx3, The source points.
+    :param tolerance: float, The maximum signed distance. For a narrow band grid, it must be between -``bandWidth`` and ``bandWidth``.
+    :param targetPolydata: vtkPolyData object or None, The surface that the grid was calculated from. If None, then only the interpolated distances are used.
+    :param exactBand: float or None, The points whose interpolated distance is within ``exactBand`` of ``tolerance`` are calculated exactly. If None, then the length of the diagonal of one cell is used.
+    :param processNum: int or None, The number of processes for the exact distances (see ``SignedDistance.getSignedDistances``).
+    :return: [array 1xn, array 1xk], The signed distance of each source point (interpolated, or exact near ``tolerance``), and the pointIds of the points that are within ``tolerance``.
+    """
+    if grid['bandWidth'] is not None and abs(tolerance) >= grid['bandWidth']:
+        raise ValueError(f"The tolerance {tolerance} is not inside the grid's narrow band of width {grid['bandWidth']}")
+    if not isinstance(sourcePoints, np.ndarray):
+        sourcePoints = SignedDistance.getPointArray(sourcePoints)
+    distances = getGridDistances(grid, sourcePoints)
+
+    if targetPolydata is not None:
+        if exactBand is None:
+            exactBand = np.sqrt(3)*grid['cellSize']
+        # The points outside the grid are only calculated if they could be within the tolerance.
+        exactIds = np.flatnonzero((np.abs(distances - tolerance) <= exactBand) | (np.isinf(distances) & (tolerance >= grid['margin'])))
+        distances[exactIds] = SignedDistance.getSignedDistances(np.asarray(sourcePoints).reshape(-1, 3)[exactIds], targetPolydata, processNum=processNum)
+    return distances, np.flatnonzero(distances <= tolerance)
+
+if __name__ == '__main__':
+    example()
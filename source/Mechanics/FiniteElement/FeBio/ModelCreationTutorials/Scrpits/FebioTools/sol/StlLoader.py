@@ -0,0 +1,191 @@
+import collections
+import hashlib
+import os
+import re
+import tempfile
+import time
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+stlDtype = np.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')]) #: numpy dtype, One triangle of a binary .stl file.
+maxCacheSize = 16 #: int, The maximum number of meshes that ``readStlMesh`` keeps in memory.
+
+_meshCache = collections.OrderedDict() #: OrderedDict, The meshes that were read by ``readStlMesh``. The keys are (file name, file size, modification time), and the most recently used mesh is last.
+
+def example():
+    # Load the three knee surfaces twice. The second time, the meshes are taken from the in-memory cache.
+    fileNames = ['dat/oks003_FMB_AGS_LVTIT.stl', 'dat/oks003_MRC_TBB_SKC_LVTIT_01.stl', 'dat/oks003_ACL_AGS_LVTIT.stl']
+    with tempfile.TemporaryDirectory() as cacheDir:
+        for i in range(2):
+            startTime = time.time()
+            surfaces = [loadStlSurface(fileName, cacheDir=cacheDir) for fileName in fileNames]
+            print(f'Loaded {sum(surface.GetNumberOfPoints() for surface in surfaces)} points in {time.time() - startTime:.4f} s')
+        # The meshes are also saved in 'cacheDir', so a new python session would load them from there.
+        _meshCache.clear()
+        startTime = time.time()
+        surfaces = [loadStlSurface(fileName, cacheDir=cacheDir) for fileName in fileNames]
+        print(f'Loaded {sum(surface.GetNumberOfPoints() for surface in surfaces)} points from the disk cache in {time.time() - startTime:.4f} s')
+    return
+
+def loadStlSurface(fileName, cacheDir=None):
+    """
+    This function loads a .stl file and returns vtkPolyData.
+
+    The file is read with ``readStlMesh``, and the polydata is a view of the mesh's arrays (see ``getPolydata``), so loading the same file again is fast.
+    The points and pointIds are the same as the output of ``vtkSTLReader``.
+
+    :param fileName: string, The name of the .stl file that is being loaded.
+    :param cacheDir: string or None, The directory of the on-disk cache (see ``readStlMesh``).
+    :return: vtkPolyData, The geometry that was in the .stl file.
+    """
+    return getPolydata(readStlMesh(fileName, cacheDir=cacheDir))
+
+def readStlMesh(fileName, cacheDir=None):
+    """
+    Read a binary or ASCII .stl file as an indexed mesh, i.e. an array of points and an array of the pointIds of each triangle.
+
+    The vertices of the triangles are merged, so each point is only stored once, and the points are in the order that they first appear in the file (the same as ``vtkSTLReader``). Triangles with a repeated point are removed.
+    A binary file is memory-mapped with the ``stlDtype`` structured dtype, and the vertices of an ASCII file are found with one regular expression and converted with one call to ``np.fromstring``.
+
+    The meshes are kept in memory (the ``maxCacheSize`` most recently used meshes), so reading the same file again does not read the file, as long as its size and modification time do not change.
+    If ``cacheDir`` is given, then each mesh is also saved in that directory as a .npz file, named with a hash of the file's contents, so that the mesh can be used again by a different python session.
+
+    ..NOTE:: The arrays of a cached mesh are shared by every call that reads the same file, so they are read-only.
+
+    :param fileName: string, The name of the .stl file.
+    :param cacheDir: string or None, The directory that the meshes are saved in. If None, then the meshes are only kept in memory.
+    :return: dictionary, A dictionary with the following keys:
+        'points': array nx3 (float32), The coordinates of the points. Row i is the point with pointId i.
+        'triangles': array mx3, The pointIds of each triangle.
+    """
+    fileStat = os.stat(fileName)
+    memoryKey = (os.path.abspath(fileName), fileStat.st_size, fileStat.st_mtime_ns)
+    if memoryKey in _meshCache.keys():
+        _meshCache.move_to_end(memoryKey)
+        return _meshCache[memoryKey]
+
+    mesh = None
+    if cacheDir is not None:
+        cacheFileName = os.path.join(cacheDir, f'{getFileHash(fileName)}.npz')
+        if os.path.isfile(cacheFileName):
+            with np.load(cacheFileName) as cacheFile:
+                mesh = {'points': cacheFile['points'], 'triangles': cacheFile['triangles']}
+    if mesh is None:
+        mesh = _getIndexedMesh(_readStlVertices(fileName))
+        if cacheDir is not None:
+            os.makedirs(cacheDir, exist_ok=True)
+            # The mesh is written to a temporary file that is then renamed, so a cache file is never partially written.
+            fileDescriptor, tempFileName = tempfile.mkstemp(dir=cacheDir, suffix='.npz')
+            with os.fdopen(fileDescriptor, mode='wb') as fl:
+                np.savez(fl, points=mesh['points'], triangles=mesh['triangles'])
+            os.replace(tempFileName, cacheFileName)
+
+    for array in mesh.values():
+        array.setflags(write=False)
+    _meshCache[memoryKey] = mesh
+    while len(_meshCache) > maxCacheSize: # Remove the least recently used meshes
+        _meshCache.popitem(last=False)
+    return mesh
+
+def getPolydata(mesh):
+    """
+    Create a vtkPolyData object from an indexed mesh (see ``readStlMesh``), without copying the arrays.
+
+    ..NOTE:: The vtk arrays are views of the mesh's arrays, so changing the polydata's points would change the mesh for every other polydata that uses it. Use ``vtkPolyData.DeepCopy`` before changing the points.
+
+    :param mesh: dictionary, The mesh, with the keys 'points' (array nx3 of float32) and 'triangles' (array mx3).
+    :return: vtkPolyData, The mesh as polydata with triangle cells.
+    """
+    idType = numpy_support.get_vtk_to_numpy_typemap()[vtk.VTK_ID_TYPE]
+    triangles = mesh['triangles']
+    if triangles.dtype != idType:
+        triangles = triangles.astype(idType)
+    offsets = np.arange(0, 3*len(triangles) + 1, 3, dtype=idType)
+
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(mesh['points']), deep=False)) # The vtk array keeps a reference to the numpy array.
+    polys = vtk.vtkCellArray()
+    polys.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets, deep=False), numpy_support.numpy_to_vtkIdTypeArray(np.ascontiguousarray(triangles).ravel(), deep=False))
+    polyData = vtk.vtkPolyData()
+    polyData.SetPoints(points)
+    polyData.SetPolys(polys)
+    return polyData
+
+def getFileHash(fileName):
+    """
+    Calculate a hash of the contents of a file.
+
+    :param fileName: string, The name of the file.
+    :return: string, The hash as hexadecimal text.
+    """
+    hashObject = hashlib.blake2b(digest_size=20)
+    with open(fileName, mode='rb') as fl:
+        for block in iter(lambda: fl.read(2**20), b''):
+            hashObject.update(block)
+    return hashObject.hexdigest()
+
+def _readStlVertices(fileName):
+    """
+    Read the vertices of the triangles in a binary or ASCII .stl file.
+
+    A file is binary if its size matches the number of triangles in its header (84 bytes, and then 50 bytes for each triangle).
+
+    :param fileName: string, The name of the .stl file.
+    :return: array (3m)x3 (float32), The coordinates of the three vertices of each triangle, one triangle after another.
+    """
+    fileSize = os.path.getsize(fileName)
+    if fileSize >= 84:
+        triangleNum = int(np.fromfile(fileName, dtype='<u4', count=1, offset=80)[0])
+        if fileSize == 84 + stlDtype.itemsize*triangleNum:
+            if triangleNum == 0:
+                return np.zeros((0, 3), dtype=np.float32)
+            triangles = np.memmap(fileName, dtype=stlDtype, mode='r', offset=84, shape=(triangleNum,))
+            return np.ascontiguousarray(triangles['vertices']).reshape(-1, 3)
+
+    with open(fileName, mode='rb') as fl:
+        text = fl.read()
+    if not text.lstrip().startswith(b'solid'):
+        raise ValueError(f"The file: '{fileName}' is not a binary or ASCII .stl file")
+    vertexText = re.findall(rb'vertex\s+(\S+\s+\S+\s+\S+)', text)
+    vertices = np.fromstring(b' '.join(vertexText).decode('ascii'), dtype=float, sep=' ').astype(np.float32) # The numbers are read as double, and then rounded to float32 like vtkSTLReader.
+    if len(vertices) % 9 != 0:
+        raise ValueError(f"The file: '{fileName}' has a facet that does not have three vertices")
+    return vertices.reshape(-1, 3)
+
+def _getIndexedMesh(vertices):
+    """
+    Merge the identical vertices of the triangles into points.
+
+    The vertices are sorted by their bits (two sort keys, so the sort does not compare bytes), and equal neighbors in the sorted order are the same point.
+    The points are numbered in the order that they first appear, which is the numbering of ``vtkSTLReader``.
+
+    :param vertices: array (3m)x3 (float32), The vertices of each triangle (see ``_readStlVertices``).
+    :return: dictionary, The mesh (see ``readStlMesh``).
+    """
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32) + np.float32(0) # Adding 0 changes -0.0 to 0.0, so they are merged.
+    if len(vertices) == 0:
+        return {'points': np.zeros((0, 3), dtype=np.float32), 'triangles': np.zeros((0, 3), dtype=np.int64)}
+    bits = vertices.view(np.uint32)
+    xyBits = (bits[:,0].astype(np.uint64) << np.uint64(32)) | bits[:,1]
+    order = np.lexsort((bits[:,2], xyBits)) # lexsort is stable, so the first vertex of each point is first.
+    isNew = np.ones(len(vertices), dtype=bool)
+    isNew[1:] = (xyBits[order[1:]] != xyBits[order[:-1]]) | (bits[order[1:],2] != bits[order[:-1],2])
+    sortedGroup = np.cumsum(isNew) - 1
+    firstVertex = order[isNew] # The index of the first vertex of each point, in sorted order.
+
+    # Number the points in the order that they first appear.
+    pointOrder = np.argsort(firstVertex, kind='stable')
+    pointIds = np.empty(len(pointOrder), dtype=np.int64)
+    pointIds[pointOrder] = np.arange(len(pointOrder))
+    vertexPointIds = np.empty(len(vertices), dtype=np.int64)
+    vertexPointIds[order] = pointIds[sortedGroup]
+
+    triangles = vertexPointIds.reshape(-1, 3)
+    isDegenerate = (triangles[:,0] == triangles[:,1]) | (triangles[:,0] == triangles[:,2]) | (triangles[:,1] == triangles[:,2])
+    mesh = {'points': vertices[firstVertex[pointOrder]],
+            'triangles': triangles[~isDegenerate]}
+    return mesh
+
+if __name__ == '__main__':
+    example()
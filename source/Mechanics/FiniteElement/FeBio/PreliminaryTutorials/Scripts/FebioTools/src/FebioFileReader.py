@@ -0,0 +1,314 @@
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import numpy as np
+
+# Custom modules/functions
+import FebioPart
+import FebioModelAssembly
+import FebioFileWriter
+
+def example():
+    # Read the model from FebioModelAssemblyExample.py. 'ModelAssemblyExample.feb' includes the file 'BoxGeometry.xml', which is read as well.
+    with tempfile.TemporaryDirectory() as directory:
+        modelAssembly = readModelAssembly(writeExampleModel(directory))
+    for partName in modelAssembly.parts.keys():
+        part = modelAssembly.parts[partName]
+        print(f"{partName}: {len(part.nodes)} nodes, {len(part.elements)} elements, materialId {part.materialId}, nodeSets {list(part.nodeSets.keys())}")
+    return
+
+def writeExampleModel(directory):
+    """
+    Write the model from FebioModelAssemblyExample.py to a directory, so the examples have a file to read.
+    'BoxGeometry.xml' is written with ``FebioFileWriter.streamGeometryWriter``, and 'ModelAssemblyExample.feb' (which includes 'BoxGeometry.xml') is copied from the directory of this module.
+
+    :param directory: string, The directory that the files are written to.
+    :return: string, The name of the .feb file in ``directory``.
+    """
+    part0 = FebioPart.Part('part0')
+    part0.setNodes(np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0], [0.0, 1.0, 1.0]]))
+    part0.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part0.setMaterialId(1)
+    part0.addNodeSet([0, 1, 4, 5], 'part0FixedNodeSet')
+    part0.addNodeSet([3, 2, 7, 6], 'part0TiedNodeSet')
+    part1 = FebioPart.Part('part1')
+    part1.setNodes(np.array([[0.0, 1.1, 0.0], [1.0, 1.1, 0.0], [1.0, 2.0, 0.0], [0.0, 2.0, 0.0], [0.0, 1.1, 1.0], [1.0, 1.1, 1.0], [1.0, 2.0, 1.0], [0.0, 2.0, 1.0]]))
+    part1.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part1.setMaterialId(2)
+    part1.addNodeSet([2, 3, 6, 7], 'part1LoadedNodeSet')
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    modelAssembly.addPart(part0)
+    modelAssembly.addPart(part1)
+
+    FebioFileWriter.streamGeometryWriter(modelAssembly, os.path.join(directory, 'BoxGeometry.xml'))
+    fileName = os.path.join(directory, 'ModelAssemblyExample.feb')
+    shutil.copyfile(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ModelAssemblyExample.feb'), fileName)
+    return fileName
+
+def readGeometry(fileName, chunkSize=10000, compression=None):
+    """
+    Read the node, element, and nodeSet definitions from a .feb file, including the files that are included with an 'Include' xml-element.
+    The file can be compressed (see ``FebioFileWriter.openFile``), and the nodeSets can be written with either 'node' xml-elements or as comma separated lists.
+    Both the 'Geometry' layout of FEBio file formats before version 3.0 and the 'Mesh' and 'MeshDomains' layout of version 3.0 and later are read (see ``FebioFileWriter.getGeometryElement``).
+
+    The file is read twice with ``xml.etree.ElementTree.iterparse``. The first pass counts the nodes and elements, so the arrays can be allocated, and the second pass fills the arrays ``chunkSize`` rows at a time.
+    The xml-elements are removed from memory as soon as they are read, so the memory that is used is close to the size of the arrays, even for very large files.
+
+    :param fileName: string, The name of the .feb file.
+    :param chunkSize: int, The number of rows that are read before they are converted into numbers and removed from memory.
+    :param compression: string or None, The compression of the file (see ``FebioFileWriter.openFile``). If None, then it is chosen from the fileName's extension.
+    :return: dictionary, A dictionary with the following keys:
+        'nodeIds': array 1xn, The nodeId of each node, in the order that the nodes are defined.
+        'nodes': array nx3, The coordinates of each node.
+        'nodeBlocks': list, The number of nodes in each 'Nodes' xml-element.
+        'elementBlocks': list, A dictionary for each 'Elements' xml-element, with the keys 'attributes' (the xml-attributes, e.g. {'mat': '1', 'type': 'hex8'}), 'elementIds' (array 1xm) and 'elements' (array mxk, the nodeIds of each element's nodes).
+        'nodeSets': dictionary, The keys are the names of the nodeSets and the values are arrays of the nodeIds.
+        'domains': dictionary, The keys are the names of the 'SolidDomain' xml-elements in the 'MeshDomains' xml-element and the values are their xml-attributes (e.g. {'name': 'part0', 'mat': '1'}).
+    """
+    # First pass: count the rows of each 'Nodes', 'Elements', and 'NodeSet' xml-element.
+    blocks = []
+    domains = {}
+    for kind, value, text in _iterGeometry(fileName, chunkSize, compression):
+        if kind == 'SolidDomain':
+            domains[value.get('name')] = value
+        elif kind in ('Nodes', 'Elements', 'NodeSet'):
+            blocks.append({'kind': kind, 'attributes': value, 'rowNum': 0, 'columnNum': 0})
+        elif kind == 'nodeList':
+            blocks[-1]['rowNum'] += text.count(',') + 1
+        else:
+            blocks[-1]['rowNum'] += 1
+            if kind == 'elem' and blocks[-1]['columnNum'] == 0:
+                blocks[-1]['columnNum'] = text.count(',') + 1
+
+    # Allocate the arrays.
+    nodeBlocks = [block['rowNum'] for block in blocks if block['kind'] == 'Nodes']
+    geometry = {'nodeIds': np.empty(sum(nodeBlocks), dtype=np.int64),
+                'nodes': np.empty((sum(nodeBlocks), 3)),
+                'nodeBlocks': nodeBlocks,
+                'elementBlocks': [],
+                'nodeSets': {},
+                'domains': domains}
+    for block in blocks:
+        if block['kind'] == 'Nodes':
+            block['ids'] = geometry['nodeIds']
+            block['values'] = geometry['nodes']
+        elif block['kind'] == 'Elements':
+            elementBlock = {'attributes': block['attributes'],
+                            'elementIds': np.empty(block['rowNum'], dtype=np.int64),
+                            'elements': np.empty((block['rowNum'], block['columnNum']), dtype=np.int64)}
+            geometry['elementBlocks'].append(elementBlock)
+            block['ids'] = elementBlock['elementIds']
+            block['values'] = elementBlock['elements']
+        else:
+            name = block['attributes'].get('name')
+            if name in geometry['nodeSets'].keys():
+                raise KeyError(f"The nodeSet name: '{name}' is defined more than once in '{fileName}'")
+            geometry['nodeSets'][name] = np.empty(block['rowNum'], dtype=np.int64)
+            block['ids'] = geometry['nodeSets'][name]
+            block['values'] = None
+
+    # Second pass: fill the arrays. All of the 'Nodes' xml-elements share one array, so 'nodeRow' is the next row of that array.
+    blockIndex = -1
+    nodeRow = 0
+    ids = []
+    texts = []
+    for kind, value, text in _iterGeometry(fileName, chunkSize, compression):
+        if kind == 'SolidDomain':
+            continue
+        if kind in ('Nodes', 'Elements', 'NodeSet'):
+            nodeRow = _fillRows(blocks[blockIndex], ids, texts, nodeRow) if blockIndex >= 0 else nodeRow
+            blockIndex += 1
+            continue
+        if kind == 'nodeList':
+            nodeRow = _fillRows(blocks[blockIndex], ids, texts, nodeRow)
+            nodeSet = blocks[blockIndex]['ids']
+            start = blocks[blockIndex].get('nextRow', 0)
+            values = np.fromstring(text, dtype=np.int64, sep=',')
+            if len(values) != text.count(',') + 1:
+                raise ValueError(f"The nodeSet: '{blocks[blockIndex]['attributes'].get('name')}' must be a comma separated list of nodeIds")
+            nodeSet[start:start + len(values)] = values
+            blocks[blockIndex]['nextRow'] = start + len(values)
+            continue
+        ids.append(value)
+        texts.append(text)
+        if len(ids) >= chunkSize:
+            nodeRow = _fillRows(blocks[blockIndex], ids, texts, nodeRow)
+    if blockIndex >= 0:
+        _fillRows(blocks[blockIndex], ids, texts, nodeRow)
+    return geometry
+
+def readModelAssembly(fileName, chunkSize=10000, compression=None):
+    """
+    Read a .feb file (see ``readGeometry``) and rebuild the parts and the model assembly.
+
+    Each 'Elements' xml-element becomes a part. The part is named with the 'name' (or 'elset') xml-attribute if it has one, otherwise it is named 'part0', 'part1', etc.
+    If the file has one 'Nodes' xml-element for each 'Elements' xml-element, then they define the parts' nodes in the same order. Otherwise (e.g. files that are written by ``FebioFileWriter``), a node belongs to the first part whose elements use it, and a node that no element uses belongs to the same part as the node before it.
+    A part's elements can also use the nodes of the parts before it (e.g. after ``FebioNodeMerging.mergeCoincidentNodes``), but not the nodes of the parts after it.
+    Each nodeSet is added to the part that contains its last node.
+    The part's materialId is the 'mat' xml-attribute of the 'Elements' xml-element, or, if it has none, of the 'SolidDomain' xml-element with the part's name.
+
+    ..NOTE:: The nodes and elements are renumbered consecutively by ``ModelAssembly.addPart``, in the order that they are defined in the file.
+
+    :param fileName: string, The name of the .feb file.
+    :param chunkSize: int, The number of rows that are read at once (see ``readGeometry``).
+    :param compression: string or None, The compression of the file (see ``FebioFileWriter.openFile``).
+    :return: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly. The parts' node arrays are views of one array.
+    """
+    geometry = readGeometry(fileName, chunkSize=chunkSize, compression=compression)
+    nodeIds = geometry['nodeIds']
+    elementBlocks = geometry['elementBlocks']
+
+    # The row in geometry['nodes'] of each nodeId.
+    isConsecutive = len(nodeIds) > 0 and np.all(np.diff(nodeIds) == 1) # e.g. files that are written by ``FebioFileWriter``
+    if isConsecutive:
+        order, sortedIds = None, None
+    else:
+        order = np.argsort(nodeIds, kind='stable')
+        sortedIds = nodeIds[order]
+        if np.any(sortedIds[1:] == sortedIds[:-1]):
+            raise ValueError(f"A nodeId is defined more than once in '{fileName}'")
+    def getRows(ids):
+        if isConsecutive:
+            rows = ids - nodeIds[0]
+            isDefined = (rows >= 0) & (rows < len(nodeIds))
+        else:
+            index = np.clip(np.searchsorted(sortedIds, ids), 0, max(len(sortedIds) - 1, 0))
+            rows = order[index] if len(sortedIds) > 0 else index
+            isDefined = (sortedIds[index] == ids) if len(sortedIds) > 0 else np.zeros(np.shape(ids), dtype=bool)
+        if not np.all(isDefined):
+            raise KeyError(f"A node that is used in '{fileName}' is not defined in the 'Nodes' xml-element")
+        return rows
+    elementRows = [getRows(elementBlock['elements']) for elementBlock in elementBlocks]
+
+    # The first row of each part's nodes.
+    if len(geometry['nodeBlocks']) == len(elementBlocks):
+        partStarts = np.concatenate([[0], np.cumsum(geometry['nodeBlocks'])[:-1]]).astype(int)
+    else:
+        # The index of the first part that uses each node. The parts are assigned in reverse order, so the first part's index is assigned last.
+        nodePart = np.full(len(nodeIds), len(elementBlocks), dtype=np.int64)
+        for i in reversed(range(len(elementBlocks))):
+            nodePart[elementRows[i].ravel()] = i
+        # A node that is not used belongs to the same part as the node before it (or the first part).
+        lastUsedRow = np.maximum.accumulate(np.where(nodePart < len(elementBlocks), np.arange(len(nodeIds)), -1))
+        nodePart = np.where(lastUsedRow >= 0, nodePart[np.maximum(lastUsedRow, 0)], 0)
+        if np.any(np.diff(nodePart) < 0):
+            i = int(nodePart[np.flatnonzero(np.diff(nodePart) < 0)[0] + 1])
+            raise ValueError(f"The elements in 'Elements' xml-element {i} use nodes that belong to a different part")
+        partStarts = np.searchsorted(nodePart, np.arange(len(elementBlocks)), side='left')
+    partStops = np.append(partStarts[1:], len(nodeIds))
+
+    nodeSetParts = {}
+    partIndex = 0
+    for name in geometry['nodeSets'].keys():
+        rows = getRows(geometry['nodeSets'][name])
+        if len(rows) > 0: # An empty nodeSet is added to the same part as the previous nodeSet.
+            partIndex = int(np.searchsorted(partStarts, rows.max(), side='right')) - 1
+        nodeSetParts[name] = (partIndex, rows)
+
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    for i, elementBlock in enumerate(elementBlocks):
+        attributes = elementBlock['attributes']
+        if attributes.get('type', 'hex8') != 'hex8':
+            raise ValueError(f"The element type: '{attributes.get('type')}' is not supported. Only 'hex8' elements can be added to a part.")
+        rows = elementRows[i]
+        if len(rows) > 0 and rows.max() >= partStops[i]:
+            raise ValueError(f"The elements in 'Elements' xml-element {i} use nodes that belong to a different part")
+
+        # The elements and nodeSets are given the model's nodeIds (row + 1), because they can use the nodes of the previous parts.
+        part = FebioPart.Part(attributes.get('name', attributes.get('elset', f'part{i}')))
+        part.setNodes(geometry['nodes'][partStarts[i]:partStops[i]])
+        part.setElements(rows + 1)
+        materialId = attributes.get('mat', geometry['domains'].get(part.name, {}).get('mat'))
+        part.setMaterialId(int(materialId) if materialId is not None and materialId.isdigit() else materialId)
+        for name in nodeSetParts.keys():
+            setPartIndex, setRows = nodeSetParts[name]
+            if setPartIndex != i:
+                continue
+            part.addNodeSet(setRows + 1, name)
+        modelAssembly.addPart(part, updateNodeIds=False)
+    return modelAssembly
+
+def _iterGeometry(fileName, chunkSize, compression=None):
+    """
+    Iterate over the geometry definitions in a .feb file, and the files that it includes, without keeping the xml-elements in memory.
+
+    :param fileName: string, The name of the .feb file.
+    :param chunkSize: int, The number of rows that are read before their xml-elements are removed from memory.
+    :param compression: string or None, The compression of the file. The compression of an included file is chosen from its extension.
+    :return: generator, Yields the tuple (kind, value, text) where 'kind' is one of:
+        'Nodes', 'Elements', 'NodeSet': The start of the xml-element. 'value' is its xml-attributes and 'text' is None.
+        'node', 'elem': A row in the previous 'Nodes', 'Elements', or 'NodeSet' xml-element. 'value' is the id xml-attribute and 'text' is the xml-element's text.
+        'nodeList': The nodeIds of the previous 'NodeSet' xml-element, as a comma separated list. 'value' is None and 'text' is the list.
+        'SolidDomain': A 'SolidDomain' xml-element in the 'MeshDomains' xml-element. 'value' is its xml-attributes and 'text' is None.
+    """
+    with FebioFileWriter.openFile(fileName, mode='rb', compression=compression) as fl:
+        yield from _iterXmlElements(fl, os.path.dirname(fileName), chunkSize)
+    return
+
+def _iterXmlElements(fileHandle, directory, chunkSize):
+    """
+    See ``_iterGeometry``.
+
+    :param fileHandle: file object, The opened .feb file.
+    :param directory: string, The directory that the names of included files are relative to.
+    :param chunkSize: int, The number of rows that are read before their xml-elements are removed from memory.
+    :return: generator, See ``_iterGeometry``.
+    """
+    openElements = [] # The xml-elements that have been started but not ended.
+    readNum = 0 # The number of rows in the current block that have been read but not removed.
+    for event, xmlElement in ET.iterparse(fileHandle, events=('start', 'end')):
+        if event == 'start':
+            if xmlElement.tag in ('Nodes', 'Elements', 'NodeSet') and len(openElements) > 0 and openElements[-1].tag in ('Geometry', 'Mesh'):
+                readNum = 0
+                yield xmlElement.tag, dict(xmlElement.attrib), None
+            openElements.append(xmlElement)
+            continue
+
+        openElements.pop()
+        parentTag = openElements[-1].tag if len(openElements) > 0 else None
+        if xmlElement.tag in ('node', 'elem') and parentTag in ('Nodes', 'Elements', 'NodeSet'):
+            yield xmlElement.tag, int(xmlElement.get('id')), xmlElement.text
+            readNum += 1
+            if readNum >= chunkSize: # Remove the rows that have been read. They are always the first children of the block.
+                del openElements[-1][:readNum]
+                readNum = 0
+        elif xmlElement.tag == 'NodeSet' and parentTag in ('Geometry', 'Mesh') and xmlElement.text is not None and xmlElement.text.strip() != '':
+            yield 'nodeList', None, xmlElement.text
+        elif xmlElement.tag == 'SolidDomain' and parentTag == 'MeshDomains':
+            yield xmlElement.tag, dict(xmlElement.attrib), None
+        elif xmlElement.tag == 'Include' and len(openElements) == 1:
+            yield from _iterGeometry(os.path.join(directory, xmlElement.text.strip()), chunkSize)
+
+        if len(openElements) == 1: # Remove the top level xml-elements (e.g. 'Geometry') once they have been read.
+            del openElements[0][:]
+    return
+
+def _fillRows(block, ids, texts, nodeRow):
+    """
+    Convert the rows that have been read into numbers, and store them in the block's arrays. ``ids`` and ``texts`` are emptied.
+
+    :param block: dictionary, The block (see ``readGeometry``).
+    :param ids: list, The id of each row.
+    :param texts: list, The text of each row.
+    :param nodeRow: int, The next row of the nodes array.
+    :return: int, The next row of the nodes array.
+    """
+    if len(ids) == 0:
+        return nodeRow
+    start = nodeRow if block['kind'] == 'Nodes' else block.get('nextRow', 0)
+    stop = start + len(ids)
+    if block['values'] is not None: # A nodeSet only has ids.
+        dtype = float if block['kind'] == 'Nodes' else np.int64
+        values = np.fromstring(','.join(texts), dtype=dtype, sep=',')
+        if values.size != block['values'][start:stop].size:
+            raise ValueError(f"Each row of the '{block['kind']}' xml-element must have {block['values'].shape[1]} comma separated values")
+        block['values'][start:stop] = values.reshape((len(ids), -1))
+    block['ids'][start:stop] = ids
+    block['nextRow'] = stop
+    del ids[:]
+    del texts[:]
+    return stop if block['kind'] == 'Nodes' else nodeRow
+
+if __name__ == '__main__':
+    example()
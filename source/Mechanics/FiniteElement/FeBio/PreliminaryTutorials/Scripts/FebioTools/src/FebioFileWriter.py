@@ -1,46 +1,82 @@
+import collections
+import concurrent.futures
+import gzip
+import io
+import os
+import tempfile
+import numpy as np
 import xml.etree.ElementTree as ET
 import xml.dom.minidom
 
-def getGeometryElement(modelAssembly):
+def getGeometryElement(modelAssembly, compactNodeSets=False, version='2.5'):
     """
     Define the ``Geometry`` element from the given modelAssembly.
     The ``Geometry`` element defines the geometry for a Febio finite element model.
 
+    The layout depends on the FEBio file format ``version`` of the file that the element is written to:
+        Before 3.0, a 'Geometry' xml-element with one 'Nodes' xml-element, and an 'Elements' xml-element for each part that has the part's materialId as its 'mat' xml-attribute.
+        From 3.0, a 'Mesh' xml-element with a 'Nodes' xml-element and an 'Elements' xml-element for each part, both named with the part's name. The parts' materials are assigned in the 'MeshDomains' xml-element (see ``getMeshDomainsElement``).
+    A part with no nodes (e.g. after ``FebioNodeMerging.mergeCoincidentNodes``) does not have a 'Nodes' xml-element in the 'Mesh' layout.
+
     :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The object that stores the model's geometry information.
+    :param compactNodeSets: bool, Whether the nodeSets are written as comma separated lists (see ``getNodeSetElement``). This needs a ``version`` of 3.0 or later.
+    :param version: string, The FEBio file format version, i.e. the 'version' xml-attribute of the 'febio_spec' root xml-element.
     :return: xml.etree.ElementTree.Element instance, An xml-element that is populated with the geometry data.
     """
+    isMeshLayout = _isMeshLayout(version, compactNodeSets)
     # Define an xml-element that will be used as the parent to the 'Nodes' and 'Elements' xml-elements.
-    geometryElement = ET.Element('Geometry')
+    geometryElement = ET.Element('Mesh' if isMeshLayout else 'Geometry')
 
     # Create the 'Nodes' xml-element
     nodesXmlElement = ET.Element('Nodes')  # Create an element with 'Nodes' as the tag.
+    nodesList = [nodesXmlElement] # The 'Nodes' xml-elements. The 'Mesh' layout has one for each part instead.
     elementsList = [] # Initialize a list of the xml-elements that define finite element model's elements.
 
     # Populate the xml-elements with each part's data
     for partName in modelAssembly.parts.keys():
+        if isMeshLayout:
+            nodesXmlElement = ET.Element('Nodes', {'name': partName})
+            if len(modelAssembly.nodeIds[partName]) > 0:
+                nodesList.append(nodesXmlElement)
         for i, nodeId in enumerate(modelAssembly.nodeIds[partName]): # Iterate over the part's nodeIds
             nodesXmlChild = getNodeXmlElement(nodeId, modelAssembly.parts[partName].nodes[i])  # Create the xml-element for the node
             nodesXmlElement.append(nodesXmlChild)  # Add 'nodesXmlChild' as a child element to the 'nodesXmlElement' element.
 
-        xmlElementData = {'mat': str(modelAssembly.parts[partName].materialId), 'type': 'hex8'}  # Define the XML-attributes that will be used for the 'Elements' XML-element
+        xmlElementData = _getElementsAttributes(modelAssembly.parts[partName], isMeshLayout)  # Define the XML-attributes that will be used for the 'Elements' XML-element
         elementsXmlElements = ET.Element('Elements', xmlElementData) # Create the 'Elements' xml-element for this part's elements.
         elementsList.append(elementsXmlElements)
         for i, elementId in enumerate(modelAssembly.elementIds[partName]): # Iterate over the part's elementIds
             elementXmlElement = getElemXmlElement(elementId, modelAssembly.parts[partName].elements[i])
             elementsXmlElements.append(elementXmlElement)
 
-    geometryElement.append(nodesXmlElement) # Add the nodesXmlElement to the geometry xml-element
+    for nodesXmlElement in nodesList[1:] if isMeshLayout else nodesList: geometryElement.append(nodesXmlElement) # Add the 'Nodes' xml-elements to the geometry xml-element
     for elem in elementsList: geometryElement.append(elem) # Add the elements to the geometry xml-element
 
     # Check if there are any nodeSets, then add them to the geometry element.
     for nodeSetName in modelAssembly.nodeSetNames: # Iterate over the nodeSet names
-        for part in modelAssembly.parts: # Iterate over the keys in 'modelAssembly.parts'
-            if nodeSetName in modelAssembly.parts[part].nodeSets.keys(): # Check if the 'part' contains a nodeSet with the key 'nodeSetName'
-                nodeSetElement = getNodeSetElement(modelAssembly.parts[part].nodeSets[nodeSetName], nodeSetName) # Create the nodeSet xml-element
-                geometryElement.append(nodeSetElement) # Append the nodeSet xml-element to the geometry xml-element
+        nodeSetElement = getNodeSetElement(modelAssembly.getNodeSet(nodeSetName), nodeSetName, compact=compactNodeSets) # Create the nodeSet xml-element
+        geometryElement.append(nodeSetElement) # Append the nodeSet xml-element to the geometry xml-element
 
     return geometryElement
 
+def getMeshDomainsElement(modelAssembly):
+    """
+    Define the 'MeshDomains' element of the FEBio 3.0 (and later) file format, which assigns a material to each part's elements (see ``getGeometryElement``).
+    The resulting element will be similar to the following
+        <MeshDomains>
+          <SolidDomain name="part0" mat="1"/>
+        </MeshDomains>
+
+    ..NOTE:: The 'mat' xml-attribute is the part's materialId, and FEBio finds the material by its name, so the 'material' xml-elements must be named with the materialIds.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The object that stores the model's geometry information.
+    :return: xml.etree.ElementTree.Element instance, The 'MeshDomains' xml-element.
+    """
+    meshDomainsElement = ET.Element('MeshDomains')
+    for partName in modelAssembly.parts.keys():
+        ET.SubElement(meshDomainsElement, 'SolidDomain', {'name': partName, 'mat': str(modelAssembly.parts[partName].materialId)})
+    return meshDomainsElement
+
 def getNodeXmlElement(nodeId, nodeCoordinates):
     """
     Create a 'node' xml-element that is populated with the given data.
@@ -91,23 +127,87 @@ def getElemXmlElement(elementId, elementDefinition):
     xmlElement.text = txt
     return xmlElement
 
-def xmlElementWriter(xmlElement, fileName):
+def getNodeLines(firstNodeId, nodeCoordinates, indent='', precision=None):
+    """
+    Create the text of the 'node' xml-elements for many nodes at once.
+    The text for each node is the same as the text that is written for the xml-element from ``getNodeXmlElement``, e.g.
+        <node id="1">0.0, 0.0, 0.0</node>
+
+    The text is created with a single string formatting operation, instead of one operation per node, which is much faster for large arrays.
+
+    :param firstNodeId: int, The nodeId of the first node. The nodes are numbered consecutively.
+    :param nodeCoordinates: array nx3, The coordinates of the nodes.
+    :param indent: string, The indentation of each line.
+    :param precision: int or None, The number of significant digits of the coordinates. If None, then the shortest text that is converted back to exactly the same value (i.e. ``repr``) is used.
+    :return: string, The text of the n lines, each line ends with a line break.
+    """
+    nodeCoordinates = np.asarray(nodeCoordinates)
+    valueFormat = '%s' if precision is None else f'%.{int(precision)}g'
+    lineFormat = f'{indent}<node id="%d">{valueFormat}, {valueFormat}, {valueFormat}</node>\n'
+    return _formatRows(lineFormat, firstNodeId, nodeCoordinates)
+
+def getElementLines(firstElementId, elementDefinitions, indent=''):
+    """
+    Create the text of the 'elem' xml-elements for many elements at once.
+    The text for each element is the same as the text that is written for the xml-element from ``getElemXmlElement``, e.g.
+        <elem id="1">4, 3, 10, 9, 8, 7, 11, 12</elem>
+
+    :param firstElementId: int, The elementId of the first element. The elements are numbered consecutively.
+    :param elementDefinitions: array mxk, The nodeIds of each element's nodes.
+    :param indent: string, The indentation of each line.
+    :return: string, The text of the m lines, each line ends with a line break.
+    """
+    elementDefinitions = np.asarray(elementDefinitions)
+    nodeNum = elementDefinitions.shape[1] if elementDefinitions.ndim == 2 else 0
+    lineFormat = f'{indent}<elem id="%d">{", ".join(["%s"]*nodeNum)}</elem>\n'
+    return _formatRows(lineFormat, firstElementId, elementDefinitions)
+
+def xmlElementWriter(xmlElement, fileName, compression=None):
     """
     Write the given XML-element to a file that has the given fileName
 
     :param xmlElement: xml.etree.ElementTree.Element instance, The XML-element that contains all of the data that is being written, including desired child XML-elements.
     :param fileName: string, The name of the file that is being generated. Note that if this fileName already exists, then that file will be overwritten without warning.
+    :param compression: string or None, Either 'gzip', 'zstd', or 'none'. If None, then the compression is chosen from the fileName's extension (see ``openFile``).
     :return:
     """
     xmlElementText = ET.tostring(xmlElement)  # Convert the XML-element 'xmlElement' to a string variable
     xmlText = xml.dom.minidom.parseString(xmlElementText)  # Get the text that composes the xml-element.
     xmlString = xmlText.toprettyxml(encoding='ISO-8859-1')  # Make the text pretty by adding line breaks and indentations
     # Write the xml file.
-    with open(fileName, mode='wb') as fl:  # Open/create a new file that uses the 'fileName' variable to define the file's name.
+    with openFile(fileName, mode='wb', compression=compression) as fl:  # Open/create a new file that uses the 'fileName' variable to define the file's name.
         fl.write(xmlString)  # Write 'xmlString' to the file
     return
 
-def getNodeSetElement(nodeSet, name):
+def openFile(fileName, mode='rb', compression=None):
+    """
+    Open a file that is (or will be) compressed with gzip or zstd, or that is not compressed.
+
+    .. NOTE:: zstd compression needs the ``zstandard`` package (or python 3.14's ``compression.zstd`` module).
+
+    :param fileName: string, The name of the file.
+    :param mode: string, Either 'rb' or 'wb'.
+    :param compression: string or None, Either 'gzip', 'zstd', or 'none'. If None, then files that end with '.gz' use 'gzip', files that end with '.zst' use 'zstd', and other files are not compressed.
+    :return: file object, The opened file.
+    """
+    if compression is None:
+        compression = {'.gz': 'gzip', '.zst': 'zstd'}.get(os.path.splitext(fileName)[1].lower(), 'none')
+    if compression == 'none':
+        return open(fileName, mode=mode)
+    if compression == 'gzip':
+        return gzip.open(fileName, mode=mode, compresslevel=6)
+    if compression == 'zstd':
+        try:
+            from compression import zstd
+        except ImportError:
+            try:
+                import zstandard as zstd
+            except ImportError:
+                raise ImportError("zstd compression needs the 'zstandard' package. Install it with 'pip install zstandard'.")
+        return zstd.open(fileName, mode=mode)
+    raise ValueError(f"The compression: '{compression}' is not defined. Use 'gzip', 'zstd', or 'none'.")
+
+def getNodeSetElement(nodeSet, name, compact=False):
     """
     Define a nodeSet element.
     The resulting element will be similar to the following
@@ -117,13 +217,330 @@ def getNodeSetElement(nodeSet, name):
           <node id="101"/>
           <node id="102"/>
         </NodeSet>
+    or, if ``compact`` is True, the comma separated list that newer FEBio file formats (version 3.0 and later, see ``getGeometryElement``) support
+        <NodeSet name="nodeset1">1, 2, 101, 102</NodeSet>
 
     :param nodeSet: array 1xn, An array of integers, where the integers are the nodeIds for the nodes that compose the set.
     :param name: string, The name that is assigned to the nodeset
+    :param compact: bool, Whether the nodeIds are written as a comma separated list.
     :return: xml.etree.cElementTree.Element, The element that can be written to a xml file to define the nodeSet.
     """
     element = ET.Element('NodeSet', {'name': name})
+    if compact:
+        element.text = ', '.join(str(int(nodeId)) for nodeId in nodeSet)
+        return element
     for nodeId in nodeSet:
         nodeId = int(nodeId)
         ET.SubElement(element, 'node', {'id':str(nodeId)})
-    return element
\ No newline at end of file
+    return element
+
+def streamGeometryWriter(modelAssembly, fileName, rootAttributes=None, chunkSize=100000, precision=None, processNum=None, fragmentCache=None, compactNodeSets=False, compression=None):
+    """
+    Write a file that contains the ``Geometry`` element of the given modelAssembly, without building the xml-elements in memory.
+    The file is identical to the file that is written by
+        version = rootAttributes.get('version', '2.5')
+        rootElement = ET.Element('febio_spec', rootAttributes)
+        rootElement.append(getGeometryElement(modelAssembly, compactNodeSets, version))
+        if version is 3.0 or later:
+            rootElement.append(getMeshDomainsElement(modelAssembly))
+        xmlElementWriter(rootElement, fileName, compression)
+    however the text is written directly from the part's arrays, ``chunkSize`` rows at a time, so the memory that is used does not depend on the size of the model.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The object that stores the model's geometry information.
+    :param fileName: string, The name of the file that is being generated. Note that if this fileName already exists, then that file will be overwritten without warning.
+    :param rootAttributes: dictionary or None, The xml-attributes of the 'febio_spec' root xml-element. If None, then {'version': '2.5'} is used.
+    :param chunkSize: int, The maximum number of nodes or elements that are converted to text at once.
+    :param precision: int or None, The number of significant digits of the node coordinates (see ``getNodeLines``). The file is only identical to the file from ``xmlElementWriter`` if this is None.
+    :param processNum: int or None, The number of processes that convert the nodes and elements to text (see ``writeGeometry``). If None, then the text is created in this process.
+    :param fragmentCache: FebioTools.src.FebioFragmentCache.FragmentCache object or None, The cache of the text that has already been created for the parts (see ``writeGeometry``).
+    :param compactNodeSets: bool, Whether the nodeSets are written as comma separated lists (see ``getNodeSetElement``). This needs a 'version' root xml-attribute of 3.0 or later.
+    :param compression: string or None, The compression of the file (see ``openFile``).
+    :return:
+    """
+    if rootAttributes is None:
+        rootAttributes = {'version': '2.5'}
+    version = rootAttributes.get('version', '2.5')
+    _isMeshLayout(version, compactNodeSets) # Check the version before the file is created.
+    with openFile(fileName, mode='wb', compression=compression) as fl:  # Open/create a new file that uses the 'fileName' variable to define the file's name.
+        fl.write(b'<?xml version="1.0" encoding="ISO-8859-1"?>\n')
+        fl.write(_encode(f'<febio_spec{_getAttributeText(rootAttributes)}>\n'))
+        writeGeometry(fl, modelAssembly, indentLevel=1, chunkSize=chunkSize, precision=precision, processNum=processNum, fragmentCache=fragmentCache, compactNodeSets=compactNodeSets, version=version)
+        fl.write(b'</febio_spec>\n')
+    return
+
+def writeGeometry(fileHandle, modelAssembly, indentLevel=1, chunkSize=100000, precision=None, processNum=None, fragmentCache=None, compactNodeSets=False, version='2.5'):
+    """
+    Write the ``Geometry`` element of the given modelAssembly to an open file, in the layout of the FEBio file format ``version`` (see ``getGeometryElement``). From version 3.0, the 'MeshDomains' xml-element (see ``getMeshDomainsElement``) is written after the 'Mesh' xml-element.
+    The text has the same format (tab indentation, one xml-element per line) as the text that is written by ``xmlElementWriter``.
+
+    If ``processNum`` is given, then the chunks of nodes and elements are converted to text by a pool of processes.
+    Each part's nodes and elements are saved once to a temporary .npy file (in shared memory, /dev/shm, when it is available) that the processes open with ``np.load(mmap_mode='r')``, so the arrays are not copied to each process.
+    The chunks are written in their original order, so the file is identical to the file that is written without ``processNum``.
+
+    If ``fragmentCache`` is given, then the text of each part's nodes, each part's 'Elements' xml-element, and each 'NodeSet' xml-element is stored in the cache.
+    When the same model (or a model that shares some of the parts) is written again, only the text of the data that has changed, e.g. a part's materialId, a nodeSet, or the nodeIds after a part with a different number of nodes, is created again.
+
+    :param fileHandle: file object, A file that is opened in binary write mode.
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The object that stores the model's geometry information.
+    :param indentLevel: int, The number of tabs that the 'Geometry' xml-element is indented by.
+    :param chunkSize: int, The maximum number of nodes or elements that are converted to text at once.
+    :param precision: int or None, The number of significant digits of the node coordinates (see ``getNodeLines``).
+    :param processNum: int or None, The number of processes that convert the nodes and elements to text. If None (or 1), then the text is created in this process.
+    :param fragmentCache: FebioTools.src.FebioFragmentCache.FragmentCache object or None, The cache of the text that has already been created. If None, then all of the text is created.
+    :param compactNodeSets: bool, Whether the nodeSets are written as comma separated lists (see ``getNodeSetElement``). This needs a ``version`` of 3.0 or later.
+    :param version: string, The FEBio file format version, i.e. the 'version' xml-attribute of the 'febio_spec' root xml-element.
+    :return:
+    """
+    isMeshLayout = _isMeshLayout(version, compactNodeSets)
+    if processNum is None or processNum <= 1:
+        _writeGeometry(fileHandle, modelAssembly, indentLevel, chunkSize, precision, None, fragmentCache, compactNodeSets, isMeshLayout)
+        return
+
+    tempDir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory(dir=tempDir) as arrayDir, concurrent.futures.ProcessPoolExecutor(processNum) as executor:
+        # At most 2 chunks per process are waiting to be written, which limits the memory that is used for the text.
+        _writeGeometry(fileHandle, modelAssembly, indentLevel, chunkSize, precision, (executor, arrayDir, 2*processNum), fragmentCache, compactNodeSets, isMeshLayout)
+    return
+
+def _writeGeometry(fileHandle, modelAssembly, indentLevel, chunkSize, precision, pool, fragmentCache, compactNodeSets, isMeshLayout):
+    """
+    Write the ``Geometry`` element. See ``writeGeometry``.
+
+    :param pool: tuple or None, (executor, arrayDir, maxPending) if the text is created by a pool of processes, otherwise None.
+    :param isMeshLayout: bool, Whether the 'Mesh' layout of FEBio 3.0 and later is written (see ``getGeometryElement``).
+    """
+    indent = '\t'*indentLevel
+    childIndent = indent + '\t'
+    rowIndent = childIndent + '\t'
+    geometryTag = 'Mesh' if isMeshLayout else 'Geometry'
+    fileHandle.write(_encode(f'{indent}<{geometryTag}>\n'))
+
+    # Write the 'Nodes' xml-element, or one 'Nodes' xml-element for each part in the 'Mesh' layout.
+    nodeNum = sum(len(modelAssembly.parts[partName].nodes) for partName in modelAssembly.parts.keys())
+    if nodeNum == 0 and not isMeshLayout:
+        fileHandle.write(_encode(f'{childIndent}<Nodes/>\n'))
+    elif not isMeshLayout:
+        fileHandle.write(_encode(f'{childIndent}<Nodes>\n'))
+    for partName in modelAssembly.parts.keys():
+        nodes = modelAssembly.parts[partName].nodes
+        if len(nodes) == 0:
+            continue
+        if isMeshLayout:
+            fileHandle.write(_encode(f'{childIndent}<Nodes{_getAttributeText({"name": partName})}>\n'))
+        firstNodeId = modelAssembly.nodeIds[partName][0]
+        _writeFragment(fileHandle, fragmentCache, ('node', nodes, firstNodeId, rowIndent, precision),
+                       lambda fl: _writeRows(fl, 'node', nodes, firstNodeId, rowIndent, chunkSize, precision, pool))
+        if isMeshLayout:
+            fileHandle.write(_encode(f'{childIndent}</Nodes>\n'))
+    if nodeNum > 0 and not isMeshLayout:
+        fileHandle.write(_encode(f'{childIndent}</Nodes>\n'))
+
+    # Write an 'Elements' xml-element for each part
+    for partName in modelAssembly.parts.keys():
+        part = modelAssembly.parts[partName]
+        firstElementId = modelAssembly.elementIds[partName][0] if len(part.elements) > 0 else 0
+        elementsAttributes = _getElementsAttributes(part, isMeshLayout)
+        _writeFragment(fileHandle, fragmentCache, ('Elements', part.elements, firstElementId, _getAttributeText(elementsAttributes), childIndent),
+                       lambda fl: _writeElements(fl, part, firstElementId, elementsAttributes, childIndent, chunkSize, pool))
+
+    # Write the nodeSets, in the same order as ``getGeometryElement``
+    for nodeSetName in modelAssembly.nodeSetNames:
+        nodeSet = modelAssembly.getNodeSet(nodeSetName)
+        _writeFragment(fileHandle, fragmentCache, ('NodeSet', nodeSet, nodeSetName, childIndent, compactNodeSets),
+                       lambda fl: _writeNodeSet(fl, nodeSet, nodeSetName, childIndent, chunkSize, compactNodeSets))
+
+    fileHandle.write(_encode(f'{indent}</{geometryTag}>\n'))
+    if isMeshLayout: # Assign the materials, in the same format as ``getMeshDomainsElement``
+        fileHandle.write(_encode(f'{indent}<MeshDomains>\n'))
+        for partName in modelAssembly.parts.keys():
+            fileHandle.write(_encode(f'{childIndent}<SolidDomain{_getAttributeText({"name": partName, "mat": str(modelAssembly.parts[partName].materialId)})}/>\n'))
+        fileHandle.write(_encode(f'{indent}</MeshDomains>\n'))
+    return
+
+def _writeFragment(fileHandle, fragmentCache, keyData, writeFunction):
+    """
+    Write a fragment of the file with ``writeFunction``, or copy the fragment from ``fragmentCache`` if it has already been created.
+
+    :param fileHandle: file object, A file that is opened in binary write mode.
+    :param fragmentCache: FebioTools.src.FebioFragmentCache.FragmentCache object or None, The cache.
+    :param keyData: tuple, The data that the fragment is created from (see ``FragmentCache.getFragment``).
+    :param writeFunction: function, A function that writes the fragment to the file object that it is given.
+    :return:
+    """
+    if fragmentCache is None:
+        writeFunction(fileHandle)
+        return
+    def createFragment():
+        fragmentHandle = io.BytesIO()
+        writeFunction(fragmentHandle)
+        return fragmentHandle.getvalue()
+    fileHandle.write(fragmentCache.getFragment(keyData, createFragment))
+    return
+
+def _writeElements(fileHandle, part, firstElementId, attributes, indent, chunkSize, pool):
+    """
+    Write the 'Elements' xml-element of a part to an open file.
+
+    :param fileHandle: file object, A file that is opened in binary write mode.
+    :param part: FebioTools.src.FebioPart.Part object, The part.
+    :param firstElementId: int, The elementId of the part's first element.
+    :param attributes: dictionary, The xml-attributes of the 'Elements' xml-element (see ``_getElementsAttributes``).
+    :param indent: string, The indentation of the 'Elements' xml-element.
+    :param chunkSize: int, The maximum number of elements that are converted to text at once.
+    :param pool: tuple or None, See ``_writeGeometry``.
+    :return:
+    """
+    elementsTag = f'Elements{_getAttributeText(attributes)}'
+    if len(part.elements) == 0:
+        fileHandle.write(_encode(f'{indent}<{elementsTag}/>\n'))
+        return
+    fileHandle.write(_encode(f'{indent}<{elementsTag}>\n'))
+    _writeRows(fileHandle, 'elem', part.elements, firstElementId, indent + '\t', chunkSize, None, pool)
+    fileHandle.write(_encode(f'{indent}</Elements>\n'))
+    return
+
+def _writeRows(fileHandle, tag, rows, firstId, indent, chunkSize, precision, pool):
+    """
+    Write the 'node' or 'elem' xml-elements of one part's nodes or elements, ``chunkSize`` rows at a time.
+
+    :param fileHandle: file object, A file that is opened in binary write mode.
+    :param tag: string, Either 'node' or 'elem'.
+    :param rows: array nxk, The node coordinates or the elements' nodeIds.
+    :param firstId: int, The id of the first row.
+    :param indent: string, The indentation of each line.
+    :param chunkSize: int, The maximum number of rows that are converted to text at once.
+    :param precision: int or None, The number of significant digits of the node coordinates.
+    :param pool: tuple or None, See ``_writeGeometry``.
+    :return:
+    """
+    if pool is None:
+        for start in range(0, len(rows), chunkSize):
+            fileHandle.write(_getEncodedLines(tag, rows[start:start + chunkSize], firstId + start, indent, precision))
+        return
+
+    executor, arrayDir, maxPending = pool
+    arrayFileName = os.path.join(arrayDir, f'{tag}{firstId}.npy')
+    np.save(arrayFileName, np.asarray(rows))
+    pending = collections.deque() # The chunks that are being converted, in the order that they are written.
+    for start in range(0, len(rows), chunkSize):
+        pending.append(executor.submit(_getSharedEncodedLines, tag, arrayFileName, start, start + chunkSize, firstId + start, indent, precision))
+        if len(pending) >= maxPending:
+            fileHandle.write(pending.popleft().result())
+    while len(pending) > 0:
+        fileHandle.write(pending.popleft().result())
+    os.remove(arrayFileName)
+    return
+
+def _getSharedEncodedLines(tag, arrayFileName, start, stop, firstId, indent, precision):
+    """
+    Open the array that is saved in ``arrayFileName`` as a memory-map, and convert rows ``start`` to ``stop`` to encoded text. This is run by the processes in ``writeGeometry``'s pool.
+
+    :return: bytes, The encoded text.
+    """
+    rows = np.load(arrayFileName, mmap_mode='r')
+    return _getEncodedLines(tag, rows[start:stop], firstId, indent, precision)
+
+def _getEncodedLines(tag, rows, firstId, indent, precision):
+    """
+    :return: bytes, The encoded text from ``getNodeLines`` (tag 'node') or ``getElementLines`` (tag 'elem').
+    """
+    if tag == 'node':
+        return _encode(getNodeLines(firstId, rows, indent, precision))
+    return _encode(getElementLines(firstId, rows, indent))
+
+def _formatRows(lineFormat, firstId, rows):
+    """
+    Apply ``lineFormat`` to every row of ``rows``, where the first value of each line is the row's id.
+
+    :param lineFormat: string, The %-style format of one line. It must contain one value for the id, followed by one value for each column of ``rows``.
+    :param firstId: int, The id of the first row. The rows are numbered consecutively.
+    :param rows: array nxk, The values of each row.
+    :return: string, The text of the n lines.
+    """
+    rowNum = len(rows)
+    if rowNum == 0:
+        return ''
+    # Interleave the ids with the rows' values, so that the text of every line is created with one formatting operation.
+    values = np.empty((rowNum, rows.shape[1] + 1), dtype=object)
+    values[:,0] = range(firstId, firstId + rowNum)
+    values[:,1:] = rows.tolist() # Python ints/floats are converted to the same text as numpy's ints/floats.
+    return (lineFormat*rowNum) % tuple(values.ravel().tolist())
+
+def _writeNodeSet(fileHandle, nodeSet, name, indent, chunkSize, compact=False):
+    """
+    Write a 'NodeSet' xml-element (see ``getNodeSetElement``) to an open file.
+
+    :param fileHandle: file object, A file that is opened in binary write mode.
+    :param nodeSet: array 1xn, The nodeIds of the nodes that compose the set.
+    :param name: string, The name that is assigned to the nodeset.
+    :param indent: string, The indentation of the 'NodeSet' xml-element.
+    :param chunkSize: int, The maximum number of nodes that are converted to text at once.
+    :param compact: bool, Whether the nodeIds are written as a comma separated list.
+    :return:
+    """
+    nodeSetTag = f'NodeSet{_getAttributeText({"name": name})}'
+    if len(nodeSet) == 0:
+        fileHandle.write(_encode(f'{indent}<{nodeSetTag}/>\n'))
+        return
+    if compact:
+        fileHandle.write(_encode(f'{indent}<{nodeSetTag}>'))
+        for start in range(0, len(nodeSet), chunkSize):
+            separator = ', ' if start > 0 else ''
+            fileHandle.write(_encode(separator + ', '.join([str(nodeId) for nodeId in np.asarray(nodeSet[start:start + chunkSize], dtype=int).tolist()])))
+        fileHandle.write(_encode('</NodeSet>\n'))
+        return
+    fileHandle.write(_encode(f'{indent}<{nodeSetTag}>\n'))
+    for start in range(0, len(nodeSet), chunkSize):
+        lines = [f'{indent}\t<node id="{int(nodeId)}"/>\n' for nodeId in nodeSet[start:start + chunkSize]]
+        fileHandle.write(_encode(''.join(lines)))
+    fileHandle.write(_encode(f'{indent}</NodeSet>\n'))
+    return
+
+def _isMeshLayout(version, compactNodeSets=False):
+    """
+    Check whether a FEBio file format version uses the 'Mesh' layout (version 3.0 and later) instead of the 'Geometry' layout (see ``getGeometryElement``).
+
+    :param version: string, The FEBio file format version, e.g. '2.5'.
+    :param compactNodeSets: bool, Whether the nodeSets are written as comma separated lists, which is only supported by the 'Mesh' layout.
+    :return: bool, Whether the 'Mesh' layout is used.
+    """
+    try:
+        versionNumbers = tuple(int(number) for number in str(version).split('.'))
+    except ValueError:
+        raise ValueError(f"The FEBio file format version: '{version}' is not a version number, e.g. '2.5' or '3.0'")
+    isMeshLayout = versionNumbers >= (3, 0)
+    if compactNodeSets and not isMeshLayout:
+        raise ValueError(f"Compact nodeSets need FEBio file format version 3.0 or later, but the file's version is {version}")
+    return isMeshLayout
+
+def _getElementsAttributes(part, isMeshLayout):
+    """
+    :param part: FebioTools.src.FebioPart.Part object, The part.
+    :param isMeshLayout: bool, Whether the 'Mesh' layout is used (see ``getGeometryElement``).
+    :return: dictionary, The xml-attributes of the part's 'Elements' xml-element. The 'Mesh' layout names the elements with the part's name, and the 'Geometry' layout gives them the part's materialId.
+    """
+    if isMeshLayout:
+        return {'type': 'hex8', 'name': part.name}
+    return {'mat': str(part.materialId), 'type': 'hex8'}
+
+def _getAttributeText(attributes):
+    """
+    Convert a dictionary of xml-attributes into text, escaping the values the same way as ``xml.dom.minidom``.
+
+    :param attributes: dictionary, The xml-attributes.
+    :return: string, The text, e.g. ' mat="1" type="hex8"'.
+    """
+    text = ''
+    for key, value in attributes.items():
+        value = str(value).replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+        text = text + f' {key}="{value}"'
+    return text
+
+def _encode(text):
+    """
+    Encode text with the same encoding as ``xmlElementWriter``.
+
+    :param text: string, The text.
+    :return: bytes, The encoded text.
+    """
+    return text.encode('ISO-8859-1', 'xmlcharrefreplace')
@@ -0,0 +1,160 @@
+import collections
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+class FragmentCache(object):
+    def __init__(self, maxBytes=2**30, cacheDir=None, maxDiskBytes=2**32):
+        """
+        Store the encoded text of parts of a .feb file (the "fragments"), so that a fragment only needs to be converted to text again when its data changes.
+        ``FebioFileWriter.writeGeometry`` uses this to write each part's nodes, each part's 'Elements' xml-element, and each 'NodeSet' xml-element.
+
+        A fragment is identified by a hash of the data that it is created from (e.g. the part's nodes array and its first nodeId), so changing a part's material or one nodeSet only creates the fragments that changed.
+        The fragments are kept in memory, and the least recently used fragments are removed when they use more than ``maxBytes``.
+        If ``cacheDir`` is given, then each fragment is also saved to a file in that directory, so that the fragments can be used again by a different python session.
+        The fragment files that were least recently used (by their modification time) are removed when the files use more than ``maxDiskBytes``, so a parameter sweep that changes the fragments does not fill the disk. ``clearDisk`` removes every fragment file.
+
+        :param maxBytes: int, The maximum number of bytes of fragments that are kept in memory.
+        :param cacheDir: string or None, The directory that the fragments are saved in. If None, then the fragments are only kept in memory.
+        :param maxDiskBytes: int or None, The maximum number of bytes of fragment files in ``cacheDir``. If None, then the files are never removed, and the directory must be cleaned by the caller.
+        """
+        self.maxBytes = maxBytes #: int, The maximum number of bytes of fragments that are kept in memory.
+        self.cacheDir = cacheDir #: string or None, The directory that the fragments are saved in.
+        self.maxDiskBytes = maxDiskBytes #: int or None, The maximum number of bytes of fragment files in ``self.cacheDir``.
+        self.diskByteNum = 0 #: int, The number of bytes of fragment files in ``self.cacheDir``.
+        self.fragments = collections.OrderedDict() #: OrderedDict, The fragments that are kept in memory. The keys are the hashes, and the most recently used fragment is last.
+        self.byteNum = 0 #: int, The number of bytes of fragments that are kept in memory.
+        self.statistics = {'hits': 0, 'diskHits': 0, 'misses': 0} #: dictionary, The number of fragments that were found in memory, found in ``self.cacheDir``, and created.
+
+        if cacheDir is not None:
+            os.makedirs(cacheDir, exist_ok=True)
+            self.diskByteNum = sum(os.path.getsize(fileName) for fileName in self._getFragmentFileNames())
+
+    def getFragment(self, keyData, createFragment):
+        """
+        Get the fragment that is identified by ``keyData``. If the fragment is not in the cache, then it is created with ``createFragment()`` and added to the cache.
+
+        :param keyData: tuple, The data that the fragment is created from. The values can be arrays, strings, numbers, or None.
+        :param createFragment: function, A function with no arguments that returns the fragment (bytes).
+        :return: bytes, The fragment.
+        """
+        key = getKey(keyData)
+        if key in self.fragments.keys():
+            self.fragments.move_to_end(key)
+            self.statistics['hits'] += 1
+            return self.fragments[key]
+
+        fragment = None
+        if self.cacheDir is not None and os.path.isfile(os.path.join(self.cacheDir, key)):
+            with open(os.path.join(self.cacheDir, key), mode='rb') as fl:
+                fragment = fl.read()
+            os.utime(os.path.join(self.cacheDir, key)) # Mark the file as recently used, so it is removed last.
+            self.statistics['diskHits'] += 1
+        if fragment is None:
+            fragment = createFragment()
+            self.statistics['misses'] += 1
+            if self.cacheDir is not None:
+                self._saveFragment(key, fragment)
+
+        self.fragments[key] = fragment
+        self.byteNum += len(fragment)
+        while self.byteNum > self.maxBytes and len(self.fragments) > 0: # Remove the least recently used fragments
+            self.byteNum -= len(self.fragments.popitem(last=False)[1])
+        return fragment
+
+    def clear(self):
+        """
+        Remove the fragments that are kept in memory. The files in ``self.cacheDir`` are not removed (see ``clearDisk``).
+
+        :return:
+        """
+        self.fragments.clear()
+        self.byteNum = 0
+        return
+
+    def clearDisk(self):
+        """
+        Remove the fragment files in ``self.cacheDir``. Other files in the directory are not removed.
+
+        :return:
+        """
+        for fileName in self._getFragmentFileNames():
+            _removeFile(fileName)
+        self.diskByteNum = 0
+        return
+
+    def _pruneDisk(self):
+        """
+        Remove the least recently used fragment files until they use at most ``self.maxDiskBytes``.
+
+        :return:
+        """
+        fileStats = []
+        for fileName in self._getFragmentFileNames():
+            try:
+                fileStat = os.stat(fileName)
+            except FileNotFoundError: # The file was removed by another process.
+                continue
+            fileStats.append((fileStat.st_mtime_ns, fileStat.st_size, fileName))
+        fileStats.sort()
+        self.diskByteNum = sum(fileStat[1] for fileStat in fileStats)
+        for mtime, size, fileName in fileStats:
+            if self.diskByteNum <= self.maxDiskBytes:
+                break
+            _removeFile(fileName)
+            self.diskByteNum -= size
+        return
+
+    def _getFragmentFileNames(self):
+        """
+        :return: list, The names of the fragment files in ``self.cacheDir``. The fragment files are named with their hash (see ``getKey``).
+        """
+        return [os.path.join(self.cacheDir, fileName) for fileName in os.listdir(self.cacheDir) if len(fileName) == 40 and all(character in '0123456789abcdef' for character in fileName)]
+
+    def _saveFragment(self, key, fragment):
+        """
+        Save a fragment to ``self.cacheDir``. The fragment is written to a temporary file that is then renamed, so a fragment file is never partially written.
+
+        :param key: string, The fragment's hash.
+        :param fragment: bytes, The fragment.
+        :return:
+        """
+        fileDescriptor, tempFileName = tempfile.mkstemp(dir=self.cacheDir)
+        with os.fdopen(fileDescriptor, mode='wb') as fl:
+            fl.write(fragment)
+        os.replace(tempFileName, os.path.join(self.cacheDir, key))
+        self.diskByteNum += len(fragment)
+        if self.maxDiskBytes is not None and self.diskByteNum > self.maxDiskBytes:
+            self._pruneDisk()
+        return
+
+def _removeFile(fileName):
+    """
+    Remove a file, if it still exists.
+
+    :param fileName: string, The name of the file.
+    :return:
+    """
+    try:
+        os.remove(fileName)
+    except FileNotFoundError: # The file was removed by another process.
+        pass
+    return
+
+def getKey(keyData):
+    """
+    Calculate the hash that identifies a fragment.
+
+    :param keyData: tuple, The values can be arrays (their dtype, shape, and values are used), strings, numbers, or None.
+    :return: string, The hash as hexadecimal text.
+    """
+    hashObject = hashlib.blake2b(digest_size=20)
+    for value in keyData:
+        if isinstance(value, (str, int, float, type(None))):
+            hashObject.update(f'{type(value).__name__}:{value!r};'.encode('utf-8'))
+        else:
+            value = np.ascontiguousarray(value)
+            hashObject.update(f'array:{value.dtype.str}:{value.shape};'.encode('utf-8'))
+            hashObject.update(value.view(np.uint8).ravel() if value.size > 0 else b'')
+    return hashObject.hexdigest()
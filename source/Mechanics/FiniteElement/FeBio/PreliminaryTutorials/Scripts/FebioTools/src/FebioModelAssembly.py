@@ -1,23 +1,26 @@
+import numpy as np
 
 class ModelAssembly(object):
 
     def __init__(self):
         self.parts = {}  #: dictionary, A dictionary of instances of the FebioTools.FebioPart.Part class instance. The keys are the names that are assigned to the parts.
         self.nodeSetNames = []  #: list, A list that stores the names of the nodesets that are defined in ``self.parts``. This variable is generally used for convenience, so the names do not need to be references from ``self.parts``.
+        self.nodeSetParts = {}  #: dictionary, The name of the part that contains each nodeset. The keys are the nodeset names, so the part that contains a nodeset can be found without searching every part.
 
         self.nodeIdOffset = 1 #: int, The offset in the node numbering that is used to modify the part's nodeIds. This starts at 1 because Febio starts node numbering at 1 and not 0.
         self.elementIdOffset = 1 #: int, The offset in the element numbering that is used to modify the part's elementIds. This starts at 1 because Febio starts element numbering at 1 and not 0.
 
-        self.nodeIds = {} #: dictionary, A dictionary of lists. The keys are the part's name and the list is the nodeIds that correspond to the part's nodes.
-        self.elementIds = {} #: dictionary, A dictionary of lists. The keys are the part's name and the list is the elementIds that correspond to the part's elements.
+        self.nodeIds = {} #: dictionary, A dictionary of ranges. The keys are the part's name and the range is the nodeIds that correspond to the part's nodes, e.g. ``self.nodeIds[partName][0]`` is the part's first nodeId.
+        self.elementIds = {} #: dictionary, A dictionary of ranges. The keys are the part's name and the range is the elementIds that correspond to the part's elements.
 
-    def addPart(self, part):
+    def addPart(self, part, updateNodeIds=True):
         """
         This method populates ``self.parts``, and also checks that there are no duplicate nodeSet names between parts.
         Error checking is used for nodeSet names because those names are used to identify the nodeset.
         If there are duplicate names, then there will likely be an error in FeBio.
 
         :param part: FeBioTools.FeBioPart.Part instance, The part that is being added to the geometry.
+        :param updateNodeIds: bool, Whether the nodeIds in ``part.elements`` and ``part.nodeSets`` are changed from the part's nodeIds (starting at 0) to the model's nodeIds. Use False if the part already uses the model's nodeIds, e.g. a part that was saved after it was added to a model.
         :return:
         """
         # First, check if the part's name has already been used.
@@ -26,28 +29,82 @@ class ModelAssembly(object):
 
         # Perform error checking for duplicate nodeset names
         for partNodeSetName in part.nodeSets.keys():  # Iterate over nodeSet names. If there are none, then this loop is passed over.
-            for partName in self.parts.keys():  # Iterate over the parts that have already been added. This allows for a more descriptive error to be thrown if there is a duplicate nodeset name.
-                if partNodeSetName in self.nodeSetNames:
-                    raise KeyError(f"The nodeSet name: '{partNodeSetName}' is already defined in the part named '{partName}'")
+            if partNodeSetName in self.nodeSetParts.keys():
+                raise KeyError(f"The nodeSet name: '{partNodeSetName}' is already defined in the part named '{self.nodeSetParts[partNodeSetName]}'")
 
         self.parts[part.name] = part # Add the part to the self.parts dictionary
         self.nodeSetNames += list(part.nodeSets.keys())  # Populate self.nodeSetNames
+        for partNodeSetName in part.nodeSets.keys():
+            self.nodeSetParts[partNodeSetName] = part.name
 
         partNodeNum = len(self.parts[part.name].nodes) # The number of nodes in the part.
         partElementNum = len(self.parts[part.name].elements) # The number of elements in the part.
 
         # Assign the nodeIds and elementIds for the part in self.nodeIds and self.elementIds, respectively.
-        self.nodeIds[part.name] = list(range(self.nodeIdOffset, self.nodeIdOffset + partNodeNum)) #
-        self.elementIds[part.name] = list(range(self.elementIdOffset, self.elementIdOffset + partElementNum))
+        # A range only stores its start, stop, and step, so this uses the same memory for any number of nodes.
+        self.nodeIds[part.name] = range(self.nodeIdOffset, self.nodeIdOffset + partNodeNum)
+        self.elementIds[part.name] = range(self.elementIdOffset, self.elementIdOffset + partElementNum)
 
         # Adjust the nodeIds in self.parts[part.name].nodeSets by self.nodeIdOffset
-        _updateNodeIds(self.parts[part.name], self.nodeIdOffset)
+        if updateNodeIds:
+            _updateNodeIds(self.parts[part.name], self.nodeIdOffset)
 
         # Now that we have added a part, update self.nodeIdOffset and self.elementIdOffset for the next part that may be added
         self.nodeIdOffset = self.nodeIdOffset + partNodeNum
         self.elementIdOffset = self.elementIdOffset + partElementNum
         return
 
+    def getNodeSet(self, setName):
+        """
+        Get a nodeset from the part that contains it.
+
+        :param setName: string, The name of the nodeset.
+        :return: array 1xn, The nodeIds in the nodeset.
+        """
+        if setName not in self.nodeSetParts.keys():
+            raise KeyError(f"The nodeSet name: '{setName}' is not defined in any part")
+        return self.parts[self.nodeSetParts[setName]].nodeSets[setName]
+
+    def getGlobalNodes(self):
+        """
+        Get the nodes of every part as one array. Row r is the node with nodeId r + 1.
+
+        If the parts' node arrays are consecutive pieces of one array (e.g. after ``self.consolidate()``, or for a model that is loaded with ``FebioModelAssemblyStorage.loadModelAssembly``), then a view of that array is returned and nothing is copied.
+        Otherwise the arrays are concatenated.
+
+        :return: array nx3, The nodes.
+        """
+        return _getJoinedArray([self.parts[partName].nodes for partName in self.parts.keys()], np.zeros((0, 3)))
+
+    def getGlobalElements(self):
+        """
+        Get the elements of every part as one array. Row r is the element with elementId r + 1. See ``getGlobalNodes``.
+
+        :return: array mx8, The nodeIds of each element's nodes.
+        """
+        return _getJoinedArray([self.parts[partName].elements for partName in self.parts.keys()], np.zeros((0, 8), dtype=int))
+
+    def consolidate(self):
+        """
+        Copy the nodes and elements of every part into one node array and one element array, and replace each part's arrays with a view of its rows.
+        After this, ``self.getGlobalNodes()`` and ``self.getGlobalElements()`` do not copy any data.
+
+        ..NOTE:: This method updates ``part.nodes`` and ``part.elements`` for every part in ``self.parts``.
+
+        :return:
+        """
+        nodes = self.getGlobalNodes()
+        elements = self.getGlobalElements()
+        nodeStart, elementStart = 0, 0
+        for partName in self.parts.keys():
+            part = self.parts[partName]
+            partNodeNum, partElementNum = len(part.nodes), len(part.elements)
+            part.nodes = nodes[nodeStart:nodeStart + partNodeNum]
+            part.elements = elements[elementStart:elementStart + partElementNum]
+            nodeStart += partNodeNum
+            elementStart += partElementNum
+        return
+
 def _updateNodeIds(part, nodeIdOffset):
     """
     Change the nodeIds in part.elements and part.nodeSets.
@@ -61,4 +118,37 @@ def _updateNodeIds(part, nodeIdOffset):
     part.elements = part.elements + nodeIdOffset # Increase the values in part.elements by 'nodeIdOffset'
     for setName in part.nodeSets.keys():
         part.nodeSets[setName] = part.nodeSets[setName] + nodeIdOffset # Increase the values in part.nodeSets[setName] by 'nodeIdOffset'
-    return
\ No newline at end of file
+    return
+
+def _getJoinedArray(arrays, emptyArray):
+    """
+    Join the arrays along their first axis. If the arrays are consecutive pieces of the same array, then a view is returned instead of a copy.
+
+    :param arrays: list, The arrays.
+    :param emptyArray: array, The array that is returned if ``arrays`` is empty.
+    :return: array, The joined arrays.
+    """
+    arrays = [np.asarray(array) for array in arrays]
+    if len(arrays) == 0:
+        return emptyArray
+
+    # Find the array that owns the memory of the first array.
+    base = arrays[0]
+    while isinstance(base.base, np.ndarray):
+        base = base.base
+    isView = base.flags.c_contiguous and all(array.flags.c_contiguous and array.dtype == arrays[0].dtype and array.shape[1:] == arrays[0].shape[1:] for array in arrays)
+    # Each array must start where the previous array ends, and be inside the memory of 'base'.
+    baseAddress = base.__array_interface__['data'][0]
+    address = arrays[0].__array_interface__['data'][0]
+    for array in arrays:
+        if array.size > 0 and array.__array_interface__['data'][0] != address:
+            isView = False
+        address += array.nbytes
+    isView = isView and baseAddress <= arrays[0].__array_interface__['data'][0] and address <= baseAddress + base.nbytes
+    if not isView:
+        return np.concatenate(arrays)
+
+    start = arrays[0].__array_interface__['data'][0] - baseAddress
+    byteNum = sum(array.nbytes for array in arrays)
+    rowNum = sum(len(array) for array in arrays)
+    return base.reshape(-1).view(np.uint8)[start:start + byteNum].view(arrays[0].dtype).reshape((rowNum,) + arrays[0].shape[1:])
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+# Custom modules/functions
+import FebioPart
+import FebioModelAssembly
+import FebioFileReader
+
+formatVersion = 1 #: int, The version of the files that are written by ``saveModelAssembly``.
+
+def example():
+    # Read the model from FebioModelAssemblyExample.py, save it, and load it again.
+    with tempfile.TemporaryDirectory() as directory:
+        modelAssembly = FebioFileReader.readModelAssembly(FebioFileReader.writeExampleModel(directory))
+        directory = os.path.join(directory, 'savedModelAssembly')
+        saveModelAssembly(modelAssembly, directory)
+        loadedModelAssembly = loadModelAssembly(directory)
+        for partName in loadedModelAssembly.parts.keys():
+            part = loadedModelAssembly.parts[partName]
+            print(f"{partName}: nodeIds {loadedModelAssembly.nodeIds[partName][0]} to {loadedModelAssembly.nodeIds[partName][-1]}, nodes stored as {type(part.nodes).__name__}, nodeSets {list(part.nodeSets.keys())}")
+        del loadedModelAssembly, part # Close the memory-mapped files before the directory is removed.
+    return
+
+def saveModelAssembly(modelAssembly, directory):
+    """
+    Save the state of ``modelAssembly`` to a directory of binary .npy files, so it can be loaded quickly with ``loadModelAssembly``.
+
+    The directory contains:
+        'nodes.npy': array nx3, The nodes of every part, one part after another.
+        'elements.npy': array mx8, The elements of every part (with the nodeIds that ``ModelAssembly.addPart`` assigned).
+        'nodeSets.npy': array 1xk, The nodeIds of every nodeSet, one nodeSet after another.
+        'modelAssembly.json': The part names, materialIds, and nodeSet names, and where each part and nodeSet is stored in the arrays.
+    The arrays are filled one part at a time, so the model does not need to be copied into one large array in memory.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly.
+    :param directory: string, The directory that the files are written to. It is created if it does not exist, and a model that was saved there before is replaced.
+    :return:
+    """
+    os.makedirs(directory, exist_ok=True)
+    parts = [modelAssembly.parts[partName] for partName in modelAssembly.parts.keys()]
+    nodeNum = sum(len(part.nodes) for part in parts)
+    elementNum = sum(len(part.elements) for part in parts)
+    nodeSetNum = sum(len(part.nodeSets[setName]) for part in parts for setName in part.nodeSets.keys())
+    elementNodeNum = next((np.shape(part.elements)[1] for part in parts if len(part.elements) > 0), 8)
+
+    # The manifest of a previous save is removed first, so the directory can not be loaded while its arrays are being replaced.
+    manifestFileName = os.path.join(directory, 'modelAssembly.json')
+    if os.path.isfile(manifestFileName):
+        os.remove(manifestFileName)
+    # The arrays are written to temporary files, so the arrays of a model that was loaded from this directory are not overwritten while they are read.
+    tempFileNames = {}
+    for arrayName in ('nodes', 'elements', 'nodeSets'):
+        fileDescriptor, tempFileNames[arrayName] = tempfile.mkstemp(dir=directory, suffix='.npy')
+        os.close(fileDescriptor)
+    nodes = np.lib.format.open_memmap(tempFileNames['nodes'], mode='w+', dtype=np.float64, shape=(nodeNum, 3))
+    elements = np.lib.format.open_memmap(tempFileNames['elements'], mode='w+', dtype=np.int64, shape=(elementNum, elementNodeNum))
+    nodeSets = np.lib.format.open_memmap(tempFileNames['nodeSets'], mode='w+', dtype=np.int64, shape=(nodeSetNum,))
+
+    manifest = {'formatVersion': formatVersion,
+                'nodeSetNames': list(modelAssembly.nodeSetNames),
+                'nodeIdOffset': int(modelAssembly.nodeIdOffset),
+                'elementIdOffset': int(modelAssembly.elementIdOffset),
+                'parts': []}
+    nodeStart, elementStart, nodeSetStart = 0, 0, 0
+    for part in parts:
+        partNodeNum, partElementNum = len(part.nodes), len(part.elements)
+        nodes[nodeStart:nodeStart + partNodeNum] = part.nodes
+        elements[elementStart:elementStart + partElementNum] = part.elements
+        materialId = part.materialId.item() if isinstance(part.materialId, np.generic) else part.materialId
+        partManifest = {'name': part.name,
+                        'materialId': materialId,
+                        'nodeStart': nodeStart,
+                        'nodeNum': partNodeNum,
+                        'firstNodeId': int(modelAssembly.nodeIds[part.name][0]) if partNodeNum > 0 else None,
+                        'elementStart': elementStart,
+                        'elementNum': partElementNum,
+                        'firstElementId': int(modelAssembly.elementIds[part.name][0]) if partElementNum > 0 else None,
+                        'nodeSets': []}
+        for setName in part.nodeSets.keys():
+            setNodeNum = len(part.nodeSets[setName])
+            nodeSets[nodeSetStart:nodeSetStart + setNodeNum] = part.nodeSets[setName]
+            partManifest['nodeSets'].append({'name': setName, 'start': nodeSetStart, 'nodeNum': setNodeNum})
+            nodeSetStart += setNodeNum
+        manifest['parts'].append(partManifest)
+        nodeStart += partNodeNum
+        elementStart += partElementNum
+
+    for array in (nodes, elements, nodeSets):
+        array.flush()
+    del nodes, elements, nodeSets # Close the memory-mapped files before they are renamed.
+    for arrayName in tempFileNames.keys():
+        os.replace(tempFileNames[arrayName], os.path.join(directory, f'{arrayName}.npy'))
+    # The manifest is written last, so a directory that was not completely written can not be loaded.
+    fileDescriptor, tempFileName = tempfile.mkstemp(dir=directory, suffix='.json')
+    with os.fdopen(fileDescriptor, mode='w') as fl:
+        json.dump(manifest, fl, indent=1)
+    os.replace(tempFileName, manifestFileName)
+    return
+
+def loadModelAssembly(directory, mmapMode='r'):
+    """
+    Load a model assembly that was saved with ``saveModelAssembly``.
+
+    The arrays are opened with ``np.load(mmap_mode=mmapMode)``, and each part's nodes, elements, and nodeSets are views of those arrays, so nothing is copied and the data is only read from the disk when it is used.
+    The parts are added with ``ModelAssembly.addPart(part, updateNodeIds=False)``, because the saved elements and nodeSets already have the nodeIds that it assigned.
+
+    :param directory: string, The directory that was written by ``saveModelAssembly``.
+    :param mmapMode: string or None, The memory-map mode (see ``np.load``). 'r' is read-only and 'c' is copy-on-write. If None, then the arrays are read into memory.
+    :return: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly.
+    """
+    with open(os.path.join(directory, 'modelAssembly.json'), mode='r') as fl:
+        manifest = json.load(fl)
+    if manifest.get('formatVersion') != formatVersion:
+        raise ValueError(f"The model assembly in '{directory}' has the format version {manifest.get('formatVersion')}, but version {formatVersion} is expected")
+
+    nodes = np.load(os.path.join(directory, 'nodes.npy'), mmap_mode=mmapMode)
+    elements = np.load(os.path.join(directory, 'elements.npy'), mmap_mode=mmapMode)
+    nodeSets = np.load(os.path.join(directory, 'nodeSets.npy'), mmap_mode=mmapMode)
+
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    for partManifest in manifest['parts']:
+        part = FebioPart.Part(partManifest['name'])
+        nodeStart, elementStart = partManifest['nodeStart'], partManifest['elementStart']
+        part.setNodes(nodes[nodeStart:nodeStart + partManifest['nodeNum']])
+        part.setElements(elements[elementStart:elementStart + partManifest['elementNum']])
+        part.setMaterialId(partManifest['materialId'])
+        for setManifest in partManifest['nodeSets']:
+            part.addNodeSet(nodeSets[setManifest['start']:setManifest['start'] + setManifest['nodeNum']], setManifest['name'])
+
+        if partManifest['firstNodeId'] not in (None, modelAssembly.nodeIdOffset) or partManifest['firstElementId'] not in (None, modelAssembly.elementIdOffset):
+            raise ValueError(f"The nodeIds or elementIds of the part named '{part.name}' do not follow the previous part's ids")
+        modelAssembly.addPart(part, updateNodeIds=False)
+    return modelAssembly
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,138 @@
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.spatial
+
+# Custom modules/functions
+import FebioPart
+import FebioModelAssembly
+
+def example():
+    # The two parts from FebioModelAssemblyExample.py, except part1 starts at y=1.0, so the parts share four nodes.
+    part0Coordinates = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0], [0.0, 1.0, 1.0]])
+    part1Coordinates = np.array([[0.0, 1.0, 0.0], [1.0, 1.0, 0.0], [1.0, 2.0, 0.0], [0.0, 2.0, 0.0], [0.0, 1.0, 1.0], [1.0, 1.0, 1.0], [1.0, 2.0, 1.0], [0.0, 2.0, 1.0]])
+    part0 = FebioPart.Part('part0')
+    part0.setNodes(part0Coordinates)
+    part0.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part0.setMaterialId(1)
+    part0.addNodeSet([0, 1, 4, 5], 'part0FixedNodeSet')
+    part1 = FebioPart.Part('part1')
+    part1.setNodes(part1Coordinates)
+    part1.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part1.setMaterialId(2)
+    part1.addNodeSet([2, 3, 6, 7], 'part1LoadedNodeSet')
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    modelAssembly.addPart(part0)
+    modelAssembly.addPart(part1)
+
+    coincidentNodeIds, distances = findCoincidentNodes(modelAssembly, 1e-6)
+    print(f'Coincident nodeIds:\n{coincidentNodeIds}')
+    report = mergeCoincidentNodes(modelAssembly, 1e-6)
+    print(f"Removed nodeIds: {report['removedNodeIds']}")
+    print(f"part1's elements after merging: {modelAssembly.parts['part1'].elements}")
+    print(f"part1's nodeIds after merging: {modelAssembly.nodeIds['part1']}")
+    return
+
+def findCoincidentNodes(modelAssembly, tolerance, acrossPartsOnly=True):
+    """
+    Find the pairs of nodes that are closer than ``tolerance`` to each other.
+
+    The nodes are put in a KD-tree (``scipy.spatial.cKDTree``), so only nearby nodes are compared, instead of comparing every pair of nodes.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly.
+    :param tolerance: float, The maximum distance between two nodes that are coincident.
+    :param acrossPartsOnly: bool, Whether only pairs of nodes from different parts are returned.
+    :return: [array kx2, array 1xk], The nodeIds of each pair of coincident nodes (the smaller nodeId is first, and the pairs are sorted), and the distance between each pair.
+    """
+    nodes = np.asarray(modelAssembly.getGlobalNodes(), dtype=float)
+    pairs = scipy.spatial.cKDTree(nodes).query_pairs(tolerance, output_type='ndarray').astype(np.int64)
+    pairs.sort(axis=1)
+    if acrossPartsOnly:
+        partIndices = np.repeat(np.arange(len(modelAssembly.parts)), [len(modelAssembly.parts[partName].nodes) for partName in modelAssembly.parts.keys()])
+        pairs = pairs[partIndices[pairs[:,0]] != partIndices[pairs[:,1]]]
+    pairs = pairs[np.lexsort((pairs[:,1], pairs[:,0]))]
+    distances = np.linalg.norm(nodes[pairs[:,1]] - nodes[pairs[:,0]], axis=1)
+    return pairs + 1, distances
+
+def mergeCoincidentNodes(modelAssembly, tolerance, acrossPartsOnly=True):
+    """
+    Merge the nodes that are closer than ``tolerance`` to each other (see ``findCoincidentNodes``).
+
+    A group of coincident nodes is replaced by the node with the smallest nodeId, i.e. the node from the part that was added first.
+    The other nodes are removed from their parts, the parts' elements and nodeSets use the remaining node instead, and the nodes are renumbered so the nodeIds are still consecutive.
+    A part's elements can then use the nodes of a part that was added before it, which ties the parts together. The coordinates of a part's elements must then be taken from ``modelAssembly.getGlobalNodes()`` instead of ``part.nodes``, and a part whose nodes were all merged has no nodes of its own.
+    If ``acrossPartsOnly`` is True, then a group never contains two nodes from the same part (see ``_getAcrossPartsReplacement``).
+
+    ..NOTE:: This function updates ``modelAssembly`` and the parts in ``modelAssembly.parts`` by reference.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly.
+    :param tolerance: float, The maximum distance between two nodes that are coincident.
+    :param acrossPartsOnly: bool, Whether only nodes from different parts are merged.
+    :return: dictionary, A dictionary with the following keys:
+        'coincidentNodeIds': array kx2, The pairs of coincident nodeIds (before renumbering).
+        'removedNodeIds': array 1xr, The nodeIds (before renumbering) of the nodes that were removed.
+        'nodeIdMap': array 1xn, The new nodeId of each old nodeId. Entry i is the new nodeId of the node that had nodeId i + 1.
+    """
+    coincidentNodeIds = findCoincidentNodes(modelAssembly, tolerance, acrossPartsOnly=acrossPartsOnly)[0]
+    nodeNum = modelAssembly.nodeIdOffset - 1
+
+    pairs = coincidentNodeIds - 1
+    if acrossPartsOnly:
+        replacement = _getAcrossPartsReplacement(modelAssembly, pairs, nodeNum)
+    else:
+        # Every node in a connected group of coincident nodes is replaced by the node with the smallest nodeId in the group.
+        graph = scipy.sparse.coo_matrix((np.ones(len(pairs)), (pairs[:,0], pairs[:,1])), shape=(nodeNum, nodeNum))
+        groupNum, groupLabels = scipy.sparse.csgraph.connected_components(graph, directed=False)
+        groupFirstNode = np.full(groupNum, nodeNum, dtype=np.int64)
+        np.minimum.at(groupFirstNode, groupLabels, np.arange(nodeNum))
+        replacement = groupFirstNode[groupLabels]
+    isKept = replacement == np.arange(nodeNum)
+
+    newNodeIds = np.cumsum(isKept) # The new nodeId of each kept node
+    nodeIdMap = newNodeIds[replacement]
+
+    nodeIdOffset = 1
+    for partName in modelAssembly.parts.keys():
+        part = modelAssembly.parts[partName]
+        partRows = np.arange(modelAssembly.nodeIds[partName].start, modelAssembly.nodeIds[partName].stop) - 1
+        part.nodes = np.asarray(part.nodes)[isKept[partRows]]
+        part.elements = nodeIdMap[np.asarray(part.elements) - 1]
+        for setName in part.nodeSets.keys():
+            nodeSet = nodeIdMap[np.asarray(part.nodeSets[setName], dtype=np.int64) - 1]
+            part.nodeSets[setName] = nodeSet[np.sort(np.unique(nodeSet, return_index=True)[1])] # Merged nodes would be in the set twice. The order of the set is kept.
+        modelAssembly.nodeIds[partName] = range(nodeIdOffset, nodeIdOffset + len(part.nodes))
+        nodeIdOffset += len(part.nodes)
+    modelAssembly.nodeIdOffset = nodeIdOffset
+
+    report = {'coincidentNodeIds': coincidentNodeIds,
+              'removedNodeIds': np.flatnonzero(~isKept) + 1,
+              'nodeIdMap': nodeIdMap}
+    return report
+
+def _getAcrossPartsReplacement(modelAssembly, pairs, nodeNum):
+    """
+    Find the node that replaces each node, when only nodes from different parts are merged.
+
+    The nodes are visited in the order of their nodeIds. A node joins the group of the first node (with a smaller nodeId) that it is coincident with, unless that group already contains a node from the same part. If no group can be joined, then the node is kept.
+    Joining whole connected groups instead would merge two nodes of the same part that are both coincident with one node of another part.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly.
+    :param pairs: array kx2, The rows (nodeId - 1) of each pair of coincident nodes from different parts. The smaller row is first.
+    :param nodeNum: int, The number of nodes in the model.
+    :return: array 1xn, The row of the node that replaces each node. A node that is kept replaces itself.
+    """
+    partIndices = np.repeat(np.arange(len(modelAssembly.parts)), [len(modelAssembly.parts[partName].nodes) for partName in modelAssembly.parts.keys()]).tolist()
+    replacement = np.arange(nodeNum)
+    groupParts = {} # The keys are the first node of each group, and the values are the sets of part indices of the group's nodes.
+    for first, second in pairs[np.lexsort((pairs[:,0], pairs[:,1]))].tolist():
+        if replacement[second] != second:
+            continue # The node has already joined a group.
+        group = int(replacement[first])
+        parts = groupParts.setdefault(group, {partIndices[group]})
+        if partIndices[second] not in parts:
+            parts.add(partIndices[second])
+            replacement[second] = group
+    return replacement
+
+if __name__ == '__main__':
+    example()
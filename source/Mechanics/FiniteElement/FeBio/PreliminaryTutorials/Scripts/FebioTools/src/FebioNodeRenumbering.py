@@ -0,0 +1,149 @@
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+# Custom modules/functions
+import FebioPart
+import FebioModelAssembly
+
+def example():
+    # A 10x10x10 block of elements, where the nodes are numbered in a random order.
+    n = 10
+    k, j, i = np.meshgrid(np.arange(n + 1), np.arange(n + 1), np.arange(n + 1), indexing='ij')
+    nodes = np.column_stack([i.ravel(), j.ravel(), k.ravel()]).astype(float)
+    k, j, i = [index.ravel() for index in np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing='ij')]
+    offsets = np.array([0, 1, n + 2, n + 1])
+    elements = ((k*(n + 1) + j)*(n + 1) + i)[:,np.newaxis] + np.concatenate([offsets, offsets + (n + 1)**2])
+    shuffle = np.random.default_rng(0).permutation(len(nodes)) # shuffle[r] is the new row of the node in row r
+    shuffledNodes = np.empty_like(nodes)
+    shuffledNodes[shuffle] = nodes
+
+    for method in ['rcm', 'morton']:
+        part = FebioPart.Part('block')
+        part.setNodes(shuffledNodes)
+        part.setElements(shuffle[elements])
+        part.setMaterialId(1)
+        part.addNodeSet(shuffle[np.flatnonzero(nodes[:,2] == 0)], 'blockBottomNodeSet')
+        modelAssembly = FebioModelAssembly.ModelAssembly()
+        modelAssembly.addPart(part)
+
+        report = renumberNodes(modelAssembly, method=method)
+        print(f"{method}: bandwidth {report['bandwidthBefore']} -> {report['bandwidthAfter']}, profile {report['profileBefore']} -> {report['profileAfter']}")
+    return
+
+def getBandwidthAndProfile(elements, nodeNum):
+    """
+    Calculate the bandwidth and the profile of the matrix whose nonzero entries are the pairs of nodes that share an element (e.g. the stiffness matrix, with one row for each node).
+
+    The bandwidth is the largest difference between the nodeIds of two nodes that share an element.
+    The profile is the sum, over every node, of the difference between its nodeId and the smallest nodeId that it shares an element with.
+
+    :param elements: array mx8, The nodeIds of each element's nodes.
+    :param nodeNum: int, The number of nodes. The nodeIds are 1 to ``nodeNum``.
+    :return: [int, int], The bandwidth and the profile.
+    """
+    elements = np.asarray(elements, dtype=np.int64) - 1
+    if elements.size == 0:
+        return 0, 0
+    elementMin = elements.min(axis=1)
+    bandwidth = int(np.max(elements.max(axis=1) - elementMin))
+    rowMin = np.arange(nodeNum)
+    np.minimum.at(rowMin, elements.ravel(), np.repeat(elementMin, elements.shape[1]))
+    profile = int(np.sum(np.arange(nodeNum) - rowMin))
+    return bandwidth, profile
+
+def getReverseCuthillMcKeeOrder(elements, nodeNum):
+    """
+    Calculate the Reverse Cuthill-McKee ordering of the nodes, which reduces the bandwidth of the matrix of nodes that share an element.
+
+    The node adjacency matrix is calculated as B*B^T, where B is the (sparse) node-element incidence matrix, so the 64 node pairs of each element are never stored.
+
+    :param elements: array mx8, The nodeIds of each element's nodes.
+    :param nodeNum: int, The number of nodes. The nodeIds are 1 to ``nodeNum``.
+    :return: array 1xn, The nodeIds in their new order, i.e. entry r is the old nodeId of the node that gets the new nodeId r + 1.
+    """
+    elements = np.asarray(elements, dtype=np.int64)
+    elementNum, elementNodeNum = elements.shape if elements.ndim == 2 else (0, 8)
+    # The entries of B*B^T count the elements that share each node pair, so int32 is used instead of a smaller type that could overflow to 0.
+    incidence = scipy.sparse.csr_matrix((np.ones(elements.size, dtype=np.int32), (elements.ravel() - 1, np.repeat(np.arange(elementNum), elementNodeNum))), shape=(nodeNum, elementNum))
+    adjacency = (incidence @ incidence.T).tocsr()
+    adjacency.sort_indices() # The product's column indices are not sorted, and the order of ties in reverse_cuthill_mckee depends on their order.
+    return scipy.sparse.csgraph.reverse_cuthill_mckee(adjacency, symmetric_mode=True).astype(np.int64) + 1
+
+def getMortonOrder(nodes, bitNum=21):
+    """
+    Calculate the Morton (Z-order space-filling curve) ordering of the nodes, which gives nearby nodes similar nodeIds.
+
+    Each coordinate is scaled to an integer with ``bitNum`` bits, and the bits of the three integers are interleaved to give each node's position along the curve.
+
+    :param nodes: array nx3, The coordinates of the nodes. Row r is the node with nodeId r + 1.
+    :param bitNum: int, The number of bits of each coordinate. 3*``bitNum`` must be less than 64.
+    :return: array 1xn, The nodeIds in their new order (see ``getReverseCuthillMcKeeOrder``).
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    if len(nodes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    minimum = nodes.min(axis=0)
+    extent = np.maximum(nodes.max(axis=0) - minimum, 1e-300)
+    integers = ((nodes - minimum)/extent*(2**bitNum - 1)).astype(np.uint64)
+    keys = np.zeros(len(nodes), dtype=np.uint64)
+    for bit in range(bitNum):
+        for axis in range(3):
+            keys |= ((integers[:,axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3*bit + axis)
+    return np.argsort(keys, kind='stable').astype(np.int64) + 1
+
+def renumberNodes(modelAssembly, method='rcm'):
+    """
+    Renumber the nodes of ``modelAssembly`` to reduce the bandwidth of the model's matrices, and improve the memory locality of the solver.
+    This is intended to be used after all of the parts are added, and before the model is written (e.g. with ``FebioFileWriter.getGeometryElement``).
+
+    The ordering is calculated for the whole model, and then each part's nodes are sorted by that ordering. The parts keep their nodeId ranges (``modelAssembly.nodeIds``), because each part stores its own nodes.
+    The nodes, the elements, and the nodeSets of every part are updated.
+
+    ..NOTE:: This function updates the parts in ``modelAssembly.parts`` by reference.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model assembly.
+    :param method: string, Either 'rcm' (Reverse Cuthill-McKee, see ``getReverseCuthillMcKeeOrder``) or 'morton' (see ``getMortonOrder``).
+    :return: dictionary, A dictionary with the following keys:
+        'bandwidthBefore', 'profileBefore': int, The bandwidth and profile before renumbering (see ``getBandwidthAndProfile``).
+        'bandwidthAfter', 'profileAfter': int, The bandwidth and profile after renumbering.
+        'nodeIdMap': array 1xn, The new nodeId of each old nodeId. Entry i is the new nodeId of the node that had nodeId i + 1.
+    """
+    nodeNum = modelAssembly.nodeIdOffset - 1
+    elements = modelAssembly.getGlobalElements()
+    bandwidthBefore, profileBefore = getBandwidthAndProfile(elements, nodeNum)
+
+    if method == 'rcm':
+        order = getReverseCuthillMcKeeOrder(elements, nodeNum) - 1
+    elif method == 'morton':
+        order = getMortonOrder(modelAssembly.getGlobalNodes()) - 1
+    else:
+        raise ValueError(f"The method: '{method}' is not defined. Use 'rcm' or 'morton'.")
+    rank = np.empty(nodeNum, dtype=np.int64)
+    rank[order] = np.arange(nodeNum)
+
+    # Sort each part's nodes by their rank, so each part keeps its range of nodeIds.
+    nodeIdMap = np.empty(nodeNum, dtype=np.int64)
+    for partName in modelAssembly.parts.keys():
+        partNodeIds = modelAssembly.nodeIds[partName]
+        partRows = np.arange(partNodeIds.start, partNodeIds.stop) - 1
+        partOrder = partRows[np.argsort(rank[partRows], kind='stable')]
+        nodeIdMap[partOrder] = np.arange(partNodeIds.start, partNodeIds.stop)
+        modelAssembly.parts[partName].nodes = np.asarray(modelAssembly.parts[partName].nodes)[partOrder - partNodeIds.start + 1]
+
+    for partName in modelAssembly.parts.keys():
+        part = modelAssembly.parts[partName]
+        part.elements = nodeIdMap[np.asarray(part.elements, dtype=np.int64) - 1]
+        for setName in part.nodeSets.keys():
+            part.nodeSets[setName] = nodeIdMap[np.asarray(part.nodeSets[setName], dtype=np.int64) - 1]
+
+    bandwidthAfter, profileAfter = getBandwidthAndProfile(modelAssembly.getGlobalElements(), nodeNum)
+    report = {'bandwidthBefore': bandwidthBefore,
+              'profileBefore': profileBefore,
+              'bandwidthAfter': bandwidthAfter,
+              'profileAfter': profileAfter,
+              'nodeIdMap': nodeIdMap}
+    return report
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,103 @@
+import os
+import sys
+import numpy as np
+import pytest
+import xml.etree.ElementTree as ET
+
+# The FebioTools modules use flat imports, so their directory is added to the python path.
+srcDir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+if srcDir not in sys.path:
+    sys.path.append(srcDir)
+
+# Custom modules/functions
+import FebioPart
+import FebioModelAssembly
+import FebioFileWriter
+import FebioFileReader
+import FebioFragmentCache
+
+def getModel(dtype):
+    """
+    Create a model with two parts of random hex8 elements, where each part has a nodeSet, and the second part has a nodeSet with a name that must be escaped.
+
+    :param dtype: numpy dtype, The type of the node coordinates.
+    :return: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model.
+    """
+    rng = np.random.default_rng(0)
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    for i, (nodeNum, elementNum) in enumerate([(50, 20), (30, 10)]):
+        part = FebioPart.Part(f'part{i}')
+        part.setNodes(rng.normal(size=(nodeNum, 3)).astype(dtype))
+        part.setElements(rng.integers(0, nodeNum, size=(elementNum, 8)))
+        part.setMaterialId(i + 1)
+        part.addNodeSet(np.arange(0, nodeNum, 3), f'part{i}NodeSet' if i == 0 else 'part1 "top" & <bottom>')
+        modelAssembly.addPart(part)
+    return modelAssembly
+
+def writeTree(modelAssembly, fileName, version='2.5', compactNodeSets=False):
+    """
+    Write the model with ``getGeometryElement`` and ``xmlElementWriter``, as described by ``streamGeometryWriter``.
+
+    :param modelAssembly: FebioTools.src.FebioModelAssembly.ModelAssembly object, The model.
+    :param fileName: string, The name of the file.
+    :param version: string, The FEBio file format version.
+    :param compactNodeSets: bool, Whether the nodeSets are written as comma separated lists.
+    """
+    rootElement = ET.Element('febio_spec', {'version': version})
+    rootElement.append(FebioFileWriter.getGeometryElement(modelAssembly, compactNodeSets, version))
+    if version != '2.5':
+        rootElement.append(FebioFileWriter.getMeshDomainsElement(modelAssembly))
+    FebioFileWriter.xmlElementWriter(rootElement, fileName)
+
+def readBytes(fileName):
+    """
+    :param fileName: string, The name of the file, which is decompressed if its extension is .gz or .zst.
+    :return: bytes, The (decompressed) content of the file.
+    """
+    with FebioFileWriter.openFile(fileName, mode='rb') as fl:
+        return fl.read()
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+@pytest.mark.parametrize('processNum', [None, 2])
+@pytest.mark.parametrize('version, compactNodeSets', [('2.5', False), ('3.0', True)])
+def test_streamWriterMatchesTreeWriter(tmp_path, dtype, processNum, version, compactNodeSets):
+    modelAssembly = getModel(dtype)
+    treeFileName = str(tmp_path/'tree.feb')
+    writeTree(modelAssembly, treeFileName, version, compactNodeSets)
+
+    fragmentCache = FebioFragmentCache.FragmentCache(cacheDir=str(tmp_path/'cache'))
+    for cache in [None, fragmentCache, fragmentCache]: # The second write with the cache uses the cached fragments.
+        streamFileName = str(tmp_path/'stream.feb')
+        FebioFileWriter.streamGeometryWriter(modelAssembly, streamFileName, {'version': version}, chunkSize=7, processNum=processNum, fragmentCache=cache, compactNodeSets=compactNodeSets)
+        assert readBytes(streamFileName) == readBytes(treeFileName)
+    assert fragmentCache.statistics['hits'] > 0
+
+def test_compactNodeSetsNeedVersion3(tmp_path):
+    modelAssembly = getModel(np.float64)
+    with pytest.raises(ValueError):
+        FebioFileWriter.getGeometryElement(modelAssembly, compactNodeSets=True)
+    with pytest.raises(ValueError):
+        FebioFileWriter.streamGeometryWriter(modelAssembly, str(tmp_path/'model.feb'), compactNodeSets=True)
+    assert not os.path.exists(str(tmp_path/'model.feb'))
+
+@pytest.mark.parametrize('extension, version, compactNodeSets', [('.feb', '2.5', False), ('.feb.gz', '2.5', False), ('.feb.gz', '3.0', True)])
+def test_readerRoundTrip(tmp_path, extension, version, compactNodeSets):
+    modelAssembly = getModel(np.float64)
+    fileName = str(tmp_path/f'model{extension}')
+    FebioFileWriter.streamGeometryWriter(modelAssembly, fileName, {'version': version}, compactNodeSets=compactNodeSets)
+    if extension.endswith('.gz'):
+        with open(fileName, mode='rb') as fl:
+            assert fl.read(2) == b'\x1f\x8b' # The gzip magic number
+
+    readModelAssembly = FebioFileReader.readModelAssembly(fileName, chunkSize=7)
+    assert list(readModelAssembly.parts.keys()) == list(modelAssembly.parts.keys())
+    assert [part.materialId for part in readModelAssembly.parts.values()] == [1, 2]
+    np.testing.assert_array_equal(readModelAssembly.getGlobalNodes(), modelAssembly.getGlobalNodes())
+    np.testing.assert_array_equal(readModelAssembly.getGlobalElements(), modelAssembly.getGlobalElements())
+    for setName in modelAssembly.nodeSetNames:
+        np.testing.assert_array_equal(readModelAssembly.getNodeSet(setName), modelAssembly.getNodeSet(setName))
+
+    # Writing the model that was read gives the same file.
+    readFileName = str(tmp_path/f'readModel{extension}')
+    FebioFileWriter.streamGeometryWriter(readModelAssembly, readFileName, {'version': version}, compactNodeSets=compactNodeSets)
+    assert readBytes(readFileName) == readBytes(fileName)
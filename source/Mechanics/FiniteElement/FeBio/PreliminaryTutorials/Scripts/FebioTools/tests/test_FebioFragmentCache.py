@@ -0,0 +1,29 @@
+import os
+import sys
+
+# The FebioTools modules use flat imports, so their directory is added to the python path.
+srcDir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+if srcDir not in sys.path:
+    sys.path.append(srcDir)
+
+# Custom modules/functions
+import FebioFragmentCache
+
+def test_diskCacheIsPrunedOldestFirst(tmp_path):
+    cache = FebioFragmentCache.FragmentCache(cacheDir=str(tmp_path), maxDiskBytes=3000)
+    keys = [FebioFragmentCache.getKey(('fragment', i)) for i in range(5)]
+    for i in range(5):
+        cache.getFragment(('fragment', i), lambda: b'x'*1000)
+        os.utime(os.path.join(str(tmp_path), keys[i]), ns=(i*10**9, i*10**9)) # Give each file a distinct modification time.
+    cache.getFragment(('fragment', 5), lambda: b'x'*1000)
+
+    assert sorted(os.listdir(str(tmp_path))) == sorted(keys[3:] + [FebioFragmentCache.getKey(('fragment', 5))])
+    assert cache.diskByteNum == 3000
+
+def test_clearDiskOnlyRemovesFragmentFiles(tmp_path):
+    (tmp_path/'notes.txt').write_text('not a fragment')
+    cache = FebioFragmentCache.FragmentCache(cacheDir=str(tmp_path))
+    cache.getFragment(('fragment', 0), lambda: b'text')
+    cache.clearDisk()
+    assert os.listdir(str(tmp_path)) == ['notes.txt']
+    assert cache.diskByteNum == 0
@@ -0,0 +1,101 @@
+import os
+import sys
+import numpy as np
+
+# The FebioTools modules and the finite element formulation scripts use flat imports, so their directories are added to the python path.
+testDir = os.path.dirname(os.path.abspath(__file__))
+for directory in [os.path.join(testDir, '..', 'src'), os.path.join(testDir, '..', '..', '..', '..', '..', 'FiniteElementFormulation', 'Scripts')]:
+    if os.path.abspath(directory) not in sys.path:
+        sys.path.append(os.path.abspath(directory))
+
+# Custom modules/functions
+import FebioPart
+import FebioModelAssembly
+import FebioNodeMerging
+import FebioFileWriter
+import FebioFileReader
+import MeshQuality
+
+def getBoxPart(name, yStart, materialId):
+    """
+    Create a part with one 1x1x1 hex8 element that starts at y = ``yStart``.
+
+    :param name: string, The part's name.
+    :param yStart: float, The y coordinate of the element's first face.
+    :param materialId: int, The part's materialId.
+    :return: FebioTools.src.FebioPart.Part object, The part.
+    """
+    part = FebioPart.Part(name)
+    part.setNodes(np.array([[0., 0., 0.], [1., 0., 0.], [1., 1., 0.], [0., 1., 0.], [0., 0., 1.], [1., 0., 1.], [1., 1., 1.], [0., 1., 1.]]) + [0., yStart, 0.])
+    part.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part.setMaterialId(materialId)
+    return part
+
+def getMergedModel():
+    """
+    Create three boxes, where part1 shares a face with part0, and part2 is a copy of part1, and merge their coincident nodes.
+    All of part2's nodes are merged into the nodes of part0 and part1.
+
+    :return: [FebioTools.src.FebioModelAssembly.ModelAssembly object, dictionary], The merged model, and the report from ``mergeCoincidentNodes``.
+    """
+    part0 = getBoxPart('part0', 0., 1)
+    part0.addNodeSet([0, 1, 4, 5], 'part0FixedNodeSet')
+    part1 = getBoxPart('part1', 1., 2)
+    part1.addNodeSet([2, 3, 6, 7], 'part1LoadedNodeSet')
+    part2 = getBoxPart('part2', 1., 3)
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    for part in [part0, part1, part2]:
+        modelAssembly.addPart(part)
+    report = FebioNodeMerging.mergeCoincidentNodes(modelAssembly, 1e-6)
+    return modelAssembly, report
+
+def test_mergeCoincidentNodes():
+    modelAssembly, report = getMergedModel()
+    assert modelAssembly.nodeIdOffset == 13
+    assert [len(modelAssembly.nodeIds[partName]) for partName in ['part0', 'part1', 'part2']] == [8, 4, 0]
+    np.testing.assert_array_equal(modelAssembly.parts['part2'].elements, modelAssembly.parts['part1'].elements)
+    np.testing.assert_array_equal(modelAssembly.getGlobalNodes()[modelAssembly.parts['part1'].elements[0] - 1], getBoxPart('part1', 1., 2).nodes)
+
+def test_acrossPartsOnlyDoesNotMergeNodesOfTheSamePart():
+    # Both nodes of part1 are coincident with the node of part0, but they are not coincident with each other.
+    part0 = FebioPart.Part('part0')
+    part0.setNodes(np.array([[0., 0., 0.]]))
+    part0.setElements(np.zeros((0, 8), dtype=int))
+    part1 = FebioPart.Part('part1')
+    part1.setNodes(np.array([[0.06, 0., 0.], [-0.06, 0., 0.]]))
+    part1.setElements(np.zeros((0, 8), dtype=int))
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    modelAssembly.addPart(part0)
+    modelAssembly.addPart(part1)
+
+    report = FebioNodeMerging.mergeCoincidentNodes(modelAssembly, 0.1)
+    np.testing.assert_array_equal(report['removedNodeIds'], [2])
+    np.testing.assert_array_equal(report['nodeIdMap'], [1, 1, 2])
+    assert len(modelAssembly.parts['part1'].nodes) == 1
+
+def test_mergedModelRoundTrip(tmp_path):
+    modelAssembly = getMergedModel()[0]
+    fileName = str(tmp_path/'mergedModel.feb')
+    FebioFileWriter.streamGeometryWriter(modelAssembly, fileName)
+    readModelAssembly = FebioFileReader.readModelAssembly(fileName)
+
+    assert list(readModelAssembly.nodeIds.values()) == list(modelAssembly.nodeIds.values())
+    assert readModelAssembly.nodeSetParts == modelAssembly.nodeSetParts
+    np.testing.assert_array_equal(readModelAssembly.getGlobalNodes(), modelAssembly.getGlobalNodes())
+    np.testing.assert_array_equal(readModelAssembly.getGlobalElements(), modelAssembly.getGlobalElements())
+    for setName in modelAssembly.nodeSetNames:
+        np.testing.assert_array_equal(readModelAssembly.getNodeSet(setName), modelAssembly.getNodeSet(setName))
+
+    # Writing the model that was read gives the same file.
+    FebioFileWriter.streamGeometryWriter(readModelAssembly, str(tmp_path/'readModel.feb'))
+    with open(fileName, mode='rb') as fl, open(str(tmp_path/'readModel.feb'), mode='rb') as readFl:
+        assert fl.read() == readFl.read()
+
+def test_modelQualityOfMergedModel():
+    modelAssembly = getMergedModel()[0]
+    modelQuality = MeshQuality.getModelQuality(modelAssembly)
+    assert list(modelQuality.keys()) == ['part0', 'part1', 'part2']
+    for partName in modelQuality.keys():
+        np.testing.assert_allclose(modelQuality[partName]['scaledJacobian'], [1.])
+        np.testing.assert_allclose(modelQuality[partName]['aspectRatio'], [1.])
+        assert not np.any(modelQuality[partName]['isInverted'])
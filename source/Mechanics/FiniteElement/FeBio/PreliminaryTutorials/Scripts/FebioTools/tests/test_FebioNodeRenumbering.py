@@ -0,0 +1,23 @@
+import os
+import sys
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+# The FebioTools modules use flat imports, so their directory is added to the python path.
+srcDir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+if srcDir not in sys.path:
+    sys.path.append(srcDir)
+
+# Custom modules/functions
+import FebioNodeRenumbering
+
+def test_reverseCuthillMcKeeKeepsNodePairsOfManyElements():
+    # 256 elements share the nodes 1 and 2, which is more than a count of type int8 can store.
+    elements = np.array([[1, 2] + list(range(3 + 6*i, 9 + 6*i)) for i in range(256)])
+    nodeNum = int(elements.max())
+    rows = np.repeat(elements - 1, 8, axis=1).ravel()
+    columns = np.tile(elements - 1, (1, 8)).ravel()
+    adjacency = scipy.sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, columns)), shape=(nodeNum, nodeNum))
+    expectedOrder = scipy.sparse.csgraph.reverse_cuthill_mckee(adjacency, symmetric_mode=True) + 1
+    np.testing.assert_array_equal(FebioNodeRenumbering.getReverseCuthillMcKeeOrder(elements, nodeNum), expectedOrder)
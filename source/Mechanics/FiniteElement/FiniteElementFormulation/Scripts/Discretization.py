@@ -42,17 +42,11 @@ def getDisplacementGradient(elementNodes, elementNodeDisp, isoparaCoord):
     :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
     :return: array 3x3, The deformation gradient at the point in the point (p) that corresponds to the given isoparametric coordinate (``isoparaCoord``).
     """
-    # Get the gradient of the 8 shape functions.
-    dNI_dXA = getShapeFunctionGradient(elementNodes, isoparaCoord)
-
-    displacementGradient = np.zeros((3,3))
-    for i in range(8): # Iterate over the 8 shape functions
-        u_i = np.array([[elementNodeDisp[i,0]], [elementNodeDisp[i,1]], [elementNodeDisp[i,2]]]) # Rearrange the displacement of node_i into a 3x1 array.
-        dNI_dXA_i = np.reshape(dNI_dXA[i], (1,3)) # Get the gradient of the ith shape function and rearranged it into a 3x1 array.
-
-        displacementGradient_i = u_i@dNI_dXA_i # du_dx = [[u_1*dNI_dX1, u_1*dNI_dX2, u_1*dNI_dX3],[u_2*dNI_dX1, u_2*dNI_dX2, u_2*dNI_dX3],[u_3*dNI_dX1, u_3*dNI_dX2, u_3*dNI_dX3]]
-        displacementGradient = displacementGradient + displacementGradient_i
-
+    # The single element, single point calculation is a special case of the batched calculation (one element and one isoparametric point).
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    elementNodeDisp = np.asarray(elementNodeDisp, dtype=float)
+    isoparaCoord = np.asarray(isoparaCoord, dtype=float)
+    displacementGradient = getDisplacementGradientBatch(elementNodes[np.newaxis], elementNodeDisp[np.newaxis], isoparaCoord.reshape((1,3)))[0,0]
     return displacementGradient
 
 def getShapeFunctionGradient(elementNodes, isoparaCoord):
@@ -70,25 +64,10 @@ def getShapeFunctionGradient(elementNodes, isoparaCoord):
     :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
     :return: array 8x3, The gradient of the 8 shape functions at the point in the point (p) that corresponds to the given isoparametric coordinate (``isoparaCoord``).
     """
-    # Calculate the derivative of the shape functions with respect to the isoparametric coordinate system (theta0, theta1, theta2)
-    # Note that the shape functions are already known, and the form of the derivatives is already known, so the values of isoparametric point's coordinates are substituted into the values.
-    # The structure of these values is as such:
-    # dNa_dtheta0[0] = partial derivative if shape function 1 (N^1) with respect to theta0
-    # dNa_dtheta0[1] = partial derivative if shape function 2 (N^2) with respect to theta0
-    # ...
-    # dNa_dtheta0[7] = partial derivative if shape function 8 (N^8) with respect to theta0
-    dNI_dtheta0, dNI_dtheta1, dNI_dtheta2 = getShapeFunctionDerivative(isoparaCoord)
-
-    # Calculate the Jacobian of the mapping from the given isoparametric coordinate (``isoparaCoord``) to the element's coordinate system.
-    jacobian = getIsoparametricJacobian(elementNodes, isoparaCoord)
-    # Calculate the inverse of the Jacobian that was just calculated
-    inverseJacobian = np.linalg.inv(jacobian)
-
-    # Pg 63 and 64 in Kim, Introduction to Nonlinear Finite Element Analysis
-    dNI_dXA = np.zeros((8, 3)) # Initialize the gradient of the 8 shape functions
-    for I in range(8):  # Iterate over the 8 shape functions
-        dNjdr = np.array([dNI_dtheta0[I], dNI_dtheta1[I], dNI_dtheta2[I]]).reshape((1, 3))  # The partial derivative of the Ith shape function wrt. the isoparametric coordinates.
-        dNI_dXA[I] = dNjdr@inverseJacobian
+    # The single element, single point calculation is a special case of the batched calculation (one element and one isoparametric point).
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    isoparaCoord = np.asarray(isoparaCoord, dtype=float)
+    dNI_dXA = getShapeFunctionGradientBatch(elementNodes[np.newaxis], isoparaCoord.reshape((1,3)))[0,0]
     return dNI_dXA
 
 
@@ -102,31 +81,10 @@ def getIsoparametricJacobian(elementNodes, isoparaCoord):
     :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
     :return: array 3x3, The Jacobian of the mapping from the point in isoparametric space to corresponding point in the space that the given nodes are defined with respect to.
     """
-    # Calculate the derivative of the shape functions with respect to the isoparametric coordinate system (theta0, theta1, theta2)
-    # Note that the shape functions are already known, and the form of the derivatives is already known, so the values of isoparametric point's coordinates are substituted into the values.
-    # The structure of these values is as such:
-    # dNa_dtheta0[0] = partial derivative if shape function 1 (N^1) with respect to theta0
-    # dNa_dtheta0[1] = partial derivative if shape function 2 (N^2) with respect to theta0
-    # ...
-    # dNa_dtheta0[7] = partial derivative if shape function 8 (N^8) with respect to theta0
-    dNI_dtheta0, dNI_dtheta1, dNI_dtheta2 = getShapeFunctionDerivative(isoparaCoord)
-
-    jacobian = np.zeros((3, 3)) # Initialize the desired Jacobian before we start the summation.
-    for i in range(8): # Iterate over the eight points and shape functions
-        jacobian_i = np.zeros((3, 3))  # Initialize an array for the ith iteration.
-        jacobian_i[0,0] = dNI_dtheta0[i]*elementNodes[i,0]
-        jacobian_i[0,1] = dNI_dtheta1[i]*elementNodes[i,0]
-        jacobian_i[0,2] = dNI_dtheta2[i]*elementNodes[i,0]
-
-        jacobian_i[1,0] = dNI_dtheta0[i]*elementNodes[i,1]
-        jacobian_i[1,1] = dNI_dtheta1[i]*elementNodes[i,1]
-        jacobian_i[1,2] = dNI_dtheta2[i]*elementNodes[i,1]
-
-        jacobian_i[2,0] = dNI_dtheta0[i]*elementNodes[i,2]
-        jacobian_i[2,1] = dNI_dtheta1[i]*elementNodes[i,2]
-        jacobian_i[2,2] = dNI_dtheta2[i]*elementNodes[i,2]
-
-        jacobian = jacobian + jacobian_i
+    # The single element, single point calculation is a special case of the batched calculation (one element and one isoparametric point).
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    isoparaCoord = np.asarray(isoparaCoord, dtype=float)
+    jacobian = getIsoparametricJacobianBatch(elementNodes[np.newaxis], isoparaCoord.reshape((1,3)))[0,0]
     return jacobian
 
 
@@ -155,16 +113,200 @@ def getShapeFunctionDerivative(isoparaCoord):
     :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
     :return: [array 1x8, array 1x8, array 1x8], The partial derivative of 8 shape functions with respect to theta0, theta1, theta2 [dNI_dtheta0, dNI_dtheta1, dNI_dtheta2].
     """
-    dNI_dtheta0 = np.array([-1*(1 - isoparaCoord[1])*(1 - isoparaCoord[2]), 1*(1 - isoparaCoord[1])*(1 - isoparaCoord[2]), 1*(1 + isoparaCoord[1])*(1 - isoparaCoord[2]), -1*(1 + isoparaCoord[1])*(1 - isoparaCoord[2]),
-                            -1*(1 - isoparaCoord[1])*(1 + isoparaCoord[2]), 1*(1 - isoparaCoord[1])*(1 + isoparaCoord[2]), 1*(1 + isoparaCoord[1])*(1 + isoparaCoord[2]), -1*(1 + isoparaCoord[1])*(1 + isoparaCoord[2])])*0.125
+    dNI_dtheta = getShapeFunctionDerivativeBatch(np.asarray(isoparaCoord, dtype=float).reshape((1,3)))[0] # array 8x3, Column A is the derivative with respect to thetaA.
+    dNI_dtheta0 = dNI_dtheta[:,0]
+    dNI_dtheta1 = dNI_dtheta[:,1]
+    dNI_dtheta2 = dNI_dtheta[:,2]
+    return dNI_dtheta0, dNI_dtheta1, dNI_dtheta2
 
-    dNI_dtheta1 = np.array([-1*(1 - isoparaCoord[0])*(1 - isoparaCoord[2]), -1*(1 + isoparaCoord[0])*(1 - isoparaCoord[2]), 1*(1 + isoparaCoord[0])*(1 - isoparaCoord[2]), 1*(1 - isoparaCoord[0])*(1 - isoparaCoord[2]),
-                            -1*(1 - isoparaCoord[0])*(1 + isoparaCoord[2]), -1*(1 + isoparaCoord[0])*(1 + isoparaCoord[2]), 1*(1 + isoparaCoord[0])*(1 + isoparaCoord[2]), 1*(1 - isoparaCoord[0])*(1 + isoparaCoord[2])])*0.125
+# The isoparametric coordinates of the 8 nodes of the isoparametric element. Row I is the (theta0, theta1, theta2) coordinate of node_I.
+# Each shape function can be written as N^I = 1/8*(1 + theta0_I*theta0)*(1 + theta1_I*theta1)*(1 + theta2_I*theta2), where (theta0_I, theta1_I, theta2_I) is row I of this array.
+hex8NodeIsoparaCoords = np.array([[-1., -1., -1.], [1., -1., -1.], [1., 1., -1.], [-1., 1., -1.],
+                                  [-1., -1., 1.], [1., -1., 1.], [1., 1., 1.], [-1., 1., 1.]])
 
-    dNI_dtheta2 = np.array([-1*(1 - isoparaCoord[0])*(1 - isoparaCoord[1]), -1*(1 + isoparaCoord[0])*(1 - isoparaCoord[1]), -1*(1 + isoparaCoord[0])*(1 + isoparaCoord[1]), -1*(1 - isoparaCoord[0])*(1 + isoparaCoord[1]),
-                            1*(1 - isoparaCoord[0])*(1 - isoparaCoord[1]), 1*(1 + isoparaCoord[0])*(1 - isoparaCoord[1]), 1*(1 + isoparaCoord[0])*(1 + isoparaCoord[1]), 1*(1 - isoparaCoord[0])*(1 + isoparaCoord[1])])*0.125
+def getShapeFunctionBatch(isoparaCoords):
+    """
+    Calculate the value of the 8 shape functions at each of the given isoparametric points.
 
-    return dNI_dtheta0, dNI_dtheta1, dNI_dtheta2
+    ..NOTE:: This function assumes that an eight noded hexahedral element is being used with known basis functions.
+
+    :param isoparaCoords: array px3, The coordinates of p points in the isoparametric coordinate system.
+    :return: array px8, The value of the 8 shape functions at each point. Entry [p,I] is N^I evaluated at point p.
+    """
+    isoparaCoords = np.asarray(isoparaCoords, dtype=float).reshape((-1,3))
+    # (1 + theta_I*theta) for every point, node and isoparametric direction. Shape px8x3.
+    linearTerms = 1. + isoparaCoords[:,np.newaxis,:]*hex8NodeIsoparaCoords[np.newaxis,:,:]
+    return 0.125*np.prod(linearTerms, axis=2)
+
+def getShapeFunctionDerivativeBatch(isoparaCoords):
+    """
+    Calculate the derivative of the 8 shape functions with respect to the isoparametric coordinate system (theta0, theta1, theta2) at each of the given isoparametric points.
+    This is the batched version of ``getShapeFunctionDerivative``.
+
+    ..NOTE:: This function assumes that an eight noded hexahedral element is being used with known basis functions.
+
+    :param isoparaCoords: array px3, The coordinates of p points in the isoparametric coordinate system.
+    :return: array px8x3, Entry [p,I,A] is the partial derivative of shape function N^I with respect to thetaA at point p.
+    """
+    isoparaCoords = np.asarray(isoparaCoords, dtype=float).reshape((-1,3))
+    # (1 + theta_I*theta) for every point, node and isoparametric direction. Shape px8x3.
+    linearTerms = 1. + isoparaCoords[:,np.newaxis,:]*hex8NodeIsoparaCoords[np.newaxis,:,:]
+
+    dNI_dtheta = np.empty(linearTerms.shape)
+    # dN^I/dtheta0 = 1/8*theta0_I*(1 + theta1_I*theta1)*(1 + theta2_I*theta2), and similarly for theta1 and theta2.
+    dNI_dtheta[:,:,0] = hex8NodeIsoparaCoords[:,0]*linearTerms[:,:,1]*linearTerms[:,:,2]
+    dNI_dtheta[:,:,1] = hex8NodeIsoparaCoords[:,1]*linearTerms[:,:,0]*linearTerms[:,:,2]
+    dNI_dtheta[:,:,2] = hex8NodeIsoparaCoords[:,2]*linearTerms[:,:,0]*linearTerms[:,:,1]
+    dNI_dtheta *= 0.125
+    return dNI_dtheta
+
+def getIsoparametricJacobianBatch(elementNodes, isoparaCoords):
+    """
+    Calculate the Jacobian of the mapping from the isoparametric space for every given element at every given isoparametric point.
+    This is the batched version of ``getIsoparametricJacobian``.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param elementNodes: array ex8x3, The coordinates of the nodes of e elements. ``elementNodes[e]`` is ordered the same way as ``elementNodes`` in ``getIsoparametricJacobian``.
+    :param isoparaCoords: array px3 or Quadrature.QuadratureRule instance, The coordinates of p points in the isoparametric coordinate system. If a quadrature rule is given, then its precomputed shape function derivatives are used.
+    :return: array exp x3x3, Entry [e,p] is the Jacobian of element e at isoparametric point p.
+    """
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    dNI_dtheta = _getShapeFunctionDerivativeTable(isoparaCoords)
+    # J_iA = sum_I x^I_i*dN^I/dthetaA
+    return np.einsum('eIi,pIA->epiA', elementNodes, dNI_dtheta, optimize=True)
+
+def getShapeFunctionGradientBatch(elementNodes, isoparaCoords, checkJacobian=False, returnJacobianDeterminant=False):
+    """
+    Calculate the gradient of the 8 shape functions with respect to the coordinate system that ``elementNodes`` is defined in, for every given element at every given isoparametric point.
+    This is the batched version of ``getShapeFunctionGradient``.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param elementNodes: array ex8x3, The coordinates of the nodes of e elements. ``elementNodes[e]`` is ordered the same way as ``elementNodes`` in ``getShapeFunctionGradient``.
+    :param isoparaCoords: array px3 or Quadrature.QuadratureRule instance, The coordinates of p points in the isoparametric coordinate system. If a quadrature rule is given, then its precomputed shape function derivatives are used.
+    :param checkJacobian: bool, If True, then an InvertedElementError is raised if the Jacobian determinant is not positive at any of the points.
+    :param returnJacobianDeterminant: bool, If True, then the determinant of the Jacobian is also returned.
+    :return: array exp x8x3, Entry [e,p] is the 8x3 gradient of the shape functions of element e at isoparametric point p. If ``returnJacobianDeterminant`` is True, then the tuple (gradient, array exp determinant) is returned.
+    """
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    dNI_dtheta = _getShapeFunctionDerivativeTable(isoparaCoords)
+    jacobian = np.einsum('eIi,pIA->epiA', elementNodes, dNI_dtheta, optimize=True)
+    inverseJacobian, jacobianDeterminant = getInverseAndDeterminantBatch(jacobian, checkDeterminant=checkJacobian)
+
+    # Pg 63 and 64 in Kim, Introduction to Nonlinear Finite Element Analysis
+    # dN^I/dX_A = dN^I/dtheta_B*(J^-1)_BA
+    dNI_dXA = np.einsum('pIB,epBA->epIA', dNI_dtheta, inverseJacobian, optimize=True)
+    if returnJacobianDeterminant:
+        return dNI_dXA, jacobianDeterminant
+    return dNI_dXA
+
+def getDisplacementGradientBatch(elementNodes, elementNodeDisp, isoparaCoords, checkJacobian=False):
+    """
+    Calculate the displacement gradient with respect to the coordinate system that ``elementNodes`` is defined in, for every given element at every given isoparametric point.
+    This is the batched version of ``getDisplacementGradient``.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param elementNodes: array ex8x3, The coordinates of the nodes of e elements. ``elementNodes[e]`` is ordered the same way as ``elementNodes`` in ``getDisplacementGradient``.
+    :param elementNodeDisp: array ex8x3, The displacements of the nodes of the e elements. The order should relate to the order of ``elementNodes``.
+    :param isoparaCoords: array px3 or Quadrature.QuadratureRule instance, The coordinates of p points in the isoparametric coordinate system. If a quadrature rule is given, then its precomputed shape function derivatives are used.
+    :param checkJacobian: bool, If True, then an InvertedElementError is raised if the Jacobian determinant is not positive at any of the points.
+    :return: array exp x3x3, Entry [e,p] is the displacement gradient of element e at isoparametric point p.
+    """
+    elementNodeDisp = np.asarray(elementNodeDisp, dtype=float)
+    dNI_dXA = getShapeFunctionGradientBatch(elementNodes, isoparaCoords, checkJacobian=checkJacobian)
+    # du_i/dX_A = sum_I u^I_i*dN^I/dX_A
+    return np.einsum('eIi,epIA->epiA', elementNodeDisp, dNI_dXA, optimize=True)
+
+class InvertedElementError(ValueError):
+    def __init__(self, elementIndices):
+        """
+        The error that is raised when the Jacobian determinant of one or more elements is not positive (i.e. the element is inverted or degenerate).
+
+        :param elementIndices: array 1xk, The indices of the elements that have a non-positive Jacobian determinant. The indices relate to the first axis of the arrays that were checked.
+        """
+        self.elementIndices = np.asarray(elementIndices, dtype=int) #: array 1xk, The indices of the offending elements.
+        shownIndices = ', '.join(str(i) for i in self.elementIndices[:20])
+        if len(self.elementIndices) > 20:
+            shownIndices = shownIndices + ', ...'
+        super().__init__(f"{len(self.elementIndices)} element(s) have a non-positive Jacobian determinant. Element indices: [{shownIndices}]")
+
+def getInverseAndDeterminantBatch(matrices, checkDeterminant=False):
+    """
+    Calculate the inverse and determinant of a stack of 3x3 matrices using the closed form (cofactor) expressions.
+    For 3x3 matrices this is much faster than ``np.linalg.inv``, and the determinant is calculated at the same time.
+
+    Singular matrices do not raise an error. Their inverse contains inf or nan values, and their determinant is zero.
+
+    :param matrices: array ...x3x3, The matrices. Usually this is an exp x3x3 array of Jacobians, where the first axis is the element index.
+    :param checkDeterminant: bool, If True, then an InvertedElementError is raised if any of the determinants are not positive. The error lists the offending indices along the first axis of ``matrices``.
+    :return: [array ...x3x3, array ...], The inverse of each matrix, and the determinant of each matrix.
+    """
+    a = np.asarray(matrices, dtype=float)
+    # The cofactors of the first row. These are reused for the determinant.
+    c00 = a[...,1,1]*a[...,2,2] - a[...,1,2]*a[...,2,1]
+    c01 = a[...,1,2]*a[...,2,0] - a[...,1,0]*a[...,2,2]
+    c02 = a[...,1,0]*a[...,2,1] - a[...,1,1]*a[...,2,0]
+    determinant = a[...,0,0]*c00 + a[...,0,1]*c01 + a[...,0,2]*c02
+
+    if checkDeterminant:
+        invertedIndices = getNonPositiveDeterminantIndices(determinant)
+        if len(invertedIndices) > 0:
+            raise InvertedElementError(invertedIndices)
+
+    # The inverse is the transpose of the cofactor matrix divided by the determinant.
+    inverse = np.empty(a.shape)
+    inverse[...,0,0] = c00
+    inverse[...,1,0] = c01
+    inverse[...,2,0] = c02
+    inverse[...,0,1] = a[...,0,2]*a[...,2,1] - a[...,0,1]*a[...,2,2]
+    inverse[...,1,1] = a[...,0,0]*a[...,2,2] - a[...,0,2]*a[...,2,0]
+    inverse[...,2,1] = a[...,0,1]*a[...,2,0] - a[...,0,0]*a[...,2,1]
+    inverse[...,0,2] = a[...,0,1]*a[...,1,2] - a[...,0,2]*a[...,1,1]
+    inverse[...,1,2] = a[...,0,2]*a[...,1,0] - a[...,0,0]*a[...,1,2]
+    inverse[...,2,2] = a[...,0,0]*a[...,1,1] - a[...,0,1]*a[...,1,0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse /= determinant[...,np.newaxis,np.newaxis]
+    return inverse, determinant
+
+def getDeterminantBatch(matrices):
+    """
+    Calculate the determinant of a stack of 3x3 matrices using the closed form expression.
+
+    :param matrices: array ...x3x3, The matrices.
+    :return: array ..., The determinant of each matrix.
+    """
+    a = np.asarray(matrices, dtype=float)
+    return (a[...,0,0]*(a[...,1,1]*a[...,2,2] - a[...,1,2]*a[...,2,1])
+            + a[...,0,1]*(a[...,1,2]*a[...,2,0] - a[...,1,0]*a[...,2,2])
+            + a[...,0,2]*(a[...,1,0]*a[...,2,1] - a[...,1,1]*a[...,2,0]))
+
+def getNonPositiveDeterminantIndices(determinants):
+    """
+    Get the indices (along the first axis) of the entries in ``determinants`` that have at least one non-positive value.
+    For an exp array of Jacobian determinants, these are the indices of the inverted or degenerate elements.
+
+    :param determinants: array e or exp, The Jacobian determinants.
+    :return: array 1xk, The sorted indices of the elements with a non-positive determinant.
+    """
+    determinants = np.asarray(determinants)
+    isBad = ~(determinants > 0) # This also catches nan values
+    if determinants.ndim > 1:
+        isBad = isBad.reshape((len(determinants), -1)).any(axis=1)
+    return np.flatnonzero(isBad)
+
+def _getShapeFunctionDerivativeTable(isoparaCoords):
+    """
+    Get the derivative of the 8 shape functions with respect to the isoparametric coordinate system at the given isoparametric points.
+    If ``isoparaCoords`` is a quadrature rule (see Quadrature.py), then the rule's precomputed table is used instead of recalculating the derivatives.
+
+    :param isoparaCoords: array px3 or Quadrature.QuadratureRule instance, The isoparametric points.
+    :return: array px8x3, Entry [p,I,A] is the partial derivative of shape function N^I with respect to thetaA at point p.
+    """
+    if hasattr(isoparaCoords, 'shapeFunctionDerivatives'):
+        return isoparaCoords.shapeFunctionDerivatives
+    return getShapeFunctionDerivativeBatch(isoparaCoords)
 
 if __name__ == '__main__':
     example()
@@ -0,0 +1,201 @@
+import argparse
+import datetime
+import json
+import platform
+import time
+import tracemalloc
+import numpy as np
+
+# Custom modules/functions
+import Discretization
+import Quadrature
+
+def getSyntheticMesh(elementNum, distortion=0.2, seed=0):
+    """
+    Create a structured n x n x n hex8 mesh with randomly perturbed nodes, where n^3 is close to ``elementNum``.
+
+    :param elementNum: int, The approximate number of elements.
+    :param distortion: float, The nodes are moved by a random amount between -``distortion`` and ``distortion`` in each direction. The element edge length is 1.
+    :param seed: int, The seed for the random number generator, so the same mesh is created every time.
+    :return: [array nx3, array ex8], The nodes and the elements.
+    """
+    n = max(int(round(elementNum**(1./3.))), 1)
+    rng = np.random.default_rng(seed)
+    # The node with grid index (i,j,k) has nodeId (k*(n + 1) + j)*(n + 1) + i
+    k, j, i = np.meshgrid(np.arange(n + 1), np.arange(n + 1), np.arange(n + 1), indexing='ij')
+    nodes = np.column_stack([i.ravel(), j.ravel(), k.ravel()]).astype(float)
+    nodes += rng.uniform(-distortion, distortion, nodes.shape)
+
+    k, j, i = [index.ravel() for index in np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing='ij')]
+    first = (k*(n + 1) + j)*(n + 1) + i # The nodeId of node0 of each element
+    offsets = np.array([0, 1, n + 2, n + 1]) # node0 to node3 relative to node0
+    offsets = np.concatenate([offsets, offsets + (n + 1)**2]) # node4 to node7 are one layer above
+    elements = first[:,np.newaxis] + offsets
+    return nodes, elements
+
+def getReferenceJacobian(elementNodes, isoparaCoord):
+    """
+    Calculate the isoparametric Jacobian of one element at one point with the original per-node loop of Discretization.py, as an independent reference for the batched kernels.
+
+    :param elementNodes: array 8x3, The coordinates of the element's nodes.
+    :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
+    :return: array 3x3, The Jacobian (see ``Discretization.getIsoparametricJacobian``).
+    """
+    dNI_dtheta = _getReferenceShapeFunctionDerivative(isoparaCoord)
+    jacobian = np.zeros((3, 3))
+    for I in range(8): # Iterate over the eight nodes and shape functions
+        jacobian = jacobian + np.outer(elementNodes[I], dNI_dtheta[I])
+    return jacobian
+
+def getReferenceShapeFunctionGradient(elementNodes, isoparaCoord):
+    """
+    Calculate the shape function gradient of one element at one point with the original per-node loop of Discretization.py and ``np.linalg.inv``, as an independent reference for the batched kernels.
+
+    :param elementNodes: array 8x3, The coordinates of the element's nodes.
+    :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
+    :return: array 8x3, The gradient of the 8 shape functions (see ``Discretization.getShapeFunctionGradient``).
+    """
+    dNI_dtheta = _getReferenceShapeFunctionDerivative(isoparaCoord)
+    inverseJacobian = np.linalg.inv(getReferenceJacobian(elementNodes, isoparaCoord))
+    dNI_dXA = np.zeros((8, 3))
+    for I in range(8): # Iterate over the 8 shape functions
+        dNI_dXA[I] = dNI_dtheta[I]@inverseJacobian
+    return dNI_dXA
+
+def getReferenceDisplacementGradient(elementNodes, elementNodeDisp, isoparaCoord):
+    """
+    Calculate the displacement gradient of one element at one point with the original per-node loop of Discretization.py, as an independent reference for the batched kernels.
+
+    :param elementNodes: array 8x3, The coordinates of the element's nodes.
+    :param elementNodeDisp: array 8x3, The displacements of the element's nodes.
+    :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
+    :return: array 3x3, The displacement gradient (see ``Discretization.getDisplacementGradient``).
+    """
+    dNI_dXA = getReferenceShapeFunctionGradient(elementNodes, isoparaCoord)
+    displacementGradient = np.zeros((3, 3))
+    for I in range(8): # Iterate over the 8 shape functions
+        displacementGradient = displacementGradient + np.outer(elementNodeDisp[I], dNI_dXA[I])
+    return displacementGradient
+
+def _getReferenceShapeFunctionDerivative(isoparaCoord):
+    """
+    Calculate the derivative of the 8 shape functions with respect to the isoparametric coordinates, one shape function at a time.
+
+    :param isoparaCoord: array 1x3, The coordinates of a point in the isoparametric coordinate system.
+    :return: array 8x3, Entry [I,A] is the partial derivative of shape function N^I with respect to thetaA.
+    """
+    dNI_dtheta = np.zeros((8, 3))
+    for I in range(8):
+        theta_I = Discretization.hex8NodeIsoparaCoords[I]
+        linearTerms = 1 + theta_I*isoparaCoord # (1 + theta0_I*theta0), (1 + theta1_I*theta1), (1 + theta2_I*theta2)
+        dNI_dtheta[I] = 0.125*theta_I*np.array([linearTerms[1]*linearTerms[2], linearTerms[0]*linearTerms[2], linearTerms[0]*linearTerms[1]])
+    return dNI_dtheta
+
+def runBenchmarks(sizes, quadratureRule='gauss2', singleElementLimit=2000, chunkSize=100000, repeats=3):
+    """
+    Time the Jacobian, shape function gradient, and displacement gradient calculations in Discretization.py for meshes of different sizes.
+
+    The batched functions are run on the whole mesh (in chunks of ``chunkSize`` elements).
+    The reference functions of this module (the original per-element loops) and the single element functions of Discretization.py are run on the first ``singleElementLimit`` elements, because looping over every element of a large mesh takes too long, and the time per element is reported.
+    The single element functions call the batched kernels with one element, so their time is the overhead of that wrapper, and the speedup is measured against the reference loop.
+    The batched results are compared with the reference results for the elements that are run with both.
+
+    :param sizes: list, The approximate number of elements of each mesh.
+    :param quadratureRule: string, The name of the quadrature rule (see ``Quadrature.getQuadratureRule``).
+    :param singleElementLimit: int, The maximum number of elements that the reference and single element functions are run on.
+    :param chunkSize: int, The maximum number of elements that the batched functions are run on at once.
+    :param repeats: int, The number of times that each batched calculation is repeated. The fastest time is reported.
+    :return: dictionary, The benchmark results, including the environment that they were run in.
+    """
+    rule = Quadrature.getQuadratureRule(quadratureRule)
+    results = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+               'python': platform.python_version(),
+               'numpy': np.__version__,
+               'machine': platform.machine(),
+               'quadratureRule': quadratureRule,
+               'chunkSize': chunkSize,
+               'meshes': []}
+
+    for size in sizes:
+        nodes, elements = getSyntheticMesh(size)
+        nodeDisplacements = np.random.default_rng(1).normal(scale=0.01, size=nodes.shape)
+        meshResult = {'elementNum': len(elements), 'nodeNum': len(nodes), 'kernels': {}}
+
+        batchedFunctions = {'jacobian': lambda chunk: Discretization.getIsoparametricJacobianBatch(nodes[chunk], rule),
+                            'shapeFunctionGradient': lambda chunk: Discretization.getShapeFunctionGradientBatch(nodes[chunk], rule),
+                            'displacementGradient': lambda chunk: Discretization.getDisplacementGradientBatch(nodes[chunk], nodeDisplacements[chunk], rule)}
+        singleFunctions = {'jacobian': lambda element, point: Discretization.getIsoparametricJacobian(nodes[element], point),
+                           'shapeFunctionGradient': lambda element, point: Discretization.getShapeFunctionGradient(nodes[element], point),
+                           'displacementGradient': lambda element, point: Discretization.getDisplacementGradient(nodes[element], nodeDisplacements[element], point)}
+        referenceFunctions = {'jacobian': lambda element, point: getReferenceJacobian(nodes[element], point),
+                              'shapeFunctionGradient': lambda element, point: getReferenceShapeFunctionGradient(nodes[element], point),
+                              'displacementGradient': lambda element, point: getReferenceDisplacementGradient(nodes[element], nodeDisplacements[element], point)}
+
+        for kernelName in batchedFunctions.keys():
+            # Time the batched path.
+            batchedTime = np.inf
+            for repeat in range(repeats):
+                start = time.perf_counter()
+                for chunkStart in range(0, len(elements), chunkSize):
+                    batchedFunctions[kernelName](elements[chunkStart:chunkStart + chunkSize])
+                batchedTime = min(batchedTime, time.perf_counter() - start)
+
+            # Record the peak memory that numpy allocates while the batched path runs. This is a separate run because tracing the allocations slows down the calculation.
+            tracemalloc.start()
+            for chunkStart in range(0, len(elements), chunkSize):
+                batchedFunctions[kernelName](elements[chunkStart:chunkStart + chunkSize])
+            peakMemory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            # Time the reference loop and the single element wrapper on a subset of the elements.
+            singleElements = elements[:singleElementLimit]
+            start = time.perf_counter()
+            referenceValues = np.array([[referenceFunctions[kernelName](element, point) for point in rule.points] for element in singleElements])
+            referenceTime = time.perf_counter() - start
+            start = time.perf_counter()
+            for element in singleElements:
+                for point in rule.points:
+                    singleFunctions[kernelName](element, point)
+            wrapperTime = time.perf_counter() - start
+            batchedValues = batchedFunctions[kernelName](singleElements)
+
+            meshResult['kernels'][kernelName] = {'batchedTime': batchedTime,
+                                                 'batchedTimePerElement': batchedTime/len(elements),
+                                                 'batchedPeakMemory': peakMemory,
+                                                 'singleElementNum': len(singleElements),
+                                                 'referenceTimePerElement': referenceTime/max(len(singleElements), 1),
+                                                 'wrapperTimePerElement': wrapperTime/max(len(singleElements), 1),
+                                                 'speedup': (referenceTime/max(len(singleElements), 1))/(batchedTime/len(elements)),
+                                                 'maxAbsDifference': float(np.max(np.abs(referenceValues - batchedValues), initial=0.))}
+        results['meshes'].append(meshResult)
+    return results
+
+def printBenchmarkSummary(results):
+    """
+    Print the results from ``runBenchmarks``.
+
+    :param results: dictionary, The results from ``runBenchmarks``.
+    :return:
+    """
+    print(f"numpy {results['numpy']}, python {results['python']}, quadrature rule '{results['quadratureRule']}'")
+    for meshResult in results['meshes']:
+        print(f"{meshResult['elementNum']} elements:")
+        for kernelName, kernelResult in meshResult['kernels'].items():
+            print(f"    {kernelName}: batched {kernelResult['batchedTime']:.4f} s ({kernelResult['batchedPeakMemory']/1e6:.1f} MB peak), "
+                  f"reference loop {kernelResult['referenceTimePerElement']*1e6:.1f} us/element, speedup {kernelResult['speedup']:.0f}x, "
+                  f"single element wrapper overhead {kernelResult['wrapperTimePerElement']*1e6:.1f} us/element, max difference from reference {kernelResult['maxAbsDifference']:.2e}")
+    return
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the finite element formulation kernels in Discretization.py')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000, 1000000], help='The approximate number of elements of each mesh.')
+    parser.add_argument('--rule', default='gauss2', help='The name of the quadrature rule.')
+    parser.add_argument('--single-limit', type=int, default=2000, help='The maximum number of elements that the reference and single element functions are run on.')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='The maximum number of elements that the batched functions are run on at once.')
+    parser.add_argument('--output', default='DiscretizationBenchmark.json', help='The name of the .json file that the results are written to.')
+    arguments = parser.parse_args()
+
+    benchmarkResults = runBenchmarks(arguments.sizes, quadratureRule=arguments.rule, singleElementLimit=arguments.single_limit, chunkSize=arguments.chunk_size)
+    printBenchmarkSummary(benchmarkResults)
+    with open(arguments.output, mode='w') as fl:
+        json.dump(benchmarkResults, fl, indent=2)
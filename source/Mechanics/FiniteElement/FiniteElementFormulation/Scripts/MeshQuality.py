@@ -0,0 +1,121 @@
+import numpy as np
+
+# Custom modules/functions
+import Discretization
+import Quadrature
+
+# The pairs of element nodes that define the 12 edges of the eight noded hexahedral element.
+hex8Edges = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [4, 5], [5, 6], [6, 7], [7, 4], [0, 4], [1, 5], [2, 6], [3, 7]])
+
+def example():
+    # Create a mesh of 2x1x1 elements. The row index of 'nodes' is the nodeId.
+    nodes = np.array([[0., 0., 0.], [1., 0., 0.], [2., 0., 0.], [0., 1., 0.], [1., 1., 0.], [2., 1., 0.],
+                      [0., 0., 1.], [1., 0., 1.], [2., 0., 1.], [0., 1., 1.], [1., 1., 1.], [2., 1., 1.]])
+    elements = np.array([[0, 1, 4, 3, 6, 7, 10, 9], [1, 2, 5, 4, 7, 8, 11, 10]], dtype=int)
+    nodes[8] = [0.8, 0.3, 0.2] # Move a node of the second element so that the element is inverted.
+
+    quality = getMeshQuality(nodes, elements)
+    print(f"Scaled Jacobian of each element: {quality['scaledJacobian']}")
+    print(f"Inverted elements: {np.flatnonzero(quality['isInverted'])}")
+    printQualitySummary(quality)
+    return
+
+def getMeshQuality(nodes, elements, chunkSize=100000):
+    """
+    Calculate quality measures for every element in a hex8 mesh.
+
+    The measures are:
+        'minCornerDeterminant': The smallest Jacobian determinant at the 8 element nodes.
+        'minGaussDeterminant': The smallest Jacobian determinant at the 2x2x2 Gauss points. A value <= 0 means that the element can not be integrated.
+        'scaledJacobian': The smallest determinant of the normalized edge vectors at the 8 element nodes. This is 1 for a cube, <= 0 for an inverted corner, and is independent of the element's size.
+        'aspectRatio': The ratio of the longest edge to the shortest edge.
+        'isInverted': Whether the Jacobian determinant is <= 0 at any node or Gauss point.
+        'isDegenerate': Whether an edge has zero length, or the scaled Jacobian is within ``1e-6`` of zero.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param nodes: array nx3, The coordinates of the nodes. The row index is the nodeId.
+    :param elements: array ex8, The nodeIds of each element's nodes.
+    :param chunkSize: int, The maximum number of elements that are evaluated at once.
+    :return: dictionary, The keys are listed above. Each value is an array with one entry for each element.
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    elements = np.asarray(elements, dtype=int)
+    elementNum = len(elements)
+    quality = {'minCornerDeterminant': np.empty(elementNum),
+               'minGaussDeterminant': np.empty(elementNum),
+               'scaledJacobian': np.empty(elementNum),
+               'aspectRatio': np.empty(elementNum)}
+
+    cornerRule = Quadrature.getQuadratureRule('nodes')
+    gaussRule = Quadrature.getQuadratureRule('gauss2')
+    for start in range(0, elementNum, chunkSize):
+        chunk = slice(start, min(start + chunkSize, elementNum))
+        elementNodes = nodes[elements[chunk]]
+
+        # At a node, each column of the Jacobian is parallel to one of the three edges that meet at the node.
+        cornerJacobian = Discretization.getIsoparametricJacobianBatch(elementNodes, cornerRule)
+        quality['minCornerDeterminant'][chunk] = Discretization.getDeterminantBatch(cornerJacobian).min(axis=1)
+        columnLength = np.linalg.norm(cornerJacobian, axis=2, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaledJacobian = Discretization.getDeterminantBatch(cornerJacobian/columnLength).min(axis=1)
+        quality['scaledJacobian'][chunk] = np.nan_to_num(scaledJacobian, nan=0.)
+
+        gaussJacobian = Discretization.getIsoparametricJacobianBatch(elementNodes, gaussRule)
+        quality['minGaussDeterminant'][chunk] = Discretization.getDeterminantBatch(gaussJacobian).min(axis=1)
+
+        edgeLength = np.linalg.norm(elementNodes[:,hex8Edges[:,1]] - elementNodes[:,hex8Edges[:,0]], axis=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quality['aspectRatio'][chunk] = edgeLength.max(axis=1)/edgeLength.min(axis=1)
+
+    quality['isInverted'] = (quality['minCornerDeterminant'] <= 0) | (quality['minGaussDeterminant'] <= 0)
+    quality['isDegenerate'] = ~np.isfinite(quality['aspectRatio']) | (np.abs(quality['scaledJacobian']) < 1e-6)
+    return quality
+
+def getModelQuality(modelAssembly, chunkSize=100000):
+    """
+    Calculate the quality measures of every part in ``modelAssembly``. See ``getMeshQuality``.
+    This is intended to be used before the model's .feb file is written with ``FebioFileWriter``.
+
+    :param modelAssembly: FebioTools.FebioModelAssembly.ModelAssembly instance, The model. The parts must only contain hex8 elements.
+    :param chunkSize: int, The maximum number of elements that are evaluated at once.
+    :return: dictionary, The keys are the part names and the values are the dictionaries from ``getMeshQuality``.
+    """
+    # ``part.elements`` contains the model's nodeIds, and can use the nodes of other parts (e.g. after ``FebioNodeMerging.mergeCoincidentNodes``), so the coordinates are taken from the model's nodes.
+    nodes = np.asarray(modelAssembly.getGlobalNodes(), dtype=float)
+    modelQuality = {}
+    for partName in modelAssembly.parts.keys():
+        modelQuality[partName] = getMeshQuality(nodes, np.asarray(modelAssembly.parts[partName].elements) - 1, chunkSize=chunkSize)
+    return modelQuality
+
+def getQualityHistogram(quality, binNum=10):
+    """
+    Count the number of elements in each range of scaled Jacobian values. The bins are evenly spaced between -1 and 1.
+
+    :param quality: dictionary, The dictionary from ``getMeshQuality``.
+    :param binNum: int, The number of bins.
+    :return: [array, array], The number of elements in each bin, and the edges of the bins.
+    """
+    return np.histogram(np.clip(quality['scaledJacobian'], -1., 1.), bins=binNum, range=(-1., 1.))
+
+def printQualitySummary(quality, name='mesh'):
+    """
+    Print a summary of the quality measures from ``getMeshQuality``.
+
+    :param quality: dictionary, The dictionary from ``getMeshQuality``.
+    :param name: string, The name that is printed with the summary.
+    :return:
+    """
+    elementNum = len(quality['scaledJacobian'])
+    print(f"Quality of {name} ({elementNum} elements): {np.count_nonzero(quality['isInverted'])} inverted, {np.count_nonzero(quality['isDegenerate'])} degenerate")
+    if elementNum == 0:
+        return
+    print(f"    Scaled Jacobian: min {quality['scaledJacobian'].min():.3f}, mean {quality['scaledJacobian'].mean():.3f}")
+    print(f"    Aspect ratio: max {np.nanmax(quality['aspectRatio']):.3f}, mean {np.nanmean(quality['aspectRatio']):.3f}")
+    counts, bins = getQualityHistogram(quality)
+    for i in range(len(counts)):
+        print(f"    [{bins[i]:5.2f}, {bins[i + 1]:5.2f}]: {counts[i]}")
+    return
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,249 @@
+import numpy as np
+
+# Custom modules/functions
+import Discretization
+
+def example():
+    # Create a mesh of 2x1x1 elements. The row index of 'nodes' is the nodeId.
+    nodes = np.array([[0., 0., 0.], [1., 0., 0.], [2., 0., 0.], [0., 1., 0.], [1., 1., 0.], [2., 1., 0.],
+                      [0., 0., 1.], [1., 0., 1.], [2., 0., 1.], [0., 1., 1.], [1., 1., 1.], [2., 1., 1.]])
+    elements = np.array([[0, 1, 4, 3, 6, 7, 10, 9], [1, 2, 5, 4, 7, 8, 11, 10]], dtype=int)
+
+    # Build the spatial index once, then use it for any number of queries.
+    locator = PointLocator(nodes, elements)
+
+    points = np.array([[0.5, 0.5, 0.5], [1.75, 0.25, 0.9], [3., 0., 0.]]) # The last point is outside of the mesh.
+    elementIndices, isoparaCoords = locator.findPoints(points)
+    print(f'Element that contains each point (-1 if the point is outside the mesh): {elementIndices}')
+    print(f'Isoparametric coordinates of each point:\n{isoparaCoords}')
+
+    # Stretch the mesh by 10% in the x0 direction and get the displacement gradient at the points.
+    nodeDisplacements = np.zeros(nodes.shape)
+    nodeDisplacements[:,0] = 0.1*nodes[:,0]
+    displacementGradient = locator.getDisplacementGradientAtPoints(points, nodeDisplacements)
+    print(f'Displacement gradient at the first point:\n{displacementGradient[0]}')
+    return
+
+class PointLocator(object):
+    def __init__(self, nodes, elements, cellSize=None):
+        """
+        Define an object that finds the element that contains a point, and the point's isoparametric coordinates within that element.
+
+        The elements are stored in a uniform grid of cells based on each element's bounding box.
+        A query only tests the elements whose bounding box overlaps the cell that contains the query point, and then inverts the isoparametric mapping of those elements with Newton's method.
+
+        ..NOTE:: This class assumes that eight noded hexahedral elements are being used with known basis functions.
+
+        :param nodes: array nx3, The coordinates of the nodes. The row index is the nodeId.
+        :param elements: array ex8, The nodeIds of each element's nodes.
+        :param cellSize: float or None, The edge length of the grid cells. If None, then half of the median of the largest bounding box edge of each element is used.
+        """
+        self.nodes = np.asarray(nodes, dtype=float) #: array nx3, The coordinates of the nodes.
+        self.elements = np.asarray(elements, dtype=int) #: array ex8, The nodeIds of each element's nodes.
+
+        # The bounding box of each element.
+        self.elementMin = self.nodes[self.elements[:,0]].copy() #: array ex3, The minimum corner of each element's bounding box.
+        self.elementMax = self.elementMin.copy() #: array ex3, The maximum corner of each element's bounding box.
+        self.elementCentroids = self.elementMin.copy() #: array ex3, The average of each element's nodes.
+        for i in range(1, 8): # Iterate over the other 7 nodes of each element
+            elementNode = self.nodes[self.elements[:,i]]
+            np.minimum(self.elementMin, elementNode, out=self.elementMin)
+            np.maximum(self.elementMax, elementNode, out=self.elementMax)
+            self.elementCentroids += elementNode
+        self.elementCentroids /= 8.
+
+        if cellSize is None:
+            cellSize = 0.5*np.median(np.max(self.elementMax - self.elementMin, axis=1))
+        self.cellSize = float(cellSize) #: float, The edge length of the grid cells.
+        self.origin = self.elementMin.min(axis=0) #: array 1x3, The minimum corner of the grid.
+        self.gridShape = np.floor((self.elementMax.max(axis=0) - self.origin)/self.cellSize).astype(np.int64) + 1 #: array 1x3, The number of cells in each direction.
+
+        self._buildGrid()
+
+    def _buildGrid(self):
+        """
+        Populate the grid, which is stored as a sorted array of (non-empty) cell keys, and the elements in each cell in compressed (CSR-like) form.
+
+        :return:
+        """
+        low = self._getCellIndices(self.elementMin)
+        high = self._getCellIndices(self.elementMax)
+        cellsPerAxis = high - low + 1
+        cellsPerElement = np.prod(cellsPerAxis, axis=1)
+
+        # Expand every element into one entry for each cell that its bounding box overlaps.
+        entryElements = np.repeat(np.arange(len(self.elements)), cellsPerElement)
+        localIndex = np.arange(len(entryElements)) - np.repeat(np.cumsum(cellsPerElement) - cellsPerElement, cellsPerElement)
+        entryCellsPerAxis = cellsPerAxis[entryElements]
+        entryCells = low[entryElements].copy()
+        entryCells[:,0] += localIndex % entryCellsPerAxis[:,0]
+        entryCells[:,1] += (localIndex//entryCellsPerAxis[:,0]) % entryCellsPerAxis[:,1]
+        entryCells[:,2] += localIndex//(entryCellsPerAxis[:,0]*entryCellsPerAxis[:,1])
+        entryKeys = self._getCellKeys(entryCells)
+
+        order = np.argsort(entryKeys, kind='stable')
+        self.cellElements = entryElements[order] #: array 1xk, The element indices of each cell, stored one cell after another.
+        self.cellKeys, self.cellStarts, self.cellCounts = np.unique(entryKeys[order], return_index=True, return_counts=True) #: The keys of the non-empty cells, and where each cell's elements start in ``self.cellElements``, and how many there are.
+        return
+
+    def _getCellIndices(self, points):
+        """
+        :param points: array nx3, Coordinates.
+        :return: array nx3, The (i,j,k) index of the cell that contains each point.
+        """
+        return np.floor((points - self.origin)/self.cellSize).astype(np.int64)
+
+    def _getCellKeys(self, cellIndices):
+        """
+        :param cellIndices: array nx3, The (i,j,k) index of cells.
+        :return: array 1xn, A unique integer for each cell.
+        """
+        return (cellIndices[:,0]*self.gridShape[1] + cellIndices[:,1])*self.gridShape[2] + cellIndices[:,2]
+
+    def findPoints(self, points, tolerance=1e-6, maxIterations=20, chunkSize=100000):
+        """
+        Find the element that contains each point, and the point's isoparametric coordinates within that element.
+        If a point is on the boundary between elements, then the element with the nearest centroid is used.
+
+        :param points: array qx3, The coordinates of the query points.
+        :param tolerance: float, The tolerance (in isoparametric coordinates) that is used for the Newton iterations, and for deciding whether a point is inside an element (|theta| <= 1 + tolerance).
+        :param maxIterations: int, The maximum number of Newton iterations.
+        :param chunkSize: int, The maximum number of query points that are processed at once.
+        :return: [array 1xq, array qx3], The index of the element that contains each point (-1 if no element contains the point), and the point's isoparametric coordinates (nan if no element contains the point).
+        """
+        points = np.asarray(points, dtype=float).reshape((-1, 3))
+        elementIndices = np.full(len(points), -1, dtype=int)
+        isoparaCoords = np.full((len(points), 3), np.nan)
+        for start in range(0, len(points), chunkSize):
+            chunk = slice(start, min(start + chunkSize, len(points)))
+            elementIndices[chunk], isoparaCoords[chunk] = self._findPointsChunk(points[chunk], tolerance, maxIterations)
+        return elementIndices, isoparaCoords
+
+    def _findPointsChunk(self, points, tolerance, maxIterations):
+        """
+        See ``findPoints``.
+        """
+        elementIndices = np.full(len(points), -1, dtype=int)
+        isoparaCoords = np.full((len(points), 3), np.nan)
+
+        # Find the grid cell of each point.
+        cellIndices = self._getCellIndices(points)
+        inGrid = np.all((cellIndices >= 0) & (cellIndices < self.gridShape), axis=1)
+        keys = self._getCellKeys(cellIndices)
+        position = np.minimum(np.searchsorted(self.cellKeys, keys), len(self.cellKeys) - 1)
+        hasCell = inGrid & (self.cellKeys[position] == keys)
+        candidateCounts = np.where(hasCell, self.cellCounts[position], 0)
+
+        # Expand every point into one (point, element) pair for each element in the point's cell.
+        pairPoints = np.repeat(np.arange(len(points)), candidateCounts)
+        localIndex = np.arange(len(pairPoints)) - np.repeat(np.cumsum(candidateCounts) - candidateCounts, candidateCounts)
+        pairElements = self.cellElements[self.cellStarts[position[pairPoints]] + localIndex]
+
+        # Discard the pairs where the point is outside of the element's bounding box.
+        pad = tolerance*self.cellSize
+        inBox = np.all((points[pairPoints] >= self.elementMin[pairElements] - pad) & (points[pairPoints] <= self.elementMax[pairElements] + pad), axis=1)
+        pairPoints = pairPoints[inBox]
+        pairElements = pairElements[inBox]
+
+        # Test the candidate elements in order of the distance between the point and the element's centroid.
+        # Most points are inside the first candidate, so the points that have been found are removed before the next round of candidates is tested.
+        centroidDistance = np.sum((points[pairPoints] - self.elementCentroids[pairElements])**2, axis=1)
+        order = np.lexsort((centroidDistance, pairPoints))
+        pairPoints = pairPoints[order]
+        pairElements = pairElements[order]
+        pairCounts = np.bincount(pairPoints, minlength=len(points))
+        pairRank = np.arange(len(pairPoints)) - np.repeat(np.cumsum(pairCounts) - pairCounts, pairCounts) # The position of each pair within its point's candidates.
+
+        for rank in range(pairCounts.max(initial=0)):
+            isTested = (pairRank == rank)
+            isTested[isTested] = elementIndices[pairPoints[isTested]] < 0 # Skip the points that have already been found
+            testPoints = pairPoints[isTested]
+            testElements = pairElements[isTested]
+            # Invert the isoparametric mapping for the candidate pairs.
+            testCoords, converged = getIsoparametricCoordinates(self.nodes[self.elements[testElements]], points[testPoints], tolerance=tolerance, maxIterations=maxIterations)
+            isInside = converged & np.all(np.abs(testCoords) <= 1. + tolerance, axis=1)
+            elementIndices[testPoints[isInside]] = testElements[isInside]
+            isoparaCoords[testPoints[isInside]] = testCoords[isInside]
+        return elementIndices, isoparaCoords
+
+    def getDisplacementGradientAtPoints(self, points, nodeDisplacements, tolerance=1e-6, maxIterations=20):
+        """
+        Calculate the displacement gradient at each of the given points.
+
+        :param points: array qx3, The coordinates of the query points in the same coordinate system as ``self.nodes``.
+        :param nodeDisplacements: array nx3, The displacement of each node. The row index relates to the row index in ``self.nodes``.
+        :param tolerance: float, See ``findPoints``.
+        :param maxIterations: int, See ``findPoints``.
+        :return: array qx3x3, The displacement gradient at each point. The values are nan for points that are outside of the mesh.
+        """
+        elementIndices, isoparaCoords = self.findPoints(points, tolerance=tolerance, maxIterations=maxIterations)
+        found = elementIndices >= 0
+        foundElements = self.elements[elementIndices[found]]
+
+        # Each point has its own isoparametric coordinates, so the shape function derivatives are paired with the elements instead of being evaluated for every combination.
+        dNI_dtheta = Discretization.getShapeFunctionDerivativeBatch(isoparaCoords[found])
+        jacobian = np.einsum('qIi,qIA->qiA', self.nodes[foundElements], dNI_dtheta)
+        inverseJacobian = Discretization.getInverseAndDeterminantBatch(jacobian)[0]
+        dNI_dXA = np.einsum('qIB,qBA->qIA', dNI_dtheta, inverseJacobian)
+
+        displacementGradient = np.full((len(elementIndices), 3, 3), np.nan)
+        displacementGradient[found] = np.einsum('qIi,qIA->qiA', np.asarray(nodeDisplacements, dtype=float)[foundElements], dNI_dXA)
+        return displacementGradient
+
+def getPartPointLocator(part, nodeIdOffset=0, cellSize=None, modelAssembly=None):
+    """
+    Create a PointLocator for the nodes and elements of ``part``.
+
+    .. NOTE:: ``ModelAssembly.addPart`` changes ``part.elements`` to the model's nodeIds. If ``part`` has been added to a ModelAssembly, then use ``modelAssembly=modelAssembly``, so the coordinates are taken from ``modelAssembly.getGlobalNodes()``. This also works when the part's elements use the nodes of other parts (e.g. after ``FebioNodeMerging.mergeCoincidentNodes``).
+
+    :param part: FebioTools.FebioPart.Part instance, The part that defines the nodes and hex8 elements.
+    :param nodeIdOffset: int, The value that is subtracted from ``part.elements`` to get the row indices of ``part.nodes``. This is not used if ``modelAssembly`` is given.
+    :param cellSize: float or None, See ``PointLocator``.
+    :param modelAssembly: FebioTools.FebioModelAssembly.ModelAssembly instance or None, The model that ``part`` has been added to. If it is given, then the locator's node rows are the nodeIds - 1.
+    :return: PointLocator instance, The point locator.
+    """
+    if modelAssembly is not None:
+        return PointLocator(modelAssembly.getGlobalNodes(), np.asarray(part.elements) - 1, cellSize=cellSize)
+    return PointLocator(part.nodes, np.asarray(part.elements) - nodeIdOffset, cellSize=cellSize)
+
+def getIsoparametricCoordinates(elementNodes, points, tolerance=1e-6, maxIterations=20):
+    """
+    Find the isoparametric coordinates that map to the given points with Newton's method (i.e. invert the isoparametric mapping).
+    Element ``elementNodes[q]`` is paired with point ``points[q]``.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param elementNodes: array qx8x3, The coordinates of the nodes of q elements.
+    :param points: array qx3, The coordinates of q points.
+    :param tolerance: float, The iterations stop when the largest change in the isoparametric coordinates is less than ``tolerance``.
+    :param maxIterations: int, The maximum number of iterations.
+    :return: [array qx3, array 1xq], The isoparametric coordinates, and whether the iterations converged for each pair.
+    """
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    points = np.asarray(points, dtype=float)
+    isoparaCoords = np.zeros(points.shape) # Start from the center of each element
+    converged = np.zeros(len(points), dtype=bool)
+    active = np.arange(len(points)) # The pairs that have not converged yet
+
+    for iteration in range(maxIterations):
+        if len(active) == 0:
+            break
+        theta = isoparaCoords[active]
+        activeNodes = elementNodes[active]
+        # The residual between the mapped point (x = sum_I N^I*x^I) and the target point.
+        residual = np.matmul(Discretization.getShapeFunctionBatch(theta)[:,np.newaxis,:], activeNodes)[:,0,:] - points[active]
+        jacobian = np.matmul(activeNodes.transpose((0,2,1)), Discretization.getShapeFunctionDerivativeBatch(theta)) # J_iA = sum_I x^I_i*dN^I/dthetaA
+        inverseJacobian = Discretization.getInverseAndDeterminantBatch(jacobian)[0]
+        step = np.matmul(inverseJacobian, residual[:,:,np.newaxis])[:,:,0]
+
+        isoparaCoords[active] = theta - step
+        stepSize = np.max(np.abs(step), axis=1)
+        isDone = stepSize < tolerance
+        isDiverged = ~np.isfinite(stepSize) | (np.max(np.abs(isoparaCoords[active]), axis=1) > 10.) # Stop iterating on pairs that are far outside of the element
+        converged[active[isDone]] = True
+        active = active[~(isDone | isDiverged)]
+
+    return isoparaCoords, converged
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+# Custom modules/functions
+import Stiffness
+
+def example():
+    # The model is created with the FebioTools modules from the FeBio tutorials, so their directory is added to the python path.
+    febioToolsDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'FeBio', 'PreliminaryTutorials', 'Scripts', 'FebioTools', 'src')
+    if os.path.abspath(febioToolsDir) not in [os.path.abspath(path) for path in sys.path]:
+        sys.path.append(os.path.abspath(febioToolsDir))
+    import FebioPart
+    import FebioModelAssembly
+
+    # The two parts from FebioModelAssemblyExample.py
+    part0Coordinates = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 0.0, 1.0], [1.0, 1.0, 1.0], [0.0, 1.0, 1.0]])
+    part1Coordinates = np.array([[0.0, 1.1, 0.0], [1.0, 1.1, 0.0], [1.0, 2.0, 0.0], [0.0, 2.0, 0.0], [0.0, 1.1, 1.0], [1.0, 1.1, 1.0], [1.0, 2.0, 1.0], [0.0, 2.0, 1.0]])
+    part0 = FebioPart.Part('part0')
+    part0.setNodes(part0Coordinates)
+    part0.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part0.setMaterialId(1)
+    part0.addNodeSet([0, 1, 4, 5], 'part0FixedNodeSet')
+    part0.addNodeSet([3, 2, 7, 6], 'part0TiedNodeSet')
+    part1 = FebioPart.Part('part1')
+    part1.setNodes(part1Coordinates)
+    part1.setElements(np.array([[0, 1, 2, 3, 4, 5, 6, 7]], dtype=int))
+    part1.setMaterialId(2)
+    part1.addNodeSet([2, 3, 6, 7], 'part1LoadedNodeSet')
+    modelAssembly = FebioModelAssembly.ModelAssembly()
+    modelAssembly.addPart(part0)
+    modelAssembly.addPart(part1)
+
+    # part1 is not tied to part0 in this preview, so it is reported as a part that can move as a rigid body.
+    materialProperties = {1: (500., 0.3), 2: (500., 0.3)}
+    results = solvePreview(modelAssembly, materialProperties, ['part0FixedNodeSet'], {'part0TiedNodeSet': [0., 1., 0.], 'part1LoadedNodeSet': [0., 1., 0.]})
+    printPreviewSummary(results)
+    return
+
+def solvePreview(modelAssembly, materialProperties, fixedNodeSetNames, nodalLoads, solver='cg', tolerance=1e-8, maxIterations=None):
+    """
+    Perform a small strain, linear elastic, static solve of ``modelAssembly``.
+    This is intended as a fast check of a model's boundary conditions before the model is solved with FEBio, not as a replacement for FEBio.
+
+    Before solving, the connected regions of the mesh are found. Any region that is not constrained enough to prevent rigid body motion is reported, and its displacements are set to nan instead of being solved for.
+
+    :param modelAssembly: FebioTools.FebioModelAssembly.ModelAssembly instance, The model. The parts must only contain hex8 elements.
+    :param materialProperties: dictionary, The keys are the parts' materialIds and the values are the tuples (Young's modulus, Poisson's ratio).
+    :param fixedNodeSetNames: list, The names of the nodeSets whose nodes are fixed in all three directions.
+    :param nodalLoads: dictionary, The keys are the names of nodeSets and the values are the 1x3 force that is applied to each node in the nodeSet.
+    :param solver: string, Either 'cg' (conjugate gradient with a Jacobi preconditioner) or 'direct' (sparse LU factorization). The fill-in of the LU factorization grows quickly for 3D meshes, so 'direct' is only recommended for small models (roughly < 1e4 degrees of freedom).
+    :param tolerance: float, The relative residual tolerance for the 'cg' solver.
+    :param maxIterations: int or None, The maximum number of iterations for the 'cg' solver.
+    :return: dictionary, A dictionary with the following keys:
+        'displacements': array nx3, The displacement of each node. Row r is the node with nodeId r + 1.
+        'regions': list, A dictionary for each connected region of the mesh with the keys 'nodeIds', 'fixedNodeNum' and 'rigidBodyModes'.
+        'rigidBodyModes': int, The total number of unconstrained rigid body modes.
+        'unusedNodeIds': array 1xk, The nodeIds that are not part of any element.
+        'assemblyTime': float, The time (in seconds) that was spent assembling the stiffness matrix.
+        'solveTime': float, The time (in seconds) that was spent solving the linear system.
+        'converged': bool, Whether the solver was successful.
+    """
+    assemblyStart = time.perf_counter()
+    stiffness = Stiffness.getGlobalStiffness(modelAssembly, materialProperties)
+    nodes = np.asarray(modelAssembly.getGlobalNodes(), dtype=float)
+    assemblyTime = time.perf_counter() - assemblyStart
+
+    fixedNodeIds = np.unique(np.concatenate([np.asarray(modelAssembly.getNodeSet(setName), dtype=int) for setName in fixedNodeSetNames] + [np.zeros(0, dtype=int)]))
+    force = np.zeros(nodes.shape)
+    for setName in nodalLoads.keys():
+        np.add.at(force, np.asarray(modelAssembly.getNodeSet(setName), dtype=int) - 1, np.asarray(nodalLoads[setName], dtype=float))
+
+    regions, unusedNodeIds = _getRegions(modelAssembly, nodes, fixedNodeIds)
+
+    # Only solve for the nodes in regions that can not move as a rigid body, and that are not fixed.
+    isSolved = np.zeros(len(nodes), dtype=bool)
+    for region in regions:
+        if region['rigidBodyModes'] == 0:
+            isSolved[region['nodeIds'] - 1] = True
+    isSolved[fixedNodeIds - 1] = False
+    freeDofs = Stiffness.getNodeDofs(np.flatnonzero(isSolved) + 1).ravel()
+
+    displacements = np.full(nodes.shape, np.nan)
+    displacements[fixedNodeIds - 1] = 0.
+    solveStart = time.perf_counter()
+    freeStiffness = stiffness[freeDofs][:,freeDofs]
+    freeForce = force.ravel()[freeDofs]
+    converged = True
+    if len(freeDofs) == 0:
+        freeDisplacements = np.zeros(0)
+    elif solver == 'direct':
+        freeDisplacements = scipy.sparse.linalg.spsolve(freeStiffness.tocsc(), freeForce)
+        converged = bool(np.all(np.isfinite(freeDisplacements)))
+    elif solver == 'cg':
+        preconditioner = scipy.sparse.diags(1./freeStiffness.diagonal()) # Jacobi preconditioner
+        freeDisplacements, info = scipy.sparse.linalg.cg(freeStiffness, freeForce, rtol=tolerance, maxiter=maxIterations, M=preconditioner)
+        converged = (info == 0)
+    else:
+        raise ValueError(f"The solver: '{solver}' is not defined. Use 'direct' or 'cg'.")
+    solveTime = time.perf_counter() - solveStart
+    displacements.ravel()[freeDofs] = freeDisplacements
+
+    results = {'displacements': displacements,
+               'regions': regions,
+               'rigidBodyModes': int(sum(region['rigidBodyModes'] for region in regions)),
+               'unusedNodeIds': unusedNodeIds,
+               'assemblyTime': assemblyTime,
+               'solveTime': solveTime,
+               'converged': converged}
+    return results
+
+def printPreviewSummary(results):
+    """
+    Print a summary of the results from ``solvePreview``.
+
+    :param results: dictionary, The results from ``solvePreview``.
+    :return:
+    """
+    print(f"Assembly time: {results['assemblyTime']:.3f} s, solve time: {results['solveTime']:.3f} s, converged: {results['converged']}")
+    print(f"Connected regions: {len(results['regions'])}, unconstrained rigid body modes: {results['rigidBodyModes']}, unused nodes: {len(results['unusedNodeIds'])}")
+    for i, region in enumerate(results['regions']):
+        if region['rigidBodyModes'] > 0:
+            print(f"    Region {i} ({len(region['nodeIds'])} nodes, first nodeId {region['nodeIds'][0]}) has {region['fixedNodeNum']} fixed nodes and {region['rigidBodyModes']} rigid body modes")
+    maxDisplacement = np.nanmax(np.linalg.norm(results['displacements'], axis=1), initial=0.)
+    print(f"Maximum displacement magnitude: {maxDisplacement}")
+    return
+
+def _getRegions(modelAssembly, nodes, fixedNodeIds):
+    """
+    Find the connected regions of the mesh, and the number of rigid body modes that each region has.
+
+    A region with no fixed nodes has 6 rigid body modes. A region where all of the fixed nodes are at the same point can still rotate (3 modes), and a region where the fixed nodes are on a line can rotate about that line (1 mode).
+
+    :param modelAssembly: FebioTools.FebioModelAssembly.ModelAssembly instance, The model.
+    :param nodes: array nx3, The coordinates of every node in the model.
+    :param fixedNodeIds: array 1xk, The nodeIds of the fixed nodes.
+    :return: [list, array], A dictionary for each region (see ``solvePreview``), and the nodeIds that are not part of any element.
+    """
+    # Connect the first node of each element to the other 7 nodes. This is enough to find the connected regions.
+    elements = np.concatenate([np.asarray(modelAssembly.parts[partName].elements, dtype=int) for partName in modelAssembly.parts.keys()]) - 1
+    rows = np.repeat(elements[:,0], 7)
+    columns = elements[:,1:].ravel()
+    graph = scipy.sparse.coo_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(nodes), len(nodes)))
+    regionNum, regionLabels = scipy.sparse.csgraph.connected_components(graph, directed=False)
+
+    isUsed = np.zeros(len(nodes), dtype=bool)
+    isUsed[elements.ravel()] = True
+    isFixed = np.zeros(len(nodes), dtype=bool)
+    isFixed[fixedNodeIds - 1] = True
+
+    regions = []
+    order = np.argsort(regionLabels, kind='stable')
+    regionStarts = np.searchsorted(regionLabels[order], np.arange(regionNum + 1))
+    for label in range(regionNum):
+        regionRows = order[regionStarts[label]:regionStarts[label + 1]]
+        if not isUsed[regionRows[0]]: # A node that is not part of any element is a region by itself.
+            continue
+        fixedCoordinates = nodes[regionRows[isFixed[regionRows]]]
+        if len(fixedCoordinates) == 0:
+            rigidBodyModes = 6
+        else:
+            # The rank of the fixed nodes' positions (relative to their mean) tells us if they are at one point (0), on one line (1), or neither (2 or 3).
+            rank = np.linalg.matrix_rank(fixedCoordinates - fixedCoordinates.mean(axis=0), tol=1e-9*(np.ptp(nodes[regionRows]) + 1e-300))
+            rigidBodyModes = {0: 3, 1: 1}.get(rank, 0)
+        regions.append({'nodeIds': regionRows + 1, 'fixedNodeNum': len(fixedCoordinates), 'rigidBodyModes': rigidBodyModes})
+
+    return regions, np.flatnonzero(~isUsed) + 1
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,88 @@
+import functools
+import numpy as np
+
+# Custom modules/functions
+import Discretization
+
+def example():
+    # Get the 2x2x2 Gauss quadrature rule. The shape function tables are calculated the first time the rule is requested.
+    rule = getQuadratureRule('gauss2')
+    print(f'Gauss points:\n{rule.points}')
+    print(f'Gauss weights: {rule.weights}')
+
+    # Requesting the same rule again returns the same (cached) object, so the tables are not recalculated.
+    print(f'Cached: {getQuadratureRule("gauss2") is rule}')
+
+    # The rule can be given directly to the batched functions in Discretization.py in place of an array of isoparametric points.
+    elementNodes = Discretization.hex8NodeIsoparaCoords[np.newaxis]*0.5 # A single 1x1x1 element.
+    jacobians = Discretization.getIsoparametricJacobianBatch(elementNodes, rule)
+
+    # Integrate det(J) over the element to get the element's volume.
+    volume = np.sum(np.linalg.det(jacobians)*rule.weights, axis=1)
+    print(f'Element volume: {volume}')
+    return
+
+class QuadratureRule(object):
+    def __init__(self, name, points, weights):
+        """
+        Define a quadrature rule for the eight noded hexahedral element, and the shape function tables at the rule's points.
+
+        .. NOTE:: The arrays stored in this class are read-only because the rules are cached and shared.
+
+        :param name: string, The name that is assigned to the rule.
+        :param points: array px3, The coordinates of the p quadrature points in the isoparametric coordinate system.
+        :param weights: array 1xp, The weight of each quadrature point.
+        """
+        self.name = name #: string, The name that is assigned to the rule.
+        self.points = _readOnly(points) #: array px3, The coordinates of the quadrature points in the isoparametric coordinate system.
+        self.weights = _readOnly(weights) #: array 1xp, The weight of each quadrature point.
+        self.shapeFunctions = _readOnly(Discretization.getShapeFunctionBatch(points)) #: array px8, Entry [p,I] is N^I evaluated at point p.
+        self.shapeFunctionDerivatives = _readOnly(Discretization.getShapeFunctionDerivativeBatch(points)) #: array px8x3, Entry [p,I,A] is the partial derivative of N^I with respect to thetaA at point p.
+
+    def __len__(self):
+        return len(self.points)
+
+@functools.lru_cache(maxsize=None)
+def getQuadratureRule(name):
+    """
+    Get a quadrature rule for the eight noded hexahedral element.
+    The rule, and the shape function tables for the rule, are only calculated the first time that a rule is requested. Later requests return the cached rule.
+
+    The available rules are:
+        'gauss1': 1 point (the element centroid).
+        'gauss2': 2x2x2 Gauss points.
+        'gauss3': 3x3x3 Gauss points.
+        'nodes': The 8 element nodes, in the same order as the element's nodes. Each point has a weight of 1.
+
+    For the Gauss rules, theta0 changes the fastest and theta2 changes the slowest between consecutive points.
+
+    :param name: string, The name of the rule.
+    :return: QuadratureRule instance, The rule and its shape function tables.
+    """
+    if name == 'nodes':
+        return QuadratureRule(name, Discretization.hex8NodeIsoparaCoords, np.ones(8))
+
+    gaussOrders = {'gauss1': 1, 'gauss2': 2, 'gauss3': 3}
+    if name not in gaussOrders:
+        raise KeyError(f"The quadrature rule: '{name}' is not defined. The available rules are: {list(gaussOrders.keys()) + ['nodes']}")
+
+    points1D, weights1D = np.polynomial.legendre.leggauss(gaussOrders[name]) # The 1D Gauss points and weights on [-1, 1]
+    theta2, theta1, theta0 = np.meshgrid(points1D, points1D, points1D, indexing='ij') # theta0 changes the fastest
+    weight2, weight1, weight0 = np.meshgrid(weights1D, weights1D, weights1D, indexing='ij')
+    points = np.column_stack([theta0.ravel(), theta1.ravel(), theta2.ravel()])
+    weights = (weight0*weight1*weight2).ravel()
+    return QuadratureRule(name, points, weights)
+
+def _readOnly(array):
+    """
+    Return a copy of ``array`` that can not be modified.
+
+    :param array: array, The array that is copied.
+    :return: array, The read-only copy.
+    """
+    array = np.array(array, dtype=float)
+    array.setflags(write=False)
+    return array
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,112 @@
+import numpy as np
+import scipy.sparse
+
+# Custom modules/functions
+import Discretization
+import Quadrature
+
+def example():
+    # A single 1x1x1 element.
+    elementNodes = Discretization.hex8NodeIsoparaCoords[np.newaxis]*0.5 + 0.5
+    elementStiffness = getElementStiffnessBatch(elementNodes, 500., 0.3)
+    print(f'Element stiffness matrix shape: {elementStiffness.shape}')
+
+    # A linear elastic element has 6 rigid body modes, so its stiffness matrix has 6 (numerically) zero eigenvalues.
+    eigenvalues = np.linalg.eigvalsh(elementStiffness[0])
+    print(f'Smallest 7 eigenvalues of the element stiffness matrix: {eigenvalues[:7]}')
+    return
+
+def getElementStiffnessBatch(elementNodes, youngsModulus, poissonsRatio, quadratureRule='gauss2'):
+    """
+    Calculate the small strain, linear elastic (isotropic) stiffness matrix of every given element.
+
+    The degrees of freedom of each element are ordered [node0_x0, node0_x1, node0_x2, node1_x0, ..., node7_x2].
+    The stiffness matrix is calculated as
+        K_(Ii)(Jj) = sum_p w_p*det(J_p)*(lambda*dN^I/dX_i*dN^J/dX_j + mu*dN^I/dX_j*dN^J/dX_i + mu*delta_ij*dN^I/dX_k*dN^J/dX_k)
+    which is the same as the more common B^T*D*B form.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param elementNodes: array ex8x3, The coordinates of the nodes of e elements.
+    :param youngsModulus: float or array 1xe, The Young's modulus of each element.
+    :param poissonsRatio: float or array 1xe, The Poisson's ratio of each element.
+    :param quadratureRule: string, The name of the quadrature rule (see ``Quadrature.getQuadratureRule``).
+    :return: array ex24x24, The stiffness matrix of each element.
+    """
+    elementNodes = np.asarray(elementNodes, dtype=float)
+    elementNum = len(elementNodes)
+    youngsModulus = np.broadcast_to(np.asarray(youngsModulus, dtype=float), (elementNum,))
+    poissonsRatio = np.broadcast_to(np.asarray(poissonsRatio, dtype=float), (elementNum,))
+    lameLambda = youngsModulus*poissonsRatio/((1. + poissonsRatio)*(1. - 2.*poissonsRatio))
+    lameMu = youngsModulus/(2.*(1. + poissonsRatio))
+
+    rule = Quadrature.getQuadratureRule(quadratureRule)
+    dNI_dXA, jacobianDeterminant = Discretization.getShapeFunctionGradientBatch(elementNodes, rule, checkJacobian=True, returnJacobianDeterminant=True)
+    weightedDeterminant = jacobianDeterminant*rule.weights # The integration weight of each point in the reference configuration
+
+    # T_(Ii)(Jj) = sum_p w_p*det(J_p)*dN^I/dX_i*dN^J/dX_j
+    weightedGradient = dNI_dXA*weightedDeterminant[:,:,np.newaxis,np.newaxis]
+    gradientProduct = np.einsum('epIi,epJj->eIiJj', weightedGradient, dNI_dXA, optimize=True)
+    # S_IJ = sum_p w_p*det(J_p)*dN^I/dX_k*dN^J/dX_k
+    gradientDotProduct = np.einsum('eIiJi->eIJ', gradientProduct)
+
+    stiffness = lameLambda[:,np.newaxis,np.newaxis,np.newaxis,np.newaxis]*gradientProduct
+    stiffness += lameMu[:,np.newaxis,np.newaxis,np.newaxis,np.newaxis]*gradientProduct.transpose((0,1,4,3,2))
+    stiffness += (lameMu[:,np.newaxis,np.newaxis]*gradientDotProduct)[:,:,np.newaxis,:,np.newaxis]*np.eye(3)[np.newaxis,np.newaxis,:,np.newaxis,:]
+    return stiffness.reshape((elementNum, 24, 24))
+
+def getNodeDofs(nodeIds):
+    """
+    Get the global degrees of freedom of the given nodes.
+    Node ``nodeId`` has the degrees of freedom 3*(nodeId - 1) + [0, 1, 2], because FEBio nodeIds start at 1.
+
+    :param nodeIds: array 1xn, The nodeIds.
+    :return: array nx3, The degrees of freedom of each node.
+    """
+    return 3*(np.asarray(nodeIds, dtype=np.int64)[:,np.newaxis] - 1) + np.arange(3)
+
+def getGlobalStiffness(modelAssembly, materialProperties, quadratureRule='gauss2', chunkSize=20000):
+    """
+    Assemble the small strain, linear elastic global stiffness matrix of ``modelAssembly``.
+
+    The element stiffness matrices are calculated for ``chunkSize`` elements at a time, as (row, column, value) triplets. The duplicate entries of each chunk are summed, which leaves roughly one triplet per nonzero entry of the chunk, so the memory that is used for the uncompressed triplets is limited to roughly ``chunkSize``*576*(8 + 2*8) bytes.
+    The triplets of every chunk are converted to a compressed sparse row matrix once, at the end.
+
+    :param modelAssembly: FebioTools.FebioModelAssembly.ModelAssembly instance, The model. The parts must only contain hex8 elements.
+    :param materialProperties: dictionary, The keys are the parts' materialIds and the values are the tuples (Young's modulus, Poisson's ratio).
+    :param quadratureRule: string, The name of the quadrature rule (see ``Quadrature.getQuadratureRule``).
+    :param chunkSize: int, The maximum number of elements that are processed at once.
+    :return: scipy.sparse.csr_matrix 3nx3n, The global stiffness matrix. See ``getNodeDofs`` for the numbering of the degrees of freedom.
+    """
+    nodes = np.asarray(modelAssembly.getGlobalNodes(), dtype=float)
+    dofNum = 3*len(nodes)
+    indexType = np.int32 if dofNum < np.iinfo(np.int32).max else np.int64
+    chunkRows, chunkColumns, chunkValues = [np.zeros(0, dtype=indexType)], [np.zeros(0, dtype=indexType)], [np.zeros(0)]
+
+    for partName in modelAssembly.parts.keys():
+        part = modelAssembly.parts[partName]
+        if part.materialId not in materialProperties:
+            raise KeyError(f"The materialId: '{part.materialId}' of the part named '{partName}' is not defined in materialProperties")
+        youngsModulus, poissonsRatio = materialProperties[part.materialId]
+
+        elements = np.asarray(part.elements, dtype=np.int64) # The global nodeIds of each element's nodes. ``ModelAssembly.addPart`` has already offset these values.
+        for start in range(0, len(elements), chunkSize):
+            chunkElements = elements[start:start + chunkSize]
+            elementStiffness = getElementStiffnessBatch(nodes[chunkElements - 1], youngsModulus, poissonsRatio, quadratureRule=quadratureRule)
+            elementDofs = getNodeDofs(chunkElements.ravel()).reshape((len(chunkElements), 24)).astype(indexType)
+
+            # Every entry of every element stiffness matrix, as (row, column, value) triplets.
+            rows = np.repeat(elementDofs, 24, axis=1).ravel()
+            columns = np.tile(elementDofs, (1, 24)).ravel()
+            chunkStiffness = scipy.sparse.coo_matrix((elementStiffness.ravel(), (rows, columns)), shape=(dofNum, dofNum))
+            chunkStiffness.sum_duplicates()
+            chunkRows.append(chunkStiffness.row)
+            chunkColumns.append(chunkStiffness.col)
+            chunkValues.append(chunkStiffness.data)
+
+    # The entries that are shared by elements of different chunks are summed by the conversion to a compressed sparse row matrix.
+    stiffness = scipy.sparse.coo_matrix((np.concatenate(chunkValues), (np.concatenate(chunkRows), np.concatenate(chunkColumns))), shape=(dofNum, dofNum)).tocsr()
+    return stiffness
+
+if __name__ == '__main__':
+    example()
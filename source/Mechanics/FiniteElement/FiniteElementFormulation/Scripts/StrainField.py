@@ -0,0 +1,205 @@
+import numpy as np
+
+# Custom modules/functions
+import Discretization
+import Quadrature
+
+def example():
+    # Create a mesh of 2x1x1 elements. The row index of 'nodes' is the nodeId.
+    nodes = np.array([[0., 0., 0.], [1., 0., 0.], [2., 0., 0.], [0., 1., 0.], [1., 1., 0.], [2., 1., 0.],
+                      [0., 0., 1.], [1., 0., 1.], [2., 0., 1.], [0., 1., 1.], [1., 1., 1.], [2., 1., 1.]])
+    elements = np.array([[0, 1, 4, 3, 6, 7, 10, 9], [1, 2, 5, 4, 7, 8, 11, 10]], dtype=int)
+
+    # Stretch the mesh by 10% in the x0 direction.
+    nodeDisplacements = np.zeros(nodes.shape)
+    nodeDisplacements[:,0] = 0.1*nodes[:,0]
+
+    strainField = getStrainField(nodes, elements, nodeDisplacements, quadratureRule='gauss1')
+    print(f"Deformation gradient at the centroid of element 0:\n{strainField['deformationGradient'][0,0]}")
+    print(f"Green-Lagrange strain at the centroid of element 0:\n{strainField['greenLagrangeStrain'][0,0]}")
+    print(f"Principal strains at the element centroids:\n{strainField['principalStrains'][:,0]}")
+    print(f"Volume ratio (J) at the element centroids: {strainField['volumeRatio'][:,0]}")
+
+    # When there are many sets of displacements for the same mesh, the reference geometry only needs to be processed once.
+    evaluator = StrainFieldEvaluator(nodes, elements, quadratureRule='gauss1')
+    displacementFrames = [nodeDisplacements*scale for scale in [0.5, 1., 1.5]]
+    for strainField in evaluator.evaluateFrames(displacementFrames):
+        print(f"Volume ratio (J) at the element centroids: {strainField['volumeRatio'][:,0]}")
+    return
+
+def getPartStrainField(part, nodeDisplacements, quadratureRule='gauss2', chunkSize=None, nodeIdOffset=0, modelAssembly=None):
+    """
+    Calculate the deformation gradient, Green-Lagrange strain, principal strains, and volume ratio at every quadrature point of every element in ``part``.
+    See ``getStrainField`` for details.
+
+    .. NOTE:: ``ModelAssembly.addPart`` changes ``part.elements`` to the model's nodeIds. If ``part`` has been added to a ModelAssembly, then use ``modelAssembly=modelAssembly``, so the coordinates are taken from ``modelAssembly.getGlobalNodes()``. This also works when the part's elements use the nodes of other parts (e.g. after ``FebioNodeMerging.mergeCoincidentNodes``).
+
+    :param part: FebioTools.FebioPart.Part instance, The part that defines the reference configuration (``part.nodes``) and the hex8 mesh (``part.elements``).
+    :param nodeDisplacements: array nx3, The displacement of each of the part's nodes. The row index relates to the row index in ``part.nodes``, or to the nodeId - 1 if ``modelAssembly`` is given.
+    :param quadratureRule: string, The name of the quadrature rule (see ``Quadrature.getQuadratureRule``). Use 'gauss1' for the element centroids.
+    :param chunkSize: int or None, The maximum number of elements that are evaluated at once. If None, then all of the elements are evaluated at once.
+    :param nodeIdOffset: int, The value that is subtracted from ``part.elements`` to get the row indices of ``part.nodes``. This is not used if ``modelAssembly`` is given.
+    :param modelAssembly: FebioTools.FebioModelAssembly.ModelAssembly instance or None, The model that ``part`` has been added to.
+    :return: dictionary, See ``getStrainField``.
+    """
+    if modelAssembly is not None:
+        return getStrainField(modelAssembly.getGlobalNodes(), np.asarray(part.elements) - 1, nodeDisplacements, quadratureRule=quadratureRule, chunkSize=chunkSize)
+    return getStrainField(part.nodes, np.asarray(part.elements) - nodeIdOffset, nodeDisplacements, quadratureRule=quadratureRule, chunkSize=chunkSize)
+
+def getStrainField(nodes, elements, nodeDisplacements, quadratureRule='gauss2', chunkSize=None):
+    """
+    Calculate the deformation gradient, Green-Lagrange strain, principal strains, and volume ratio at every quadrature point of every element.
+    The elements are evaluated in chunks of ``chunkSize`` elements, so the memory that is used for the intermediate arrays does not depend on the size of the mesh.
+
+    ..NOTE:: This function assumes that eight noded hexahedral elements are being used with known basis functions.
+
+    :param nodes: array nx3, The coordinates of the nodes in the reference configuration. The row index is the nodeId.
+    :param elements: array ex8, The nodeIds of each element's nodes.
+    :param nodeDisplacements: array nx3, The displacement of each node. The row index relates to the row index in ``nodes``.
+    :param quadratureRule: string, The name of the quadrature rule (see ``Quadrature.getQuadratureRule``). Use 'gauss1' for the element centroids.
+    :param chunkSize: int or None, The maximum number of elements that are evaluated at once. If None, then all of the elements are evaluated at once.
+    :return: dictionary, A dictionary with the following keys, where p is the number of points in the quadrature rule:
+        'points': array px3, The isoparametric coordinates of the points that the values are calculated at.
+        'deformationGradient': array exp x3x3, The deformation gradient F = I + du/dX.
+        'greenLagrangeStrain': array exp x3x3, The Green-Lagrange strain E = 1/2*(F^T F - I).
+        'principalStrains': array exp x3, The eigenvalues of E in ascending order.
+        'volumeRatio': array exp, The determinant of F (J).
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    elements = np.asarray(elements, dtype=int)
+    nodeDisplacements = np.asarray(nodeDisplacements, dtype=float)
+    rule = Quadrature.getQuadratureRule(quadratureRule)
+    elementNum = len(elements)
+    if chunkSize is None:
+        chunkSize = max(elementNum, 1)
+
+    strainField = _getEmptyStrainField(elementNum, rule) # Preallocate the results
+
+    for start in range(0, elementNum, chunkSize):
+        chunk = slice(start, min(start + chunkSize, elementNum))
+        chunkElements = elements[chunk]
+        displacementGradient = Discretization.getDisplacementGradientBatch(nodes[chunkElements], nodeDisplacements[chunkElements], rule)
+        deformationGradient, greenLagrangeStrain, principalStrains, volumeRatio = getStrainMeasures(displacementGradient)
+        strainField['deformationGradient'][chunk] = deformationGradient
+        strainField['greenLagrangeStrain'][chunk] = greenLagrangeStrain
+        strainField['principalStrains'][chunk] = principalStrains
+        strainField['volumeRatio'][chunk] = volumeRatio
+
+    return strainField
+
+class StrainFieldEvaluator(object):
+    def __init__(self, nodes, elements, quadratureRule='gauss2', dtype=np.float64, chunkSize=None):
+        """
+        Define an object that calculates the strain field for many sets of nodal displacements (e.g. the output steps of a simulation) on the same mesh.
+        The gradient of the shape functions with respect to the reference configuration (dN/dX) only depends on the reference geometry, so it is calculated once when this object is created.
+        Each set of nodal displacements then only requires du/dX = sum_I u^I*dN^I/dX.
+
+        Use ``getMemoryEstimate`` to check the size of the stored dN/dX array before creating this object. Use ``dtype=np.float32`` to halve it.
+
+        ..NOTE:: This class assumes that eight noded hexahedral elements are being used with known basis functions.
+
+        :param nodes: array nx3, The coordinates of the nodes in the reference configuration. The row index is the nodeId.
+        :param elements: array ex8, The nodeIds of each element's nodes.
+        :param quadratureRule: string, The name of the quadrature rule (see ``Quadrature.getQuadratureRule``). Use 'gauss1' for the element centroids.
+        :param dtype: numpy dtype, The data type that is used to store dN/dX. Either np.float64 or np.float32.
+        :param chunkSize: int or None, The maximum number of elements that are evaluated at once. If None, then all of the elements are evaluated at once.
+        """
+        self.elements = np.asarray(elements, dtype=int) #: array ex8, The nodeIds of each element's nodes.
+        self.rule = Quadrature.getQuadratureRule(quadratureRule) #: Quadrature.QuadratureRule instance, The points that the strain field is calculated at.
+        self.chunkSize = chunkSize if chunkSize is not None else max(len(self.elements), 1) #: int, The maximum number of elements that are evaluated at once.
+
+        # Calculate and store the reference gradient of the shape functions, one chunk of elements at a time.
+        nodes = np.asarray(nodes, dtype=float)
+        self.shapeFunctionGradient = np.empty((len(self.elements), len(self.rule), 8, 3), dtype=dtype) #: array exp x8x3, dN/dX for each element at each quadrature point.
+        for chunk in self._chunks():
+            self.shapeFunctionGradient[chunk] = Discretization.getShapeFunctionGradientBatch(nodes[self.elements[chunk]], self.rule)
+
+    @staticmethod
+    def getMemoryEstimate(elementNum, quadratureRule='gauss2', dtype=np.float64):
+        """
+        Estimate the number of bytes that are used to store dN/dX for a mesh with ``elementNum`` elements.
+
+        :param elementNum: int, The number of elements in the mesh.
+        :param quadratureRule: string, The name of the quadrature rule.
+        :param dtype: numpy dtype, The data type that is used to store dN/dX.
+        :return: int, The estimated number of bytes.
+        """
+        return elementNum*len(Quadrature.getQuadratureRule(quadratureRule))*8*3*np.dtype(dtype).itemsize
+
+    def getMemoryUsage(self):
+        """
+        :return: int, The number of bytes that are used to store dN/dX.
+        """
+        return self.shapeFunctionGradient.nbytes
+
+    def evaluate(self, nodeDisplacements):
+        """
+        Calculate the strain field for one set of nodal displacements.
+
+        :param nodeDisplacements: array nx3, The displacement of each node. The row index relates to the row index in the ``nodes`` that this object was created with.
+        :return: dictionary, The same dictionary that is returned by ``getStrainField``.
+        """
+        nodeDisplacements = np.asarray(nodeDisplacements, dtype=self.shapeFunctionGradient.dtype)
+        strainField = _getEmptyStrainField(len(self.elements), self.rule) # Preallocate the results
+
+        for chunk in self._chunks():
+            # du_i/dX_A = sum_I u^I_i*dN^I/dX_A
+            displacementGradient = np.einsum('eIi,epIA->epiA', nodeDisplacements[self.elements[chunk]], self.shapeFunctionGradient[chunk], optimize=True)
+            deformationGradient, greenLagrangeStrain, principalStrains, volumeRatio = getStrainMeasures(displacementGradient)
+            strainField['deformationGradient'][chunk] = deformationGradient
+            strainField['greenLagrangeStrain'][chunk] = greenLagrangeStrain
+            strainField['principalStrains'][chunk] = principalStrains
+            strainField['volumeRatio'][chunk] = volumeRatio
+
+        return strainField
+
+    def evaluateFrames(self, displacementFrames):
+        """
+        Calculate the strain field for each set of nodal displacements in ``displacementFrames``.
+        The results are yielded one frame at a time, so only one frame's results are held in memory.
+
+        :param displacementFrames: iterable, An iterable (e.g. a list, a generator, or an array fxnx3) of nx3 nodal displacement arrays.
+        :return: generator, Yields the dictionary that is returned by ``evaluate`` for each frame.
+        """
+        for nodeDisplacements in displacementFrames:
+            yield self.evaluate(nodeDisplacements)
+
+    def _chunks(self):
+        """
+        :return: generator, Yields a slice for each chunk of elements.
+        """
+        for start in range(0, len(self.elements), self.chunkSize):
+            yield slice(start, min(start + self.chunkSize, len(self.elements)))
+
+def getStrainMeasures(displacementGradient):
+    """
+    Calculate the deformation gradient, Green-Lagrange strain, principal strains, and volume ratio from a stack of displacement gradients.
+
+    :param displacementGradient: array ...x3x3, The displacement gradients (du/dX) with respect to the reference configuration.
+    :return: [array ...x3x3, array ...x3x3, array ...x3, array ...], The deformation gradient (F), the Green-Lagrange strain (E), the eigenvalues of E in ascending order, and det(F).
+    """
+    deformationGradient = displacementGradient + np.eye(3)
+    # E = 1/2*(F^T F - I)
+    greenLagrangeStrain = 0.5*(np.einsum('...kA,...kB->...AB', deformationGradient, deformationGradient) - np.eye(3))
+    principalStrains = np.linalg.eigvalsh(greenLagrangeStrain)
+    volumeRatio = Discretization.getDeterminantBatch(deformationGradient)
+    return deformationGradient, greenLagrangeStrain, principalStrains, volumeRatio
+
+def _getEmptyStrainField(elementNum, rule):
+    """
+    Preallocate the dictionary that is returned by ``getStrainField``.
+
+    :param elementNum: int, The number of elements.
+    :param rule: Quadrature.QuadratureRule instance, The points that the strain field is calculated at.
+    :return: dictionary, See ``getStrainField``.
+    """
+    pointNum = len(rule)
+    strainField = {'points': rule.points,
+                   'deformationGradient': np.empty((elementNum, pointNum, 3, 3)),
+                   'greenLagrangeStrain': np.empty((elementNum, pointNum, 3, 3)),
+                   'principalStrains': np.empty((elementNum, pointNum, 3)),
+                   'volumeRatio': np.empty((elementNum, pointNum))}
+    return strainField
+
+if __name__ == '__main__':
+    example()